@@ -0,0 +1,174 @@
+# backend/app/common/cache.py
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # Redis is optional; the in-memory backend needs nothing.
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# CACHE_BACKEND=redis shares entries (and invalidations) across Lambda
+# containers / uvicorn workers through any Redis-protocol server at
+# CACHE_REDIS_URL (or REDIS_URL), and is the default when one is configured.
+# CACHE_BACKEND=memory keeps a per-process LRU: an invalidation only reaches
+# the process that made the write, so other containers keep serving their
+# copy until its TTL runs out.
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL") or os.environ.get("REDIS_URL")
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "redis" if CACHE_REDIS_URL else "memory").lower()
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "512"))
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+class InMemoryLRUCache:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            expires_at, value = self._entries.get(key, (None, "0"))
+            value = str(int(value) + 1)
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            return int(value)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hitRate": round(self._hits / lookups, 4) if lookups else None,
+            }
+
+
+class RedisCache:
+    # Cache failures must never fail the request, so every call degrades to a
+    # miss (or a no-op) when Redis is unreachable.
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get(self, key):
+        try:
+            value = self._client.get(key)
+        except Exception:
+            logger.warning("Cache get failed for %s", key, exc_info=True)
+            self._count("_errors")
+            return None
+        self._count("_hits" if value is not None else "_misses")
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl_seconds=None):
+        try:
+            self._client.set(key, value, ex=int(ttl_seconds) if ttl_seconds else None)
+        except Exception:
+            logger.warning("Cache set failed for %s", key, exc_info=True)
+            self._count("_errors")
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self._client.delete(*keys)
+        except Exception:
+            logger.warning("Cache delete failed for %s", keys, exc_info=True)
+            self._count("_errors")
+
+    def incr(self, key):
+        try:
+            return int(self._client.incr(key))
+        except Exception:
+            logger.warning("Cache incr failed for %s", key, exc_info=True)
+            self._count("_errors")
+            return None
+
+    def stats(self):
+        # Counters are per process; Redis-side totals live in INFO stats.
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": "redis",
+                "hits": self._hits,
+                "misses": self._misses,
+                "hitRate": round(self._hits / lookups, 4) if lookups else None,
+                "errors": self._errors,
+            }
+
+
+def _build_cache():
+    if CACHE_BACKEND == "redis":
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        if not CACHE_REDIS_URL:
+            raise RuntimeError("CACHE_BACKEND=redis requires CACHE_REDIS_URL or REDIS_URL")
+        return RedisCache(redis.Redis.from_url(CACHE_REDIS_URL, socket_timeout=0.25, socket_connect_timeout=0.25))
+    return InMemoryLRUCache(max_entries=CACHE_MAX_ENTRIES)
+
+
+def get_cache():
+    global _CACHE
+
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = _build_cache()
+
+    return _CACHE
+
+
+def set_cache(cache):
+    # Swap the backend explicitly, e.g. a fakeredis-backed RedisCache in tests.
+    global _CACHE
+    _CACHE = cache
+
+
+def get_cache_stats():
+    return get_cache().stats()
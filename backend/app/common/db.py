@@ -1,47 +1,415 @@
 # backend/app/common/db.py
 
+import contextvars
 import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import boto3
 import psycopg2
 from psycopg2 import OperationalError, InterfaceError
-import os
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
 
 secrets_client = boto3.client("secretsmanager")
 
 DB_SECRET = None
-DB_CONN = None
+DB_POOL = None
 
 SECRET_ARN = os.environ.get("DB_SECRET_ARN")
 DB_NAME = os.environ.get("DB_NAME", "carsdb")
 
+# Lambda containers only ever serve one request at a time, so a single pooled
+# connection is enough there. Under uvicorn the sync threadpool can run many
+# requests concurrently, so the default ceiling is higher.
+IS_LAMBDA = bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "0" if IS_LAMBDA else "1"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "1" if IS_LAMBDA else "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", "10"))
+# Connections that have been idle for less than this are handed out without a
+# `SELECT 1` round trip. Anything older is checked before reuse.
+DB_POOL_IDLE_CHECK_SECONDS = float(os.environ.get("DB_POOL_IDLE_CHECK_SECONDS", "30"))
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.environ.get("DB_POOL_MAX_LIFETIME_SECONDS", "1800"))
+DB_CONNECT_TIMEOUT_SECONDS = int(os.environ.get("DB_CONNECT_TIMEOUT_SECONDS", "5"))
+DB_STATEMENT_TIMEOUT_MS = os.environ.get("DB_STATEMENT_TIMEOUT_MS")
+# RDS Proxy / pgbouncer (transaction pooling) reject or pin on session-level
+# startup options, so proxy mode keeps the connect call to plain credentials
+# and lets an optional DB_PROXY_HOST replace the instance endpoint.
+DB_PROXY_MODE = os.environ.get("DB_PROXY_MODE", "").lower() in {"1", "true", "yes"}
+DB_PROXY_HOST = os.environ.get("DB_PROXY_HOST")
 
-def get_db_connection():
-    global DB_SECRET, DB_CONN
+_REQUEST_SCOPE = contextvars.ContextVar("db_request_scope", default=None)
+_THREAD_STATE = threading.local()
+
+
+class PoolTimeoutError(OperationalError):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used_at")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+
+
+def _ping(conn):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        return True
+    except (OperationalError, InterfaceError):
+        return False
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10.0, idle_check_seconds=30.0, max_lifetime_seconds=1800.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_check_seconds = idle_check_seconds
+        self.max_lifetime_seconds = max_lifetime_seconds
+
+        self._lock = threading.Condition()
+        self._idle = []
+        self._in_use = {}
+        self._opening = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._liveness_checks = 0
+        self._discarded = 0
+
+        for _ in range(self.min_size):
+            self._idle.append(_PooledConnection(self._connect()))
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _is_expired(self, pooled, now):
+        return bool(self.max_lifetime_seconds) and now - pooled.created_at > self.max_lifetime_seconds
+
+    def _is_usable(self, pooled, now):
+        conn = pooled.conn
+        if conn.closed or self._is_expired(pooled, now):
+            return False
+        if now - pooled.last_used_at < self.idle_check_seconds:
+            return True
+
+        with self._lock:
+            self._liveness_checks += 1
+        return _ping(conn)
+
+    def _close_quietly(self, conn):
+        with self._lock:
+            self._discarded += 1
+        _close_quietly(conn)
+
+    def getconn(self):
+        started = time.monotonic()
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size() < self.max_size:
+                    pooled = None
+                    self._opening += 1
+                    break
+
+                waited = True
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._record_wait(started)
+                    raise PoolTimeoutError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"(max_size={self.max_size})"
+                    )
+                self._lock.wait(remaining)
+
+            if waited:
+                self._record_wait(started)
+
+        # Liveness checks and new connects happen outside the lock so a slow
+        # database does not block other threads returning connections.
+        if pooled is not None and not self._is_usable(pooled, time.monotonic()):
+            self._close_quietly(pooled.conn)
+            pooled = None
+            with self._lock:
+                self._opening += 1
+
+        if pooled is None:
+            try:
+                pooled = _PooledConnection(self._connect())
+            finally:
+                with self._lock:
+                    self._opening -= 1
+                    self._lock.notify()
+
+        with self._lock:
+            self._in_use[id(pooled.conn)] = pooled
+            self._checkouts += 1
+
+        return pooled.conn
+
+    def putconn(self, conn):
+        with self._lock:
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
+            return
+
+        reusable = not conn.closed
+        if reusable:
+            try:
+                # Never hand a connection with an open or aborted transaction
+                # to the next request, and restore the autocommit default the
+                # repositories rely on.
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if not conn.autocommit:
+                    conn.autocommit = True
+            except (OperationalError, InterfaceError):
+                reusable = False
+
+        now = time.monotonic()
+        if reusable and self._is_expired(pooled, now):
+            reusable = False
+
+        with self._lock:
+            if reusable:
+                pooled.last_used_at = now
+                self._idle.append(pooled)
+            self._lock.notify()
+
+        if not reusable:
+            self._close_quietly(conn)
+
+    def _record_wait(self, started):
+        elapsed = time.monotonic() - started
+        self._waits += 1
+        self._wait_time_total += elapsed
+        self._wait_time_max = max(self._wait_time_max, elapsed)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close_quietly(pooled.conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "minSize": self.min_size,
+                "maxSize": self.max_size,
+                "size": self._size(),
+                "idle": len(self._idle),
+                "checkedOut": len(self._in_use),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "waitTimeTotalMs": round(self._wait_time_total * 1000, 3),
+                "waitTimeMaxMs": round(self._wait_time_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "livenessChecks": self._liveness_checks,
+                "discarded": self._discarded,
+            }
+
+
+def _get_db_secret():
+    global DB_SECRET
 
     if DB_SECRET is None:
         resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
         DB_SECRET = json.loads(resp["SecretString"])
 
-    if DB_CONN is not None and not DB_CONN.closed:
-        try:
-            with DB_CONN.cursor() as cur:
-                cur.execute("SELECT 1")
-            return DB_CONN
-        except (OperationalError, InterfaceError):
-            try:
-                DB_CONN.close()
-            except Exception:
-                pass
-            DB_CONN = None
-
-    if DB_CONN is None or DB_CONN.closed:
-        DB_CONN = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_SECRET["username"],
-            password=DB_SECRET["password"],
-            host=DB_SECRET["host"],
-            port=int(DB_SECRET.get("port", 5432)),
-        )
-        DB_CONN.autocommit = True
-
-    return DB_CONN
+    return DB_SECRET
+
+
+def _connect():
+    secret = _get_db_secret()
+    connect_kwargs = {
+        "dbname": DB_NAME,
+        "user": secret["username"],
+        "password": secret["password"],
+        "host": DB_PROXY_HOST or secret["host"],
+        "port": int(secret.get("port", 5432)),
+        "connect_timeout": DB_CONNECT_TIMEOUT_SECONDS,
+        "application_name": os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "laicai-api"),
+        "keepalives": 1,
+        "keepalives_idle": 30,
+    }
+    if DB_STATEMENT_TIMEOUT_MS and not DB_PROXY_MODE:
+        connect_kwargs["options"] = f"-c statement_timeout={int(DB_STATEMENT_TIMEOUT_MS)}"
+
+    conn = psycopg2.connect(**connect_kwargs)
+    conn.autocommit = True
+    return conn
+
+
+_POOL_INIT_LOCK = threading.Lock()
+
+
+def get_pool():
+    global DB_POOL
+
+    if DB_POOL is None:
+        with _POOL_INIT_LOCK:
+            if DB_POOL is None:
+                DB_POOL = ConnectionPool(
+                    _connect,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT_SECONDS,
+                    idle_check_seconds=DB_POOL_IDLE_CHECK_SECONDS,
+                    max_lifetime_seconds=DB_POOL_MAX_LIFETIME_SECONDS,
+                )
+
+    return DB_POOL
+
+
+def get_pool_stats():
+    if DB_POOL is None:
+        return {"initialized": False}
+    return {"initialized": True, **DB_POOL.stats()}
+
+
+@contextmanager
+def db_connection():
+    # Explicit checkout for code that wants its own connection for the
+    # duration of a block instead of the request-scoped one.
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+class _RequestScope:
+    __slots__ = ("conn", "memo")
+
+    def __init__(self):
+        self.conn = None
+        self.memo = {}
+
+
+@contextmanager
+def db_request_scope():
+    # Repositories keep calling `get_db_connection()`; inside a scope they all
+    # share one lazily checked-out connection, which goes back to the pool when
+    # the scope exits. The scope object is shared by reference, so the binding
+    # survives FastAPI copying the context into its sync threadpool.
+    scope = _RequestScope()
+    token = _REQUEST_SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        _REQUEST_SCOPE.reset(token)
+        if scope.conn is not None:
+            get_pool().putconn(scope.conn)
+            scope.conn = None
+
+
+def get_db():
+    # FastAPI dependency for routes that want the connection injected
+    # explicitly instead of resolving it inside the repository layer.
+    with db_connection() as conn:
+        yield conn
+
+
+def get_db_connection():
+    scope = _REQUEST_SCOPE.get()
+    if scope is not None:
+        if scope.conn is None or scope.conn.closed:
+            if scope.conn is not None:
+                get_pool().putconn(scope.conn)
+            scope.conn = get_pool().getconn()
+        return scope.conn
+
+    # Outside a request (scripts, background jobs, worker threads) each thread
+    # keeps one connection of its own for its lifetime, matching the old global
+    # behavior without sharing a connection across threads. It is opened
+    # outside the pool: nothing ever hands it back, and the pool is sized for
+    # requests (one connection on Lambda), so a pooled checkout here would
+    # starve every later request. It closes when the thread's state is
+    # garbage collected. Like a pooled connection, it is pinged after
+    # DB_POOL_IDLE_CHECK_SECONDS without use and replaced after
+    # DB_POOL_MAX_LIFETIME_SECONDS, but only between transactions so work in
+    # progress on it is never cut off.
+    pooled = getattr(_THREAD_STATE, "pooled", None)
+    now = time.monotonic()
+    if pooled is not None and not _is_thread_connection_usable(pooled, now):
+        _close_quietly(pooled.conn)
+        pooled = None
+    if pooled is None:
+        pooled = _PooledConnection(_connect())
+        _THREAD_STATE.pooled = pooled
+    pooled.last_used_at = now
+    return pooled.conn
+
+
+def _is_thread_connection_usable(pooled, now):
+    conn = pooled.conn
+    if conn.closed:
+        return False
+    status = conn.get_transaction_status()
+    if status == TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != TRANSACTION_STATUS_IDLE:
+        return True
+    if DB_POOL_MAX_LIFETIME_SECONDS and now - pooled.created_at > DB_POOL_MAX_LIFETIME_SECONDS:
+        return False
+    if now - pooled.last_used_at < DB_POOL_IDLE_CHECK_SECONDS:
+        return True
+    return _ping(conn)
+
+
+def release_request_connection():
+    # Hands the request's connection back early, e.g. before a long poll that
+    # only talks to DynamoDB. A later get_db_connection() checks out another.
+    scope = _REQUEST_SCOPE.get()
+    if scope is not None and scope.conn is not None:
+        get_pool().putconn(scope.conn)
+        scope.conn = None
+
+
+def get_request_memo():
+    # Per-request dict for lookups that may repeat within one request; None
+    # outside a request scope.
+    scope = _REQUEST_SCOPE.get()
+    return scope.memo if scope is not None else None
+
+
+class DbRequestScopeMiddleware:
+    # Plain ASGI middleware so the scope wraps the whole request, including
+    # sync endpoints that FastAPI runs in its threadpool.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with db_request_scope():
+            await self.app(scope, receive, send)
@@ -0,0 +1,76 @@
+# backend/app/common/lookup_cache.py
+
+import copy
+import os
+import threading
+
+from app.common.cache import InMemoryLRUCache
+from app.common.db import get_request_memo
+
+# Hot identity lookups (user by sub/id, follow/block relationship, showroom
+# post header) are memoized per request and kept in a small per-process LRU
+# for a few seconds. Writes through this process invalidate immediately; the
+# TTL bounds how long another Lambda container can act on a stale copy.
+LOOKUP_CACHE_TTL_SECONDS = float(os.environ.get("LOOKUP_CACHE_TTL_SECONDS", "10"))
+LOOKUP_CACHE_MAX_ENTRIES = int(os.environ.get("LOOKUP_CACHE_MAX_ENTRIES", "4096"))
+
+_lookup_cache = InMemoryLRUCache(max_entries=LOOKUP_CACHE_MAX_ENTRIES)
+_generation_lock = threading.Lock()
+_generation = 0
+
+
+def user_by_sub_key(sub):
+    return f"user_by_sub:{sub}"
+
+
+def user_by_id_key(user_id):
+    return f"user_by_id:{user_id}"
+
+
+def relationship_key(actor_id, target_id):
+    return f"relationship:{actor_id}:{target_id}"
+
+
+def post_header_key(post_id):
+    return f"post_header:{post_id}"
+
+
+def cached_lookup(key, loader, fresh=False):
+    # Misses (None) are not cached, so a row created right after a failed
+    # lookup is visible on the next call. Callers get a copy they may mutate.
+    # fresh=True is for write paths that must not act on another container's
+    # stale copy (a block made elsewhere): the process cache is not read, but
+    # the request memo still is and the loaded value refreshes the cache.
+    memo = get_request_memo()
+    if memo is not None and key in memo:
+        return copy.deepcopy(memo[key])
+
+    value = _lookup_cache.get(key) if LOOKUP_CACHE_TTL_SECONDS > 0 and not fresh else None
+    if value is None:
+        # A load that raced with an invalidation is returned but not stored.
+        generation = _generation
+        value = loader()
+        if value is not None and LOOKUP_CACHE_TTL_SECONDS > 0:
+            with _generation_lock:
+                if generation == _generation:
+                    _lookup_cache.set(key, value, LOOKUP_CACHE_TTL_SECONDS)
+
+    if memo is not None and value is not None:
+        memo[key] = value
+    return copy.deepcopy(value)
+
+
+def invalidate_lookups(*keys):
+    global _generation
+
+    with _generation_lock:
+        _generation += 1
+        _lookup_cache.delete(*keys)
+    memo = get_request_memo()
+    if memo is not None:
+        for key in keys:
+            memo.pop(key, None)
+
+
+def get_lookup_cache_stats():
+    return {"ttlSeconds": LOOKUP_CACHE_TTL_SECONDS, **_lookup_cache.stats()}
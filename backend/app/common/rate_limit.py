@@ -0,0 +1,435 @@
+# backend/app/common/rate_limit.py
+
+import contextlib
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+# Sliding-window counters: each rule keeps a count for the current and the
+# previous fixed window, and a hit is allowed while
+#     previous * (1 - elapsed / window) + current < limit.
+# Every rule for one subject lives on a single record, so all limits that
+# apply to an action are checked and incremented together in one conditional
+# update (DynamoDB) or one locked step (memory).
+#
+# RATE_LIMIT_BACKEND=dynamodb stores the record in RATE_LIMIT_TABLE (default:
+# the messaging table, pk RATE#<subject>, sk LIMITS) and is shared across
+# Lambda containers. RATE_LIMIT_BACKEND=memory keeps it per process, which is
+# only correct with a single worker (local development).
+RATE_LIMIT_TABLE = os.environ.get("RATE_LIMIT_TABLE") or os.environ.get("USER_MESSAGING_TABLE", "")
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "dynamodb" if RATE_LIMIT_TABLE else "memory").lower()
+RATE_LIMIT_MEMORY_MAX_SUBJECTS = int(os.environ.get("RATE_LIMIT_MEMORY_MAX_SUBJECTS", "10000"))
+# Counters for windows older than the previous one are removed when their rule
+# is hit again; counters of rules that stop being hit are swept once a record
+# has collected this many of them.
+RATE_LIMIT_STALE_SWEEP_THRESHOLD = 8
+
+RATE_LIMIT_HEADERS = ["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "Retry-After"]
+
+# `name` must be unique per subject and must not contain ":".
+RateLimitRule = namedtuple("RateLimitRule", ["name", "limit", "window_seconds", "message"])
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+_RESULTS = contextvars.ContextVar("rate_limit_results", default=None)
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+
+def _counter_name(rule, window_index):
+    return f"{rule.name}:{rule.window_seconds}:{window_index}"
+
+
+def _is_stale_counter(attribute, now):
+    parts = attribute.rsplit(":", 2)
+    if len(parts) != 3 or not parts[1].isdigit() or not parts[2].lstrip("-").isdigit():
+        return False
+    window_seconds = int(parts[1])
+    return window_seconds > 0 and int(parts[2]) < int(now // window_seconds) - 1
+
+
+def _window(rule, now):
+    window_index = int(now // rule.window_seconds)
+    elapsed = now - window_index * rule.window_seconds
+    return window_index, elapsed, 1 - elapsed / rule.window_seconds
+
+
+def _allowance(limit, previous, weight):
+    # The highest current-window count at which one more hit is still allowed
+    # is allowance - 1.
+    return math.ceil(limit - previous * weight - 1e-9)
+
+
+def _retry_after(rule, previous, current, elapsed):
+    window = rule.window_seconds
+    if current < rule.limit and previous:
+        # Wait for the previous window's weight to decay far enough.
+        wait = window * (1 - (rule.limit - current) / previous) - elapsed
+    else:
+        # Wait for the current window to roll over and decay in turn.
+        wait = (window - elapsed) + window * max(0.0, 1 - rule.limit / max(current, 1))
+    return max(1, math.ceil(wait))
+
+
+def _result(rule, previous, current, now):
+    _, elapsed, weight = _window(rule, now)
+    remaining = max(0, _allowance(rule.limit, previous, weight) - current)
+    return {
+        "rule": rule.name,
+        "limit": rule.limit,
+        "remaining": remaining,
+        "resetSeconds": max(1, math.ceil(rule.window_seconds - elapsed)),
+        "retryAfterSeconds": _retry_after(rule, previous, current, elapsed) if remaining == 0 else 0,
+    }
+
+
+def _first_blocked(rules, counts, now):
+    for rule in rules:
+        window_index, _, weight = _window(rule, now)
+        previous = int(counts.get(_counter_name(rule, window_index - 1), 0))
+        current = int(counts.get(_counter_name(rule, window_index), 0))
+        if current >= _allowance(rule.limit, previous, weight):
+            return rule, _result(rule, previous, current, now)
+    return None, None
+
+
+def _results_after_hit(rules, counts, now):
+    results = []
+    for rule in rules:
+        window_index, _, _ = _window(rule, now)
+        previous = int(counts.get(_counter_name(rule, window_index - 1), 0))
+        current = int(counts.get(_counter_name(rule, window_index), 0))
+        results.append(_result(rule, previous, current, now))
+    return results
+
+
+class InMemoryRateLimitStore:
+    def __init__(self, max_subjects=10000):
+        self.max_subjects = max_subjects
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def hit(self, subject, rules, now):
+        with self._lock:
+            record = self._records.setdefault(subject, {"expiresAt": 0, "counts": {}})
+            counts = record["counts"]
+            for attribute in [attribute for attribute in counts if _is_stale_counter(attribute, now)]:
+                del counts[attribute]
+
+            blocked_rule, blocked_result = _first_blocked(rules, counts, now)
+            if blocked_rule is not None:
+                return blocked_rule, blocked_result, None
+
+            for rule in rules:
+                window_index, _, _ = _window(rule, now)
+                name = _counter_name(rule, window_index)
+                counts[name] = counts.get(name, 0) + 1
+            record["expiresAt"] = max(record["expiresAt"], now + 2 * max(rule.window_seconds for rule in rules))
+            results = _results_after_hit(rules, counts, now)
+
+            if len(self._records) > self.max_subjects:
+                for key in [key for key, value in self._records.items() if value["expiresAt"] <= now]:
+                    del self._records[key]
+            return None, None, results
+
+    def refund(self, subject, rules, now):
+        with self._lock:
+            counts = self._records.get(subject, {}).get("counts", {})
+            for rule in rules:
+                window_index, _, _ = _window(rule, now)
+                name = _counter_name(rule, window_index)
+                if counts.get(name, 0) > 0:
+                    counts[name] -= 1
+
+
+class DynamoRateLimitStore:
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self._client = boto3.client("dynamodb")
+
+    def _key(self, subject):
+        return {"pk": {"S": f"RATE#{subject}"}, "sk": {"S": "LIMITS"}}
+
+    def _hit_update(self, subject, rules, now):
+        # DynamoDB conditions cannot multiply, so each rule's
+        # "current < ceil(limit - previous * weight)" is expanded into one
+        # clause per step of the threshold: NOT (previous >= k AND current >= t).
+        # Missing counters compare false, which reads as zero.
+        names = {"#expiresAt": "expiresAt", "#itemType": "itemType", "#updatedAt": "updatedAt"}
+        values = {
+            ":one": {"N": "1"},
+            ":itemType": {"S": "RATE_LIMIT"},
+            ":expiresAt": {"N": str(int(now + 2 * max(rule.window_seconds for rule in rules)))},
+            ":updatedAt": {"N": str(int(now))},
+        }
+        add_clauses = []
+        remove_clauses = []
+        conditions = []
+
+        def value_placeholder(number):
+            placeholder = f":v{len(values)}"
+            values[placeholder] = {"N": str(number)}
+            return placeholder
+
+        for index, rule in enumerate(rules):
+            window_index, _, weight = _window(rule, now)
+            current, previous, expired = f"#c{index}", f"#p{index}", f"#o{index}"
+            names[current] = _counter_name(rule, window_index)
+            names[expired] = _counter_name(rule, window_index - 2)
+            add_clauses.append(f"{current} :one")
+            remove_clauses.append(expired)
+
+            last_threshold = None
+            for previous_count in range(rule.limit + 1):
+                threshold = _allowance(rule.limit, previous_count, weight)
+                if threshold == last_threshold:
+                    continue
+                last_threshold = threshold
+                if previous_count:
+                    # Only named once a clause uses it; unused names are rejected.
+                    names[previous] = _counter_name(rule, window_index - 1)
+                if threshold <= 0:
+                    conditions.append(f"NOT {previous} >= {value_placeholder(previous_count)}")
+                    break
+                if previous_count == 0:
+                    conditions.append(f"NOT {current} >= {value_placeholder(threshold)}")
+                else:
+                    conditions.append(
+                        f"NOT ({previous} >= {value_placeholder(previous_count)} "
+                        f"AND {current} >= {value_placeholder(threshold)})"
+                    )
+
+        return {
+            "TableName": self.table_name,
+            "Key": self._key(subject),
+            "UpdateExpression": (
+                "SET #itemType = :itemType, #expiresAt = :expiresAt, #updatedAt = :updatedAt "
+                f"ADD {', '.join(add_clauses)} "
+                f"REMOVE {', '.join(remove_clauses)}"
+            ),
+            "ConditionExpression": " AND ".join(f"({condition})" for condition in conditions),
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }
+
+    def hit(self, subject, rules, now):
+        try:
+            response = self._client.update_item(
+                **self._hit_update(subject, rules, now),
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+            blocked_rule, blocked_result = self.blocked(rules, error.response.get("Item") or {}, now)
+            return blocked_rule, blocked_result, None
+
+        counts = self._counts(response.get("Attributes") or {})
+        stale = [attribute for attribute in counts if _is_stale_counter(attribute, now)]
+        if len(stale) >= RATE_LIMIT_STALE_SWEEP_THRESHOLD:
+            self._sweep(subject, stale)
+        return None, None, _results_after_hit(rules, counts, now)
+
+    def transact_item(self, subject, rules, now):
+        # The same conditional update as hit(), as a TransactWriteItems entry.
+        return {
+            "Update": {
+                **self._hit_update(subject, rules, now),
+                "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+            }
+        }
+
+    def blocked(self, rules, item, now):
+        # Works out which rule refused a hit from the record's old image.
+        blocked_rule, blocked_result = _first_blocked(rules, self._counts(item), now)
+        if blocked_rule is None:
+            # Old image unavailable (older botocore): report the tightest rule.
+            blocked_rule = rules[0]
+            blocked_result = _result(blocked_rule, 0, blocked_rule.limit, now)
+        return blocked_rule, blocked_result
+
+    def refund(self, subject, rules, now):
+        # Takes back the hit counted at `now`. A counter already at zero (or
+        # swept) is left alone; a refund is best effort either way.
+        names = {}
+        conditions = []
+        for index, rule in enumerate(rules):
+            window_index, _, _ = _window(rule, now)
+            names[f"#c{index}"] = _counter_name(rule, window_index)
+            conditions.append(f"#c{index} >= :one")
+        try:
+            self._client.update_item(
+                TableName=self.table_name,
+                Key=self._key(subject),
+                UpdateExpression="ADD " + ", ".join(f"{name} :minus_one" for name in names),
+                ConditionExpression=" AND ".join(conditions),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues={":one": {"N": "1"}, ":minus_one": {"N": "-1"}},
+            )
+        except ClientError:
+            pass
+
+    def _counts(self, item):
+        return {
+            name: int(value["N"])
+            for name, value in item.items()
+            if "N" in value and name.count(":") >= 2
+        }
+
+    def _sweep(self, subject, attributes):
+        names = {f"#s{index}": attribute for index, attribute in enumerate(attributes)}
+        try:
+            self._client.update_item(
+                TableName=self.table_name,
+                Key=self._key(subject),
+                UpdateExpression="REMOVE " + ", ".join(names),
+                ExpressionAttributeNames=names,
+            )
+        except ClientError:
+            # Best effort; the next sweep picks the counters up again.
+            pass
+
+
+def _build_store():
+    if RATE_LIMIT_BACKEND == "dynamodb":
+        if not RATE_LIMIT_TABLE:
+            raise RuntimeError("RATE_LIMIT_BACKEND=dynamodb requires RATE_LIMIT_TABLE or USER_MESSAGING_TABLE")
+        return DynamoRateLimitStore(RATE_LIMIT_TABLE)
+    return InMemoryRateLimitStore(max_subjects=RATE_LIMIT_MEMORY_MAX_SUBJECTS)
+
+
+def get_rate_limit_store():
+    global _STORE
+
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = _build_store()
+
+    return _STORE
+
+
+def set_rate_limit_store(store):
+    global _STORE
+    _STORE = store
+
+
+def check_rate_limits(subject, rules, now=None):
+    # Counts one hit against every rule, or against none of them when any
+    # rule is exhausted, in which case RateLimitExceeded carries the blocking
+    # rule's message and retry time.
+    rules = [rule for rule in rules if rule is not None]
+    if not rules:
+        return []
+
+    now = time.time() if now is None else now
+    blocked_rule, blocked_result, results = get_rate_limit_store().hit(subject, rules, now)
+    _record_results([blocked_result] if blocked_rule is not None else results)
+    if blocked_rule is not None:
+        raise RateLimitExceeded(blocked_rule.message, blocked_result)
+    return results
+
+
+@contextlib.contextmanager
+def rate_limited(subject, rules):
+    # check_rate_limits for an action that may still fail: the hit is counted
+    # up front, so concurrent requests cannot overshoot the limit, and handed
+    # back if the body raises, so only actions that went through use quota.
+    rules = [rule for rule in rules if rule is not None]
+    now = time.time()
+    results = check_rate_limits(subject, rules, now)
+    try:
+        yield results
+    except BaseException:
+        if rules:
+            get_rate_limit_store().refund(subject, rules, now)
+        raise
+
+
+def rate_limit_transact_item(subject, rules, now):
+    # The hit as a TransactWriteItems entry, for actions written in a DynamoDB
+    # transaction: the counters move only if the whole transaction commits,
+    # and no separate round trip is spent on the check. Returns None when the
+    # store cannot join a transaction (memory); use rate_limited() then.
+    # TransactWriteItems returns no attributes, so a successful hit made this
+    # way reports no quota headers.
+    rules = [rule for rule in rules if rule is not None]
+    store = get_rate_limit_store()
+    if not rules or not isinstance(store, DynamoRateLimitStore):
+        return None
+    return store.transact_item(subject, rules, now)
+
+
+def raise_for_cancelled_hit(rules, cancellation_reason, now):
+    # Call with the CancellationReasons entry at the rate-limit item's
+    # position after a cancelled transaction; raises RateLimitExceeded when
+    # that item is what refused the write.
+    if (cancellation_reason or {}).get("Code") != "ConditionalCheckFailed":
+        return
+    rules = [rule for rule in rules if rule is not None]
+    blocked_rule, blocked_result = get_rate_limit_store().blocked(rules, cancellation_reason.get("Item") or {}, now)
+    _record_results([blocked_result])
+    raise RateLimitExceeded(blocked_rule.message, blocked_result)
+
+
+def _record_results(results):
+    recorded = _RESULTS.get()
+    if recorded is not None:
+        recorded.extend(results)
+
+
+def rate_limit_headers(results):
+    # The tightest rule wins: fewest remaining hits, then the longest reset.
+    if not results:
+        return {}
+    result = min(results, key=lambda item: (item["remaining"], -item["resetSeconds"]))
+    headers = {
+        "X-RateLimit-Limit": str(result["limit"]),
+        "X-RateLimit-Remaining": str(result["remaining"]),
+        "X-RateLimit-Reset": str(result["resetSeconds"]),
+    }
+    if result["remaining"] == 0 and result.get("retryAfterSeconds"):
+        headers["Retry-After"] = str(result["retryAfterSeconds"])
+    return headers
+
+
+class RateLimitHeadersMiddleware:
+    # Plain ASGI middleware: collects the results of every check made while
+    # handling the request and adds the quota headers to the response.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        results = []
+        token = _RESULTS.set(results)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and results:
+                existing = {name.lower() for name, _ in message.get("headers", [])}
+                extra = [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in rate_limit_headers(results).items()
+                    if name.lower().encode("latin-1") not in existing
+                ]
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _RESULTS.reset(token)
@@ -0,0 +1,72 @@
+# backend/app/common/reference_cache.py
+
+import os
+import threading
+import time
+
+# Brands, makes and product lines are small tables that change only through
+# admin edits. Each process keeps them for a short TTL; writes made through
+# this process invalidate immediately, and the TTL bounds how long other
+# Lambda containers can serve a stale copy.
+REFERENCE_CACHE_TTL_SECONDS = float(os.environ.get("REFERENCE_CACHE_TTL_SECONDS", "300"))
+
+
+class ReferenceCache:
+    def __init__(self, ttl_seconds=300.0):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._generation = 0
+
+    def get_or_load(self, key, loader):
+        # Keys are tuples whose first element is the namespace used by
+        # `invalidate`, e.g. ("brands", include_hidden, include_counts).
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            generation = self._generation
+
+        # Load outside the lock so a slow query does not block other keys. A
+        # load that raced with an invalidation is returned but not stored.
+        value = loader()
+        if self.ttl_seconds > 0:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self, *namespaces):
+        with self._lock:
+            if not namespaces:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] in namespaces]:
+                    del self._entries[key]
+            self._invalidations += 1
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "ttlSeconds": self.ttl_seconds,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hitRate": round(self._hits / lookups, 4) if lookups else None,
+                "invalidations": self._invalidations,
+            }
+
+
+reference_cache = ReferenceCache(ttl_seconds=REFERENCE_CACHE_TTL_SECONDS)
+
+
+def get_reference_cache_stats():
+    return reference_cache.stats()
@@ -1,5 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from app.common.db import DbRequestScopeMiddleware, get_pool_stats
+from app.common.cache import get_cache_stats
+from app.common.lookup_cache import get_lookup_cache_stats
+from app.common.rate_limit import RATE_LIMIT_HEADERS, RateLimitExceeded, RateLimitHeadersMiddleware, rate_limit_headers
+from app.common.reference_cache import get_reference_cache_stats
 from app.routes import cars, collections, showroom, users
 
 app = FastAPI(title="Laicai API", version="1.0.0")
@@ -10,7 +16,10 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=RATE_LIMIT_HEADERS,
 )
+app.add_middleware(DbRequestScopeMiddleware)
+app.add_middleware(RateLimitHeadersMiddleware)
 
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(users.public_router, tags=["Public Profiles"])
@@ -18,3 +27,36 @@ app.include_router(showroom.router, tags=["Showroom"])
 app.include_router(showroom.public_router, tags=["Showroom"])
 app.include_router(cars.router, tags=["Cars"])
 app.include_router(collections.router, tags=["Collections"])
+
+
+@app.exception_handler(RateLimitExceeded)
+def handle_rate_limit_exceeded(_request: Request, error: RateLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(error)},
+        headers=rate_limit_headers([error.result]),
+    )
+
+
+@app.get("/health/db-pool", tags=["Health"])
+def get_db_pool_health():
+    # Pool gauges for sizing Lambda/uvicorn concurrency against the database.
+    return get_pool_stats()
+
+
+@app.get("/health/reference-cache", tags=["Health"])
+def get_reference_cache_health():
+    # Hit/miss counters for the brand/make/product-line cache.
+    return get_reference_cache_stats()
+
+
+@app.get("/health/cache", tags=["Health"])
+def get_cache_health():
+    # Hit/miss counters for the shared response cache (showroom feed pages).
+    return get_cache_stats()
+
+
+@app.get("/health/lookup-cache", tags=["Health"])
+def get_lookup_cache_health():
+    # Hit/miss counters for the user, relationship and post-header lookups.
+    return get_lookup_cache_stats()
@@ -7,6 +7,7 @@ import re
 from psycopg2.extras import Json, RealDictCursor
 
 from app.common.db import get_db_connection
+from app.common.reference_cache import reference_cache
 
 
 ALLOWED_CAR_FIELDS = {
@@ -35,24 +36,6 @@ ALLOWED_CAR_FIELDS = {
 }
 
 JSONB_FIELDS = {"additional_info", "images"}
-# Shared aggregate CTE for public car reads so list/detail stay consistent on
-# owners_count and likes_count without duplicating the counting logic.
-CAR_STATS_CTE = """
-WITH car_stats AS (
-    SELECT
-        car_id,
-        COUNT(DISTINCT user_id) AS owners_count
-    FROM user_collection_items
-    GROUP BY car_id
-),
-like_stats AS (
-    SELECT
-        car_id,
-        COUNT(*) AS likes_count
-    FROM user_liked_items
-    GROUP BY car_id
-)
-"""
 
 
 def _sanitize_car_payload(payload):
@@ -118,6 +101,8 @@ def create_car(payload, actor_user_id):
         )
         created = cur.fetchone()
 
+    # Brand lists carry per-brand car counts.
+    reference_cache.invalidate("brands")
     return get_car_by_id(created["id"])
 
 
@@ -146,6 +131,7 @@ def update_car(car_id, payload, actor_user_id):
     if not updated:
         return None
 
+    reference_cache.invalidate("brands")
     return get_car_by_id(updated["id"])
 
 
@@ -154,7 +140,10 @@ def delete_car(car_id):
 
     with conn.cursor() as cur:
         cur.execute("DELETE FROM cars WHERE id = %s", (car_id,))
-        return cur.rowcount
+        deleted = cur.rowcount
+
+    reference_cache.invalidate("brands")
+    return deleted
 
 
 def get_car_by_id(car_id):
@@ -285,7 +274,6 @@ def get_public_car_detail(car_id, user_id=None, include_hidden=False):
         hidden_filter = "" if include_hidden else "AND COALESCE(b.is_visible, TRUE) = TRUE AND COALESCE(c.is_visible, TRUE) = TRUE"
         cur.execute(
             f"""
-            {CAR_STATS_CTE}
             SELECT
                 c.id,
                 c.original_id,
@@ -307,14 +295,13 @@ def get_public_car_detail(car_id, user_id=None, include_hidden=False):
                 {own_expr} AS own,
                 {liked_expr} AS liked,
                 COALESCE(cs.owners_count, 0) AS owners_count,
-                COALESCE(ls.likes_count, 0) AS likes_count
+                COALESCE(cs.likes_count, 0) AS likes_count
             FROM cars c
             LEFT JOIN brands b ON b.id = c.brand_id
             LEFT JOIN makes m ON m.id = c.make_id
             LEFT JOIN product_lines pl ON pl.id = c.product_line_id
             {user_join}
             LEFT JOIN car_stats cs ON cs.car_id = c.id
-            LEFT JOIN like_stats ls ON ls.car_id = c.id
             WHERE c.id = %s
               {hidden_filter}
             """,
@@ -326,10 +313,16 @@ def get_public_car_detail(car_id, user_id=None, include_hidden=False):
         return item
 
 
-def list_public_cars(filters=None, values=None, user_id=None, limit=20, offset=0):
+def list_public_cars(filters=None, values=None, user_id=None, limit=20, offset=0, cursor_mode=False, after=None, include_total=True):
     # Public car list query used by the main cars page and admin maintenance
     # list. Keep this shape aligned with the previous Lambda response so the
     # frontend migration stays low-risk.
+    #
+    # `cursor_mode` switches to keyset pagination. `after` is the
+    # `(crawled_date, id)` of the last row on the previous page, and rows are
+    # read strictly past it in the same `crawled_date DESC, id DESC` order that
+    # idx_cars_crawled_date_id serves. Cursor mode never pays for OFFSET and
+    # only runs the COUNT when the caller asks for it.
     conn = get_db_connection()
     filters = filters or []
     values = values or []
@@ -359,11 +352,33 @@ def list_public_cars(filters=None, values=None, user_id=None, limit=20, offset=0
         user_join = "LEFT JOIN user_liked_items uli ON false"
 
     where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+    page_filters = list(filters)
+    page_values = list(values)
+
+    if after is not None:
+        after_crawled_date, after_id = after
+        if after_crawled_date is None:
+            # DESC sorts NULL crawl dates first, so a cursor inside the NULL
+            # block continues by id and then falls through to dated rows.
+            page_filters.append("((c.crawled_date IS NULL AND c.id < %s) OR c.crawled_date IS NOT NULL)")
+            page_values.append(after_id)
+        else:
+            page_filters.append("(c.crawled_date, c.id) < (%s, %s)")
+            page_values.extend([after_crawled_date, after_id])
+
+    page_where_clause = f"WHERE {' AND '.join(page_filters)}" if page_filters else ""
+    if cursor_mode:
+        # One extra row tells the caller whether another page exists without
+        # a COUNT over the whole filtered set.
+        page_clause = "LIMIT %s"
+        page_params = [limit + 1]
+    else:
+        page_clause = "LIMIT %s OFFSET %s"
+        page_params = [limit, offset]
 
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         cur.execute(
             f"""
-            {CAR_STATS_CTE}
             SELECT
                 c.id,
                 c.title,
@@ -383,32 +398,46 @@ def list_public_cars(filters=None, values=None, user_id=None, limit=20, offset=0
                 {own_expr} AS own,
                 {liked_expr} AS liked,
                 COALESCE(cs.owners_count, 0) AS owners_count,
-                COALESCE(ls.likes_count, 0) AS likes_count
+                COALESCE(cs.likes_count, 0) AS likes_count
             FROM cars c
             LEFT JOIN brands b ON b.id = c.brand_id
             LEFT JOIN makes m ON m.id = c.make_id
             LEFT JOIN product_lines pl ON pl.id = c.product_line_id
             {user_join}
             LEFT JOIN car_stats cs ON cs.car_id = c.id
-            LEFT JOIN like_stats ls ON ls.car_id = c.id
-            {where_clause}
-            ORDER BY c.crawled_date DESC
-            LIMIT %s OFFSET %s
+            {page_where_clause}
+            ORDER BY c.crawled_date DESC, c.id DESC
+            {page_clause}
             """,
-            join_params + values + [limit, offset],
+            join_params + page_values + page_params,
         )
         items = cur.fetchall()
 
-        cur.execute(
-            f"""
-            SELECT COUNT(*) AS count
-            FROM cars c
-            LEFT JOIN brands b ON b.id = c.brand_id
-            {where_clause}
-            """,
-            values,
-        )
-        total = cur.fetchone()["count"]
+        total = None
+        if include_total:
+            cur.execute(
+                f"""
+                SELECT COUNT(*) AS count
+                FROM cars c
+                LEFT JOIN brands b ON b.id = c.brand_id
+                {where_clause}
+                """,
+                values,
+            )
+            total = cur.fetchone()["count"]
+
+    if cursor_mode:
+        has_more = len(items) > limit
+        items = items[:limit]
+        result = {
+            "items": items,
+            "hasMore": has_more,
+            "nextCursor": (items[-1]["crawled_date"], items[-1]["id"]) if has_more else None,
+        }
+        if total is not None:
+            result["total"] = total
+            result["pages"] = (total + limit - 1) // limit
+        return result
 
     return {
         "items": items,
@@ -469,6 +498,58 @@ def list_car_owners(car_id, limit=20, offset=0):
     }
 
 
+def reconcile_car_stats():
+    # car_stats is maintained by triggers on user_collection_items and
+    # user_liked_items. This full recount repairs any drift (concurrent writes,
+    # manual data fixes, rows written before the triggers existed) and only
+    # touches rows whose counts actually changed.
+    conn = get_db_connection()
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            """
+            WITH expected AS (
+                SELECT
+                    c.id AS car_id,
+                    COALESCE(o.owners_count, 0) AS owners_count,
+                    COALESCE(l.likes_count, 0) AS likes_count
+                FROM cars c
+                LEFT JOIN (
+                    SELECT car_id, COUNT(DISTINCT user_id) AS owners_count
+                    FROM user_collection_items
+                    GROUP BY car_id
+                ) o ON o.car_id = c.id
+                LEFT JOIN (
+                    SELECT car_id, COUNT(*) AS likes_count
+                    FROM user_liked_items
+                    GROUP BY car_id
+                ) l ON l.car_id = c.id
+            ),
+            repaired AS (
+                INSERT INTO car_stats (car_id, owners_count, likes_count, updated_at)
+                SELECT e.car_id, e.owners_count, e.likes_count, now()
+                FROM expected e
+                LEFT JOIN car_stats cs ON cs.car_id = e.car_id
+                WHERE (cs.car_id IS NULL AND (e.owners_count > 0 OR e.likes_count > 0))
+                   OR (
+                       cs.car_id IS NOT NULL
+                       AND (
+                           cs.owners_count IS DISTINCT FROM e.owners_count
+                           OR cs.likes_count IS DISTINCT FROM e.likes_count
+                       )
+                   )
+                ON CONFLICT (car_id) DO UPDATE
+                SET owners_count = EXCLUDED.owners_count,
+                    likes_count = EXCLUDED.likes_count,
+                    updated_at = now()
+                RETURNING car_id
+            )
+            SELECT COUNT(*) AS repaired FROM repaired
+            """
+        )
+        row = cur.fetchone()
+    return {"repaired": int(row["repaired"] or 0)}
+
+
 def list_brands(include_hidden=True, include_counts=False, only_with_cars=False):
     conn = get_db_connection()
     conditions = []
@@ -523,7 +604,9 @@ def update_brand_visibility(brand_id, is_visible):
         )
         row = cur.fetchone()
         conn.commit()
-        return row
+
+    reference_cache.invalidate("brands")
+    return row
 
 
 def list_makes():
@@ -632,7 +715,10 @@ def create_brand(name):
             """,
             (name,),
         )
-        return cur.fetchone()
+        created = cur.fetchone()
+
+    reference_cache.invalidate("brands")
+    return created
 
 
 def create_make(name):
@@ -647,7 +733,10 @@ def create_make(name):
             """,
             (name,),
         )
-        return cur.fetchone()
+        created = cur.fetchone()
+
+    reference_cache.invalidate("makes")
+    return created
 
 
 def create_product_line(name, brand_id):
@@ -662,7 +751,10 @@ def create_product_line(name, brand_id):
             """,
             (name, brand_id),
         )
-        return cur.fetchone()
+        created = cur.fetchone()
+
+    reference_cache.invalidate("product_lines")
+    return created
 
 
 def build_hot_wheels_code(sku):
@@ -1245,27 +1337,24 @@ def delete_hot_wheels_staging_job(job_id):
 
 
 def hot_wheels_staging_has_job_id_column(conn=None):
-    own_conn = conn is None
+    # The connection is request-scoped and owned by the pool, so it must not be
+    # closed here even when this helper resolved it itself.
     conn = conn or get_db_connection()
 
-    try:
-        with conn.cursor() as cur:
-            # The Hot Wheels staging feature shipped before `job_id` existed.
-            # Keep review/list APIs backward-compatible so environments that
-            # missed the later migration still load instead of crashing.
-            cur.execute(
-                """
-                SELECT EXISTS (
-                    SELECT 1
-                    FROM information_schema.columns
-                    WHERE table_schema = 'public'
-                      AND table_name = 'hot_wheels_fandom_staging'
-                      AND column_name = 'job_id'
-                )
-                """
+    with conn.cursor() as cur:
+        # The Hot Wheels staging feature shipped before `job_id` existed.
+        # Keep review/list APIs backward-compatible so environments that
+        # missed the later migration still load instead of crashing.
+        cur.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1
+                FROM information_schema.columns
+                WHERE table_schema = 'public'
+                  AND table_name = 'hot_wheels_fandom_staging'
+                  AND column_name = 'job_id'
             )
-            row = cur.fetchone()
-            return bool(row and row[0])
-    finally:
-        if own_conn:
-            conn.close()
+            """
+        )
+        row = cur.fetchone()
+        return bool(row and row[0])
@@ -2,7 +2,6 @@ import math
 from psycopg2.extras import RealDictCursor, Json
 
 from app.common.db import get_db_connection
-from app.repositories.car_repository import CAR_STATS_CTE
 
 
 def _get_or_create_storage_location(cur, user_id, item):
@@ -192,7 +191,6 @@ def list_liked_cars(user_id, page=1, page_size=20, keyword=None):
 
         cur.execute(
             f"""
-            {CAR_STATS_CTE}
             SELECT
                 c.id,
                 c.title,
@@ -216,14 +214,13 @@ def list_liked_cars(user_id, page=1, page_size=20, keyword=None):
                 ) AS own,
                 TRUE AS liked,
                 COALESCE(cs.owners_count, 0) AS owners_count,
-                COALESCE(ls.likes_count, 0) AS likes_count
+                COALESCE(cs.likes_count, 0) AS likes_count
             FROM user_liked_items uli
             JOIN cars c ON c.id = uli.car_id
             LEFT JOIN brands b ON b.id = c.brand_id
             LEFT JOIN makes m ON m.id = c.make_id
             LEFT JOIN product_lines pl ON pl.id = c.product_line_id
             LEFT JOIN car_stats cs ON cs.car_id = c.id
-            LEFT JOIN like_stats ls ON ls.car_id = c.id
             WHERE uli.user_id = %s
               AND COALESCE(b.is_visible, TRUE) = TRUE
               AND COALESCE(c.is_visible, TRUE) = TRUE
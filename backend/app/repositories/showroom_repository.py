@@ -4,6 +4,39 @@ from decimal import Decimal
 from app.common.db import get_db_connection
 from psycopg2 import IntegrityError
 
+# Feed scores are stored on showroom_posts so hot/popular feeds can walk
+# idx_showroom_posts_hot_score / idx_showroom_posts_popular_score instead of
+# scoring every recent post per request. Engagement is log-scaled and the
+# publish time adds a steadily growing offset, so newer posts outrank older
+# ones with the same engagement and scores never need a periodic re-decay.
+#
+# score = ln(1 + weighted engagement) + publish_epoch / TIME_SCALE_SECONDS
+#
+# Every TIME_SCALE_SECONDS of age costs one e-fold of engagement, which is the
+# same ranking as engagement decaying with a half-life of
+# TIME_SCALE_SECONDS * ln 2: a post needs twice the engagement to tie one
+# published that much later.
+#   hot:     45000 s (12.5 h),   half-life ~8.7 h
+#   popular: 604800 s (7 days), half-life ~4.9 days
+# The 20260507_showroom_feed_scores migration backfilled existing rows with
+# these same values; it is applied history and stays as it is. Changing a
+# time scale here needs a migration that re-scores every post, or old and new
+# posts are ranked on different clocks.
+SHOWROOM_HOT_SCORE_TIME_SCALE_SECONDS = 45000
+SHOWROOM_POPULAR_SCORE_TIME_SCALE_SECONDS = 604800
+SHOWROOM_HOT_SCORE_SQL = f"""
+    ln((1 + comment_count * 5 + like_count * 3 + tag_count * 4)::double precision)
+    + extract(epoch FROM COALESCE(published_at, created_at))::double precision / {SHOWROOM_HOT_SCORE_TIME_SCALE_SECONDS:.1f}
+"""
+SHOWROOM_POPULAR_SCORE_SQL = f"""
+    ln((1 + comment_count * 5 + like_count * 3)::double precision)
+    + extract(epoch FROM COALESCE(published_at, created_at))::double precision / {SHOWROOM_POPULAR_SCORE_TIME_SCALE_SECONDS:.1f}
+"""
+SHOWROOM_SCORE_COLUMNS = {
+    "hot_topics": "hot_score",
+    "popular": "popular_score",
+}
+
 
 def _normalize_post_row(row):
     if not row:
@@ -41,6 +74,33 @@ def _normalize_post_row(row):
     }
 
 
+def _refresh_showroom_post_scores(cur, post_id, recount_tags=False):
+    # Runs after a counter write in the same transaction, so the stored scores
+    # always match the counts committed alongside them.
+    if recount_tags:
+        cur.execute(
+            """
+            UPDATE showroom_posts
+            SET tag_count = (
+                SELECT COUNT(*)
+                FROM showroom_post_tag_links
+                WHERE post_id = %s
+            )
+            WHERE id = %s
+            """,
+            (post_id, post_id),
+        )
+    cur.execute(
+        f"""
+        UPDATE showroom_posts
+        SET hot_score = {SHOWROOM_HOT_SCORE_SQL},
+            popular_score = {SHOWROOM_POPULAR_SCORE_SQL}
+        WHERE id = %s
+        """,
+        (post_id,),
+    )
+
+
 def _normalize_sale_transaction_row(row):
     if not row:
         return None
@@ -186,6 +246,8 @@ def create_showroom_post(*, post_id, user_id, post_type, title, description, vis
                     (post_id, tag_id),
                 )
 
+            _refresh_showroom_post_scores(cur, post_id, recount_tags=True)
+
         conn.commit()
         return post_id
     except Exception:
@@ -318,6 +380,8 @@ def update_showroom_post(*, post_id, user_id, post_type, title, description, vis
                     (post_id, tag_id),
                 )
 
+            _refresh_showroom_post_scores(cur, post_id, recount_tags=True)
+
         conn.commit()
         return {"updated": True}
     except Exception:
@@ -418,30 +482,7 @@ def delete_showroom_sale_transaction(post_id, seller_user_id=None):
     return {"deleted": deleted}
 
 
-def _post_select_sql(where_clause: str):
-    return f"""
-        SELECT
-            sp.id,
-            sp.post_type,
-            sp.title,
-            sp.description,
-            sp.visibility,
-            sp.status,
-            sp.like_count,
-            sp.comment_count,
-            sp.image_count,
-            sp.created_at,
-            sp.updated_at,
-            sp.published_at,
-            u.id AS author_id,
-            u.username,
-            u.profile_image_url,
-            ssd.price,
-            ssd.currency,
-            ssd.condition,
-            ssd.location,
-            ssd.shipping_supported,
-            ssd.selling_status,
+_POST_CHILDREN_SQL = """
             COALESCE((
                 SELECT json_agg(
                     json_build_object(
@@ -473,7 +514,45 @@ def _post_select_sql(where_clause: str):
                 FROM showroom_post_car_links spcl
                 JOIN cars c ON c.id = spcl.car_id
                 WHERE spcl.post_id = sp.id
-            ), '[]'::json) AS cars
+            ), '[]'::json) AS cars,"""
+
+
+def _post_select_sql(where_clause: str, include_children=True):
+    # Single-post reads keep the correlated json_agg children. Feed pages pass
+    # include_children=False and fill images/tags/cars with
+    # `_attach_post_children`, which costs three set-based queries per page
+    # instead of three subplans per row. Column positions stay the same either
+    # way so `_normalize_post_row` does not care which path produced the row.
+    children_sql = _POST_CHILDREN_SQL if include_children else """
+            NULL::json AS images,
+            NULL::json AS tags,
+            NULL::json AS cars,"""
+    return f"""
+        SELECT
+            sp.id,
+            sp.post_type,
+            sp.title,
+            sp.description,
+            sp.visibility,
+            sp.status,
+            sp.like_count,
+            sp.comment_count,
+            sp.image_count,
+            sp.created_at,
+            sp.updated_at,
+            sp.published_at,
+            u.id AS author_id,
+            u.username,
+            u.profile_image_url,
+            ssd.price,
+            ssd.currency,
+            ssd.condition,
+            ssd.location,
+            ssd.shipping_supported,
+            ssd.selling_status,
+{children_sql}
+            sp.hot_score,
+            sp.popular_score
         FROM showroom_posts sp
         JOIN users u ON u.id = sp.user_id
         LEFT JOIN showroom_selling_details ssd ON ssd.post_id = sp.id
@@ -481,6 +560,85 @@ def _post_select_sql(where_clause: str):
     """
 
 
+def _column_index(cur, column_name):
+    # Position of a column in the last result, looked up by name so adding a
+    # column to _post_select_sql cannot shift it. Read it before
+    # _attach_post_children reuses the cursor.
+    return [column.name for column in cur.description].index(column_name)
+
+
+def _attach_post_children(cur, rows):
+    # Batched counterpart of the json_agg subqueries in _POST_CHILDREN_SQL.
+    # The output shapes and orderings match, so both paths produce identical
+    # items.
+    if not rows:
+        return rows
+
+    # The placeholder columns are found by name before the child queries
+    # replace cur.description.
+    images_index = _column_index(cur, "images")
+    tags_index = _column_index(cur, "tags")
+    cars_index = _column_index(cur, "cars")
+    post_ids = [str(row[0]) for row in rows]
+    images_by_post = {post_id: [] for post_id in post_ids}
+    tags_by_post = {post_id: [] for post_id in post_ids}
+    cars_by_post = {post_id: [] for post_id in post_ids}
+
+    cur.execute(
+        """
+        SELECT post_id, image_url, sort_order
+        FROM showroom_post_images
+        WHERE post_id = ANY(%s::uuid[])
+        ORDER BY post_id, sort_order ASC
+        """,
+        (post_ids,),
+    )
+    for post_id, image_url, sort_order in cur.fetchall():
+        images_by_post[str(post_id)].append({"imageUrl": image_url, "sortOrder": sort_order})
+
+    cur.execute(
+        """
+        SELECT sptl.post_id, st.display_name
+        FROM showroom_post_tag_links sptl
+        JOIN showroom_tags st ON st.id = sptl.tag_id
+        WHERE sptl.post_id = ANY(%s::uuid[])
+        ORDER BY sptl.post_id, st.display_name ASC
+        """,
+        (post_ids,),
+    )
+    for post_id, display_name in cur.fetchall():
+        tags_by_post[str(post_id)].append(display_name)
+
+    cur.execute(
+        """
+        SELECT spcl.post_id, c.id, c.title, c.brand, c.original_id, c.images
+        FROM showroom_post_car_links spcl
+        JOIN cars c ON c.id = spcl.car_id
+        WHERE spcl.post_id = ANY(%s::uuid[])
+        ORDER BY spcl.post_id, spcl.sort_order ASC
+        """,
+        (post_ids,),
+    )
+    for post_id, car_id, title, brand, original_id, images in cur.fetchall():
+        cars_by_post[str(post_id)].append({
+            "id": str(car_id),
+            "title": title,
+            "brand": brand,
+            "originalId": original_id,
+            "images": images,
+        })
+
+    attached = []
+    for row in rows:
+        row = list(row)
+        post_id = str(row[0])
+        row[images_index] = images_by_post[post_id]
+        row[tags_index] = tags_by_post[post_id]
+        row[cars_index] = cars_by_post[post_id]
+        attached.append(tuple(row))
+    return attached
+
+
 def get_showroom_post(post_id, actor_id=None, include_hidden=False):
     conn = get_db_connection()
     where_clause = ["sp.id = %s"]
@@ -513,6 +671,55 @@ def get_showroom_post(post_id, actor_id=None, include_hidden=False):
     return _normalize_post_row(row)
 
 
+def get_showroom_post_header(post_id):
+    # The few fields a transaction chat needs (type, seller, title, cover
+    # image, price). Unlike get_showroom_post it skips the children
+    # aggregates and the per-actor block filter, so the result can be shared
+    # across viewers; callers apply the block check themselves.
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                sp.id,
+                sp.post_type,
+                sp.title,
+                sp.user_id,
+                (
+                    SELECT spi.image_url
+                    FROM showroom_post_images spi
+                    WHERE spi.post_id = sp.id
+                    ORDER BY spi.sort_order ASC
+                    LIMIT 1
+                ) AS cover_image_url,
+                ssd.price,
+                ssd.currency,
+                ssd.selling_status
+            FROM showroom_posts sp
+            LEFT JOIN showroom_selling_details ssd ON ssd.post_id = sp.id
+            WHERE sp.id = %s AND sp.status = 'published'
+            """,
+            (post_id,),
+        )
+        row = cur.fetchone()
+
+    if not row:
+        return None
+
+    return {
+        "id": str(row[0]),
+        "post_type": row[1],
+        "title": row[2],
+        "author": {"id": str(row[3])},
+        "images": [{"imageUrl": row[4]}] if row[4] else [],
+        "selling_details": {
+            "price": float(row[5]) if isinstance(row[5], Decimal) else row[5],
+            "currency": row[6],
+            "selling_status": row[7],
+        } if row[5] is not None else None,
+    }
+
+
 def get_showroom_comment(comment_id):
     conn = get_db_connection()
     with conn.cursor() as cur:
@@ -639,6 +846,7 @@ def create_showroom_comment(*, post_id, user_id, content):
                 """,
                 (post_id,),
             )
+            _refresh_showroom_post_scores(cur, post_id)
         conn.commit()
     except Exception:
         conn.rollback()
@@ -709,6 +917,7 @@ def delete_showroom_comment(*, comment_id, user_id):
                 """,
                 (post_id,),
             )
+            _refresh_showroom_post_scores(cur, post_id)
         conn.commit()
         return {"deleted": True}
     except Exception:
@@ -752,6 +961,47 @@ def list_showroom_transaction_reviews(showroom_post_id, seller_user_id, buyer_us
     return [_normalize_transaction_review_row(row) for row in rows]
 
 
+def get_showroom_transaction_reviewer_ids(transactions):
+    # transactions: iterable of (showroom_post_id, seller_user_id, buyer_user_id).
+    # Returns {triple: set of reviewer ids} in one query; each triple is an
+    # idx_showroom_transaction_reviews_transaction probe.
+    triples = list(dict.fromkeys(
+        (str(post_id), str(seller_user_id), str(buyer_user_id))
+        for post_id, seller_user_id, buyer_user_id in transactions or []
+        if post_id and seller_user_id and buyer_user_id
+    ))
+    if not triples:
+        return {}
+
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                t.post_id,
+                t.seller_user_id,
+                t.buyer_user_id,
+                strv.reviewer_user_id
+            FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[]) AS t(post_id, seller_user_id, buyer_user_id)
+            JOIN showroom_transaction_reviews strv
+                ON strv.showroom_post_id = t.post_id
+               AND strv.seller_user_id = t.seller_user_id
+               AND strv.buyer_user_id = t.buyer_user_id
+            """,
+            (
+                [triple[0] for triple in triples],
+                [triple[1] for triple in triples],
+                [triple[2] for triple in triples],
+            ),
+        )
+        rows = cur.fetchall()
+
+    reviewer_ids = {triple: set() for triple in triples}
+    for row in rows:
+        reviewer_ids[(str(row[0]), str(row[1]), str(row[2]))].add(str(row[3]))
+    return reviewer_ids
+
+
 def create_showroom_transaction_review(*, showroom_post_id, seller_user_id, buyer_user_id, reviewer_user_id, reviewee_user_id, rating, comment):
     conn = get_db_connection()
     try:
@@ -876,6 +1126,7 @@ def like_showroom_post(*, post_id, user_id):
                     """,
                     (post_id,),
                 )
+                _refresh_showroom_post_scores(cur, post_id)
         conn.commit()
         return {"liked": created}
     except Exception:
@@ -911,6 +1162,7 @@ def unlike_showroom_post(*, post_id, user_id):
                     """,
                     (post_id,),
                 )
+                _refresh_showroom_post_scores(cur, post_id)
         conn.commit()
         return {"unliked": removed}
     except Exception:
@@ -936,51 +1188,6 @@ def delete_showroom_post(*, post_id, user_id):
     return {"deleted": deleted}
 
 
-def count_recent_showroom_posts(user_id, window_minutes=60):
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT COUNT(*)
-            FROM showroom_posts
-            WHERE user_id = %s
-              AND created_at >= now() - (%s || ' minutes')::interval
-            """,
-            (user_id, window_minutes),
-        )
-        return cur.fetchone()[0]
-
-
-def count_recent_showroom_comments(user_id, window_minutes=10):
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT COUNT(*)
-            FROM showroom_post_comments
-            WHERE user_id = %s
-              AND created_at >= now() - (%s || ' minutes')::interval
-            """,
-            (user_id, window_minutes),
-        )
-        return cur.fetchone()[0]
-
-
-def count_recent_showroom_reports(user_id, window_minutes=60):
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT COUNT(*)
-            FROM showroom_reports
-            WHERE reporter_id = %s
-              AND created_at >= now() - (%s || ' minutes')::interval
-            """,
-            (user_id, window_minutes),
-        )
-        return cur.fetchone()[0]
-
-
 def create_showroom_report(*, reporter_id, reason, details=None, post_id=None, comment_id=None):
     conn = get_db_connection()
     report_id = str(uuid.uuid4())
@@ -1145,6 +1352,7 @@ def update_showroom_comment_status(comment_id, status):
                         """,
                         (post_id,),
                     )
+                    _refresh_showroom_post_scores(cur, post_id)
                 elif old_status == "deleted" and status == "published":
                     cur.execute(
                         """
@@ -1155,6 +1363,7 @@ def update_showroom_comment_status(comment_id, status):
                         """,
                         (post_id,),
                     )
+                    _refresh_showroom_post_scores(cur, post_id)
         conn.commit()
         return {"updated": True}
     except Exception:
@@ -1196,6 +1405,7 @@ def _build_showroom_feed_sql_parts(
     max_price=None,
     shipping_supported=None,
     selling_status=None,
+    after=None,
 ):
     joins = []
     conditions = [
@@ -1233,11 +1443,15 @@ def _build_showroom_feed_sql_parts(
         )
         join_params.append(car_id)
     if keyword:
-        conditions.append("(sp.title ILIKE %s OR sp.description ILIKE %s)")
-        keyword_pattern = f"%{keyword}%"
-        condition_params.append(keyword_pattern)
-        condition_params.append(keyword_pattern)
+        # `search_query` is joined once so the filter and the relevance
+        # ordering share the same parsed query. Matches go through the GIN
+        # index on showroom_posts.search_vector.
+        joins.append("CROSS JOIN websearch_to_tsquery('simple', %s) AS search_query")
+        join_params.append(keyword)
+        conditions.append("sp.search_vector @@ search_query")
     if seller_query:
+        # Served by the trigram index on users.username, so the leading
+        # wildcard does not force a sequential scan.
         conditions.append("u.username ILIKE %s")
         condition_params.append(f"%{seller_query}%")
     if min_price is not None:
@@ -1297,61 +1511,70 @@ def _build_showroom_feed_sql_parts(
     elif feed_mode == "popular":
         conditions.append("COALESCE(sp.published_at, sp.created_at) >= now() - interval '90 days'")
 
+    if after is not None:
+        # Keyset position for score-ordered feeds: strictly past the last
+        # (score, id) of the previous page, matching the ORDER BY below.
+        score_column = SHOWROOM_SCORE_COLUMNS[feed_mode]
+        conditions.append(f"(sp.{score_column}, sp.id) < (%s, %s)")
+        condition_params.extend(after)
+
     where_clause = f"WHERE {' AND '.join(conditions)}"
     join_clause = " ".join(joins)
     return join_clause, where_clause, join_params + condition_params
 
 
-def _showroom_feed_order_by(feed_mode):
-    if feed_mode == "hot_topics":
-        return """
-            ORDER BY
-                (
-                    sp.comment_count * 5
-                    + sp.like_count * 3
-                    + COALESCE((
-                        SELECT COUNT(*)
-                        FROM showroom_post_tag_links sptl
-                        WHERE sptl.post_id = sp.id
-                    ), 0) * 4
-                ) DESC,
-                COALESCE(sp.published_at, sp.created_at) DESC
-        """
+def _showroom_feed_order_by(feed_mode, ranked=False):
+    # Keyword searches lead with relevance; the feed ordering still breaks
+    # ties so equally relevant posts keep their usual order.
+    rank_clause = "ts_rank_cd(sp.search_vector, search_query) DESC," if ranked else ""
 
-    if feed_mode == "popular":
-        return """
+    score_column = SHOWROOM_SCORE_COLUMNS.get(feed_mode)
+    if score_column:
+        return f"""
             ORDER BY
-                (sp.comment_count * 5 + sp.like_count * 3) DESC,
-                COALESCE(sp.published_at, sp.created_at) DESC
+                {rank_clause}
+                sp.{score_column} DESC,
+                sp.id DESC
         """
 
-    return """
+    return f"""
         ORDER BY
+            {rank_clause}
             COALESCE(sp.published_at, sp.created_at) DESC,
             sp.created_at DESC
     """
 
 
-def list_trending_showroom_tags(limit=12):
+def list_trending_showroom_tags(limit=12, window_days=45, half_life_days=None):
+    # Sums the per-day buckets in showroom_tag_daily_counts, so the cost is
+    # bounded by window_days * active tags rather than by the number of posts.
+    # With half_life_days set, older buckets count for less when ranking;
+    # postCount is always the plain total over the window.
+    if half_life_days:
+        score_sql = "SUM(d.post_count * power(0.5, (current_date - d.bucket_date) / %s::double precision))"
+        params = [half_life_days, window_days, limit]
+    else:
+        score_sql = "SUM(d.post_count)"
+        params = [window_days, limit]
+
     conn = get_db_connection()
     with conn.cursor() as cur:
         cur.execute(
-            """
+            f"""
             SELECT
                 st.tag_key,
                 st.display_name,
-                COUNT(*) AS post_count
-            FROM showroom_post_tag_links sptl
-            JOIN showroom_tags st ON st.id = sptl.tag_id
-            JOIN showroom_posts sp ON sp.id = sptl.post_id
-            WHERE sp.status = 'published'
-              AND sp.visibility = 'public'
-              AND COALESCE(sp.published_at, sp.created_at) >= now() - interval '45 days'
+                SUM(d.post_count) AS post_count,
+                {score_sql} AS trending_score
+            FROM showroom_tag_daily_counts d
+            JOIN showroom_tags st ON st.id = d.tag_id
+            WHERE d.bucket_date >= current_date - %s::integer
+              AND d.post_count > 0
             GROUP BY st.tag_key, st.display_name
-            ORDER BY post_count DESC, st.display_name ASC
+            ORDER BY trending_score DESC, st.display_name ASC
             LIMIT %s
             """,
-            (limit,),
+            params,
         )
         rows = cur.fetchall()
 
@@ -1359,12 +1582,61 @@ def list_trending_showroom_tags(limit=12):
         {
             "tagKey": row[0],
             "displayName": row[1],
-            "postCount": row[2],
+            "postCount": int(row[2]),
         }
         for row in rows
     ]
 
 
+def rebuild_showroom_tag_daily_counts():
+    # showroom_tag_daily_counts is maintained by triggers on
+    # showroom_post_tag_links and showroom_posts. This recount backfills it and
+    # repairs drift, rewriting only the buckets whose counts changed.
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            WITH expected AS (
+                SELECT
+                    COALESCE(sp.published_at, sp.created_at)::date AS bucket_date,
+                    sptl.tag_id,
+                    COUNT(*)::integer AS post_count
+                FROM showroom_post_tag_links sptl
+                JOIN showroom_posts sp ON sp.id = sptl.post_id
+                WHERE sp.status = 'published'
+                  AND sp.visibility = 'public'
+                GROUP BY 1, 2
+            ),
+            upserted AS (
+                INSERT INTO showroom_tag_daily_counts (bucket_date, tag_id, post_count, updated_at)
+                SELECT e.bucket_date, e.tag_id, e.post_count, now()
+                FROM expected e
+                LEFT JOIN showroom_tag_daily_counts d
+                    ON d.bucket_date = e.bucket_date AND d.tag_id = e.tag_id
+                WHERE d.post_count IS DISTINCT FROM e.post_count
+                ON CONFLICT (bucket_date, tag_id) DO UPDATE
+                SET post_count = EXCLUDED.post_count,
+                    updated_at = now()
+                RETURNING 1
+            ),
+            cleared AS (
+                DELETE FROM showroom_tag_daily_counts d
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM expected e
+                    WHERE e.bucket_date = d.bucket_date AND e.tag_id = d.tag_id
+                )
+                RETURNING 1
+            )
+            SELECT
+                (SELECT COUNT(*) FROM upserted),
+                (SELECT COUNT(*) FROM cleared)
+            """
+        )
+        row = cur.fetchone()
+    return {"repaired": int(row[0] or 0), "removed": int(row[1] or 0)}
+
+
 def list_showroom_posts(
     limit=20,
     offset=0,
@@ -1380,9 +1652,16 @@ def list_showroom_posts(
     max_price=None,
     shipping_supported=None,
     selling_status=None,
+    cursor_mode=False,
+    after=None,
 ):
+    # Hot and popular feeds can page by keyset on their stored score. Cursor
+    # mode reads one extra row to detect the next page and skips the COUNT.
     safe_limit = min(max(limit or 20, 1), 30)
     safe_offset = max(offset or 0, 0)
+    score_column = SHOWROOM_SCORE_COLUMNS.get(feed_mode)
+    if cursor_mode and (not score_column or keyword):
+        raise ValueError("Cursor pagination is only available for hot and popular feeds without a keyword")
     conn = get_db_connection()
     join_clause, where_clause, params = _build_showroom_feed_sql_parts(
         user_id=user_id,
@@ -1397,23 +1676,46 @@ def list_showroom_posts(
         max_price=max_price,
         shipping_supported=shipping_supported,
         selling_status=selling_status,
+        after=after if cursor_mode else None,
     )
-    order_by_clause = _showroom_feed_order_by(feed_mode)
+    order_by_clause = _showroom_feed_order_by(feed_mode, ranked=bool(keyword))
 
     with conn.cursor() as cur:
+        if cursor_mode:
+            cur.execute(
+                _post_select_sql(f"{join_clause} {where_clause}", include_children=False) + f"""
+                {order_by_clause}
+                LIMIT %s
+                """,
+                params + [safe_limit + 1],
+            )
+            rows = cur.fetchall()
+            score_index = _column_index(cur, score_column)
+            has_more = len(rows) > safe_limit
+            rows = _attach_post_children(cur, rows[:safe_limit])
+            return {
+                "items": [_normalize_post_row(row) for row in rows],
+                "limit": safe_limit,
+                "hasMore": has_more,
+                "nextCursor": (rows[-1][score_index], str(rows[-1][0])) if has_more else None,
+            }
+
         cur.execute(
-            _post_select_sql(f"{join_clause} {where_clause}") + f"""
+            _post_select_sql(f"{join_clause} {where_clause}", include_children=False) + f"""
             {order_by_clause}
             LIMIT %s OFFSET %s
             """,
             params + [safe_limit, safe_offset],
         )
         rows = cur.fetchall()
+        score_index = _column_index(cur, score_column) if score_column else None
+        rows = _attach_post_children(cur, rows)
 
         cur.execute(
             f"""
             SELECT COUNT(*)
             FROM showroom_posts sp
+            JOIN users u ON u.id = sp.user_id
             LEFT JOIN showroom_selling_details ssd ON ssd.post_id = sp.id
             {join_clause}
             {where_clause}
@@ -1422,9 +1724,14 @@ def list_showroom_posts(
         )
         total = cur.fetchone()[0]
 
-    return {
+    result = {
         "items": [_normalize_post_row(row) for row in rows],
         "total": total,
         "limit": safe_limit,
         "offset": safe_offset,
     }
+    if score_column and not keyword:
+        # Lets offset clients switch to keyset paging from any page.
+        has_more = safe_offset + len(rows) < total
+        result["nextCursor"] = (rows[-1][score_index], str(rows[-1][0])) if has_more and rows else None
+    return result
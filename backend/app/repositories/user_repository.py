@@ -1,9 +1,14 @@
 # app/repositories/user_repository.py
 
 from app.common.db import get_db_connection
+from app.common.lookup_cache import invalidate_lookups, relationship_key, user_by_id_key, user_by_sub_key
 from psycopg2 import IntegrityError
 
 
+def _invalidate_relationship(user_id, other_user_id):
+    invalidate_lookups(relationship_key(user_id, other_user_id), relationship_key(other_user_id, user_id))
+
+
 def create_user(sub, email, phone, username):
     conn = get_db_connection()
     with conn.cursor() as cur:
@@ -20,6 +25,7 @@ def create_user(sub, email, phone, username):
             (sub, username, sub, email, phone),
         )
     conn.commit()
+    invalidate_lookups(user_by_sub_key(sub), user_by_id_key(sub))
 
 
 def get_user_by_sub(sub):
@@ -48,13 +54,15 @@ def update_user(sub, username, bio, address, age, profile_image_url, message_not
                     profile_image_url = %s,
                     message_notifications_muted = %s
                 WHERE cognito_sub = %s
+                RETURNING id
             """,
                 (username, bio, address, age, profile_image_url, message_notifications_muted, sub),
             )
-            updated_rows = cur.rowcount
+            updated_ids = [str(row[0]) for row in cur.fetchall()]
 
         conn.commit()
-        return updated_rows
+        invalidate_lookups(user_by_sub_key(sub), *[user_by_id_key(user_id) for user_id in updated_ids])
+        return len(updated_ids)
     except IntegrityError as error:
         conn.rollback()
         if "username" in str(error).lower():
@@ -70,13 +78,15 @@ def update_user_role_by_sub(cognito_sub, role):
             UPDATE users
             SET role = %s
             WHERE cognito_sub = %s
+            RETURNING id
         """,
             (role, cognito_sub),
         )
-        updated_rows = cur.rowcount
+        updated_ids = [str(row[0]) for row in cur.fetchall()]
 
     conn.commit()
-    return updated_rows
+    invalidate_lookups(user_by_sub_key(cognito_sub), *[user_by_id_key(user_id) for user_id in updated_ids])
+    return len(updated_ids)
 
 
 def list_users(keyword=None, limit=50, offset=0):
@@ -137,13 +147,15 @@ def delete_user_by_id(user_id):
                 """
                 DELETE FROM users
                 WHERE id = %s
+                RETURNING cognito_sub
                 """,
                 (user_id,),
             )
-            deleted_rows = cur.rowcount
+            deleted_subs = [row[0] for row in cur.fetchall()]
 
         conn.commit()
-        return {"deleted_rows": deleted_rows}
+        invalidate_lookups(user_by_id_key(user_id), *[user_by_sub_key(sub) for sub in deleted_subs if sub])
+        return {"deleted_rows": len(deleted_subs)}
     except IntegrityError as error:
         conn.rollback()
         return {"deleted_rows": 0, "blocked_by_reference": True, "error": str(error)}
@@ -310,62 +322,66 @@ def get_public_profile(user_id, limit=12, offset=0):
 
 
 def get_follow_status(follower_id, followed_user_id):
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT EXISTS(
-                SELECT 1
-                FROM user_follows
-                WHERE follower_id = %s AND followed_user_id = %s
-            )
-            """,
-            (follower_id, followed_user_id),
-        )
-        following = cur.fetchone()[0]
+    return get_follow_statuses(follower_id, [followed_user_id]).get(
+        str(followed_user_id),
+        {
+            "following": False,
+            "followedBy": False,
+            "isFriend": False,
+            "blocking": False,
+            "blockedBy": False,
+        },
+    )
 
-        cur.execute(
-            """
-            SELECT EXISTS(
-                SELECT 1
-                FROM user_follows
-                WHERE follower_id = %s AND followed_user_id = %s
-            )
-            """,
-            (followed_user_id, follower_id),
-        )
-        followed_by = cur.fetchone()[0]
 
-        cur.execute(
-            """
-            SELECT EXISTS(
-                SELECT 1
-                FROM user_blocks
-                WHERE blocker_id = %s AND blocked_user_id = %s
-            )
-            """,
-            (follower_id, followed_user_id),
-        )
-        blocking = cur.fetchone()[0]
+def get_follow_statuses(actor_id, user_ids):
+    # One round trip for any number of users; each flag is an index probe on
+    # the follow/block primary keys.
+    normalized_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids or [] if user_id))
+    if not normalized_ids:
+        return {}
 
+    conn = get_db_connection()
+    with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT EXISTS(
-                SELECT 1
-                FROM user_blocks
-                WHERE blocker_id = %s AND blocked_user_id = %s
-            )
+            SELECT
+                target.user_id,
+                EXISTS(
+                    SELECT 1
+                    FROM user_follows
+                    WHERE follower_id = %s AND followed_user_id = target.user_id
+                ) AS following,
+                EXISTS(
+                    SELECT 1
+                    FROM user_follows
+                    WHERE follower_id = target.user_id AND followed_user_id = %s
+                ) AS followed_by,
+                EXISTS(
+                    SELECT 1
+                    FROM user_blocks
+                    WHERE blocker_id = %s AND blocked_user_id = target.user_id
+                ) AS blocking,
+                EXISTS(
+                    SELECT 1
+                    FROM user_blocks
+                    WHERE blocker_id = target.user_id AND blocked_user_id = %s
+                ) AS blocked_by
+            FROM unnest(%s::uuid[]) AS target(user_id)
             """,
-            (followed_user_id, follower_id),
+            (actor_id, actor_id, actor_id, actor_id, normalized_ids),
         )
-        blocked_by = cur.fetchone()[0]
+        rows = cur.fetchall()
 
     return {
-        "following": following,
-        "followedBy": followed_by,
-        "isFriend": following and followed_by and not blocking and not blocked_by,
-        "blocking": blocking,
-        "blockedBy": blocked_by,
+        str(row[0]): {
+            "following": row[1],
+            "followedBy": row[2],
+            "isFriend": row[1] and row[2] and not row[3] and not row[4],
+            "blocking": row[3],
+            "blockedBy": row[4],
+        }
+        for row in rows
     }
 
 
@@ -381,6 +397,7 @@ def follow_user(follower_id, followed_user_id):
             (follower_id, followed_user_id),
         )
     conn.commit()
+    _invalidate_relationship(follower_id, followed_user_id)
 
 
 def unfollow_user(follower_id, followed_user_id):
@@ -394,6 +411,7 @@ def unfollow_user(follower_id, followed_user_id):
             (follower_id, followed_user_id),
         )
     conn.commit()
+    _invalidate_relationship(follower_id, followed_user_id)
 
 
 def block_user(blocker_id, blocked_user_id):
@@ -416,6 +434,7 @@ def block_user(blocker_id, blocked_user_id):
             (blocker_id, blocked_user_id, blocked_user_id, blocker_id),
         )
     conn.commit()
+    _invalidate_relationship(blocker_id, blocked_user_id)
 
 
 def unblock_user(blocker_id, blocked_user_id):
@@ -429,6 +448,7 @@ def unblock_user(blocker_id, blocked_user_id):
             (blocker_id, blocked_user_id),
         )
     conn.commit()
+    _invalidate_relationship(blocker_id, blocked_user_id)
 
 
 def list_followers(user_id, limit=20, offset=0):
@@ -544,3 +564,4 @@ def remove_follower(user_id, follower_user_id):
             (follower_user_id, user_id),
         )
     conn.commit()
+    _invalidate_relationship(user_id, follower_user_id)
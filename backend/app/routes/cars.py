@@ -41,6 +41,9 @@ def get_cars(
     offset: int = 0,
     bid: str | None = None,
     keyword: str | None = None,
+    pagination: str = Query("offset", regex="^(offset|cursor)$"),
+    cursor: str | None = None,
+    includeTotal: bool = Query(False),
 ):
     # This route intentionally multiplexes the old public car-read surface:
     # list, single detail, and owner pagination all share the same `/cars`
@@ -64,6 +67,9 @@ def get_cars(
         limit=limit,
         offset=offset,
         include_hidden=includeHidden,
+        cursor_mode=pagination == "cursor",
+        cursor=cursor,
+        include_total=includeTotal,
     )
 
 
@@ -79,6 +85,12 @@ def update_admin_brand_visibility(request: Request, brand_id: UUID, body: BrandV
     return car_service.update_admin_brand_visibility(sub, str(brand_id), body.isVisible)
 
 
+@router.post("/admin/cars/stats/reconcile")
+def reconcile_admin_car_stats(request: Request):
+    sub = get_current_user_sub(request)
+    return car_service.reconcile_admin_car_stats(sub)
+
+
 @router.post("/admin/cars")
 def create_admin_car(request: Request, body: CarMutationRequest):
     sub = get_current_user_sub(request)
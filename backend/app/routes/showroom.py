@@ -36,22 +36,27 @@ def list_showroom_posts(
     maxPrice: float | None = None,
     shippingSupported: bool | None = None,
     sellingStatus: str | None = None,
+    cursor: str | None = None,
 ):
-    return showroom_service.list_showroom_posts(
-        limit=limit,
-        offset=offset,
-        user_id=str(userId) if userId else None,
-        post_type=postType,
-        feed_mode=feedMode,
-        tag_key=tagKey,
-        car_id=str(carId) if carId else None,
-        keyword=keyword,
-        seller_query=sellerQuery,
-        min_price=minPrice,
-        max_price=maxPrice,
-        shipping_supported=shippingSupported,
-        selling_status=sellingStatus,
-    )
+    try:
+        return showroom_service.list_showroom_posts(
+            limit=limit,
+            offset=offset,
+            user_id=str(userId) if userId else None,
+            post_type=postType,
+            feed_mode=feedMode,
+            tag_key=tagKey,
+            car_id=str(carId) if carId else None,
+            keyword=keyword,
+            seller_query=sellerQuery,
+            min_price=minPrice,
+            max_price=maxPrice,
+            shipping_supported=shippingSupported,
+            selling_status=sellingStatus,
+            cursor=cursor,
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
 
 
 @public_router.get("/showroom/{post_id}")
@@ -163,6 +168,7 @@ def list_personalized_showroom_feed(
     maxPrice: float | None = None,
     shippingSupported: bool | None = None,
     sellingStatus: str | None = None,
+    cursor: str | None = None,
 ):
     sub = get_current_user_sub(request)
     try:
@@ -180,6 +186,7 @@ def list_personalized_showroom_feed(
             max_price=maxPrice,
             shipping_supported=shippingSupported,
             selling_status=sellingStatus,
+            cursor=cursor,
         )
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
@@ -271,6 +278,15 @@ def list_admin_showroom_reports(
         raise HTTPException(status_code=400, detail=str(error))
 
 
+@router.post("/admin/showroom/tags/trending/rebuild")
+def rebuild_showroom_tag_daily_counts(request: Request):
+    sub = get_current_user_sub(request)
+    try:
+        return showroom_service.rebuild_showroom_tag_daily_counts(sub)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
 @router.post("/admin/showroom/posts/{post_id}/moderate")
 def moderate_showroom_post(request: Request, post_id: UUID, body: ModerateShowroomPostRequest):
     sub = get_current_user_sub(request)
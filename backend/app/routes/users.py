@@ -81,6 +81,21 @@ def promote_user(request: Request, body: PromoteUserRequest):
         raise HTTPException(status_code=400, detail=str(error))
 
 
+@router.post("/admin/messages/index/backfill")
+def backfill_message_index_keys(request: Request, cursor: str | None = None, maxPages: int = 5):
+    # Resumable: repeat with the returned nextCursor until hasMore is false.
+    sub = get_current_user_sub(request)
+
+    try:
+        return message_service.backfill_conversation_index_keys(sub, cursor=cursor, max_pages=maxPages)
+    except PermissionError as error:
+        raise HTTPException(status_code=403, detail=str(error))
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except RuntimeError as error:
+        raise HTTPException(status_code=500, detail=str(error))
+
+
 @router.get("/admin/list")
 def list_users(
     request: Request,
@@ -227,14 +242,38 @@ def get_direct_conversation(
         raise HTTPException(status_code=500, detail=str(error))
 
 
-@router.get("/messages/direct")
-def list_direct_conversations(request: Request):
+@router.get("/messages/direct/{user_id}/sync")
+def sync_direct_conversation(
+    request: Request,
+    user_id: UUID,
+    after: str,
+    limit: int = 30,
+    wait: int = 0,
+):
     sub = get_current_user_sub(request)
 
     try:
-        return message_service.list_direct_conversations(sub)
+        return message_service.sync_direct_conversation(sub, str(user_id), after, limit=limit, wait_seconds=wait)
     except ValueError as error:
         raise HTTPException(status_code=404, detail=str(error))
+    except PermissionError as error:
+        raise HTTPException(status_code=403, detail=str(error))
+    except RuntimeError as error:
+        raise HTTPException(status_code=500, detail=str(error))
+
+
+@router.get("/messages/direct")
+def list_direct_conversations(
+    request: Request,
+    limit: int = 50,
+    cursor: str | None = None,
+):
+    sub = get_current_user_sub(request)
+
+    try:
+        return message_service.list_direct_conversations(sub, limit=limit, cursor=cursor)
+    except ValueError as error:
+        raise HTTPException(status_code=400 if cursor else 404, detail=str(error))
     except RuntimeError as error:
         raise HTTPException(status_code=500, detail=str(error))
 
@@ -245,6 +284,8 @@ def list_order_history(
     role: str = "selling",
     limit: int = 20,
     offset: int = 0,
+    cursor: str | None = None,
+    includeTotal: bool = False,
 ):
     sub = get_current_user_sub(request)
 
@@ -254,6 +295,8 @@ def list_order_history(
             role=role,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            include_total=includeTotal,
         )
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error))
@@ -325,6 +368,34 @@ def get_showroom_transaction_conversation(
         raise HTTPException(status_code=500, detail=str(error))
 
 
+@router.get("/messages/showroom/{post_id}/{user_id}/sync")
+def sync_showroom_transaction_conversation(
+    request: Request,
+    post_id: UUID,
+    user_id: UUID,
+    after: str,
+    limit: int = 30,
+    wait: int = 0,
+):
+    sub = get_current_user_sub(request)
+
+    try:
+        return message_service.sync_showroom_transaction_conversation(
+            sub,
+            str(user_id),
+            str(post_id),
+            after,
+            limit=limit,
+            wait_seconds=wait,
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=404, detail=str(error))
+    except PermissionError as error:
+        raise HTTPException(status_code=403, detail=str(error))
+    except RuntimeError as error:
+        raise HTTPException(status_code=500, detail=str(error))
+
+
 @router.post("/messages/showroom/{post_id}/{user_id}")
 def send_showroom_transaction_message(
     request: Request,
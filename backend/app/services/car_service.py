@@ -1,13 +1,18 @@
 # app/services/car_service.py
 
+import base64
+import binascii
+import json
 import os
 import time
 import uuid
+from datetime import datetime
 from urllib.parse import urlencode, urlparse
 
 from fastapi import HTTPException
 import requests
 
+from app.common.reference_cache import reference_cache
 from app.repositories import car_repository, user_repository
 from app.services import profile_image_service
 
@@ -40,16 +45,50 @@ def require_admin(sub):
     return user
 
 
+def _list_brands_cached(include_hidden=True, include_counts=False, only_with_cars=False):
+    # Reference reads go through the process-wide cache. Callers share the
+    # cached rows, so treat them as read-only.
+    return reference_cache.get_or_load(
+        ("brands", include_hidden, include_counts, only_with_cars),
+        lambda: car_repository.list_brands(
+            include_hidden=include_hidden,
+            include_counts=include_counts,
+            only_with_cars=only_with_cars,
+        ),
+    )
+
+
+def _list_makes_cached():
+    return reference_cache.get_or_load(("makes",), car_repository.list_makes)
+
+
+def _list_product_lines_cached():
+    return reference_cache.get_or_load(("product_lines",), car_repository.list_product_lines)
+
+
+def _find_reference(rows, id_value=None, name=None, brand_id=None):
+    for row in rows:
+        if id_value is not None and str(row["id"]) == str(id_value):
+            return row
+        if (
+            name is not None
+            and (row.get("name") or "").lower() == name.lower()
+            and (brand_id is None or str(row.get("brand_id")) == str(brand_id))
+        ):
+            return row
+    return None
+
+
 def list_public_brands():
     # Featured brands are the visible brands that currently have cars in the
     # public catalog. Counts are calculated dynamically so crawler/import flows
     # do not need to maintain a second denormalized counter.
-    return car_repository.list_brands(include_hidden=False, include_counts=True, only_with_cars=True)
+    return _list_brands_cached(include_hidden=False, include_counts=True, only_with_cars=True)
 
 
 def list_admin_brands(sub):
     require_admin(sub)
-    return car_repository.list_brands(include_hidden=True, include_counts=True, only_with_cars=False)
+    return _list_brands_cached(include_hidden=True, include_counts=True, only_with_cars=False)
 
 
 def update_admin_brand_visibility(sub, brand_id, is_visible):
@@ -60,6 +99,13 @@ def update_admin_brand_visibility(sub, brand_id, is_visible):
     return updated
 
 
+def reconcile_admin_car_stats(sub):
+    # Owner/like counters are trigger-maintained; this is the repair path for
+    # drift and can also be run on a schedule.
+    require_admin(sub)
+    return car_repository.reconcile_car_stats()
+
+
 def _can_include_hidden_brands(sub, include_hidden):
     if not include_hidden:
         return False
@@ -67,7 +113,41 @@ def _can_include_hidden_brands(sub, include_hidden):
     return bool(user and user.get("role") == "admin")
 
 
-def list_public_cars(sub, bid=None, keyword=None, car_images_state=None, limit=20, offset=0, include_hidden=False):
+def _encode_car_cursor(position):
+    crawled_date, car_id = position
+    payload = json.dumps(
+        [crawled_date.isoformat() if crawled_date is not None else None, str(car_id)],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_car_cursor(cursor):
+    # Cursors are opaque to the frontend; anything that does not round-trip
+    # is rejected instead of silently restarting from the first page.
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        crawled_date, car_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return (
+            datetime.fromisoformat(crawled_date) if crawled_date is not None else None,
+            str(uuid.UUID(car_id)),
+        )
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def list_public_cars(
+    sub,
+    bid=None,
+    keyword=None,
+    car_images_state=None,
+    limit=20,
+    offset=0,
+    include_hidden=False,
+    cursor_mode=False,
+    cursor=None,
+    include_total=False,
+):
     # Preserve the legacy `/cars` list contract while moving execution into the
     # FastAPI stack. The response still includes brand metadata because the
     # cars page depends on it for filter dropdowns.
@@ -106,14 +186,35 @@ def list_public_cars(sub, bid=None, keyword=None, car_images_state=None, limit=2
             """
         )
 
+    if cursor_mode or cursor:
+        # Opt-in keyset mode for the browse page. The offset contract below is
+        # kept for the legacy frontend; cursor pages skip the COUNT unless the
+        # caller explicitly asks for a total. The page size is bounded: the
+        # cursor and page count are both derived from it.
+        result = car_repository.list_public_cars(
+            filters=filters,
+            values=values,
+            user_id=user["id"] if user else None,
+            limit=min(max(int(limit or 20), 1), 100),
+            cursor_mode=True,
+            after=_decode_car_cursor(cursor) if cursor else None,
+            include_total=include_total,
+        )
+        if result["nextCursor"] is not None:
+            result["nextCursor"] = _encode_car_cursor(result["nextCursor"])
+        result["brands"] = _list_brands_cached()
+        return result
+
     result = car_repository.list_public_cars(
         filters=filters,
         values=values,
         user_id=user["id"] if user else None,
-        limit=limit,
-        offset=offset,
+        # Legacy callers may ask for large pages; only rule out sizes that
+        # cannot paginate.
+        limit=max(int(limit or 20), 1),
+        offset=max(int(offset or 0), 0),
     )
-    result["brands"] = car_repository.list_brands()
+    result["brands"] = _list_brands_cached()
     return result
 
 
@@ -199,7 +300,7 @@ def _resolve_brand(payload):
     brand_name = _normalize_lookup_name(payload.get("brand"))
 
     if brand_id:
-        brand = car_repository.get_brand_by_id(brand_id)
+        brand = _find_reference(_list_brands_cached(), id_value=brand_id) or car_repository.get_brand_by_id(brand_id)
         if not brand:
             raise HTTPException(status_code=400, detail="Selected brand not found")
         return brand
@@ -207,7 +308,13 @@ def _resolve_brand(payload):
     if not brand_name:
         raise HTTPException(status_code=400, detail="Brand is required")
 
-    return car_repository.get_brand_by_name(brand_name) or car_repository.create_brand(brand_name)
+    # A cache miss still checks the database before creating, so a brand added
+    # by another container since the last load is never duplicated.
+    return (
+        _find_reference(_list_brands_cached(), name=brand_name)
+        or car_repository.get_brand_by_name(brand_name)
+        or car_repository.create_brand(brand_name)
+    )
 
 
 def _resolve_make(payload):
@@ -215,7 +322,7 @@ def _resolve_make(payload):
     make_name = _normalize_lookup_name(payload.get("make"))
 
     if make_id:
-        make = car_repository.get_make_by_id(make_id)
+        make = _find_reference(_list_makes_cached(), id_value=make_id) or car_repository.get_make_by_id(make_id)
         if not make:
             raise HTTPException(status_code=400, detail="Selected make not found")
         return make
@@ -223,7 +330,11 @@ def _resolve_make(payload):
     if not make_name:
         return None
 
-    return car_repository.get_make_by_name(make_name) or car_repository.create_make(make_name)
+    return (
+        _find_reference(_list_makes_cached(), name=make_name)
+        or car_repository.get_make_by_name(make_name)
+        or car_repository.create_make(make_name)
+    )
 
 
 def _resolve_product_line(payload, brand_id):
@@ -231,7 +342,10 @@ def _resolve_product_line(payload, brand_id):
     product_line_name = _normalize_lookup_name(payload.get("product_line"))
 
     if product_line_id:
-        product_line = car_repository.get_product_line_by_id(product_line_id)
+        product_line = (
+            _find_reference(_list_product_lines_cached(), id_value=product_line_id)
+            or car_repository.get_product_line_by_id(product_line_id)
+        )
         if not product_line:
             raise HTTPException(status_code=400, detail="Selected product line not found")
         return product_line
@@ -240,7 +354,8 @@ def _resolve_product_line(payload, brand_id):
         return None
 
     return (
-        car_repository.get_product_line_by_name_and_brand(product_line_name, brand_id)
+        _find_reference(_list_product_lines_cached(), name=product_line_name, brand_id=brand_id)
+        or car_repository.get_product_line_by_name_and_brand(product_line_name, brand_id)
         or car_repository.create_product_line(product_line_name, brand_id)
     )
 
@@ -711,9 +826,9 @@ def get_admin_car_form_options(sub):
     require_admin(sub)
     return {
         # Admin editors still need access to hidden brands for maintenance.
-        "brands": car_repository.list_brands(include_hidden=True),
-        "makes": car_repository.list_makes(),
-        "productLines": car_repository.list_product_lines(),
+        "brands": _list_brands_cached(include_hidden=True),
+        "makes": _list_makes_cached(),
+        "productLines": _list_product_lines_cached(),
     }
 
 
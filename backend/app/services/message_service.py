@@ -1,14 +1,24 @@
+import base64
+import binascii
+import hashlib
 import json
 import os
+import random
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from datetime import datetime, timezone
 
 import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeSerializer
 from botocore.exceptions import ClientError
 
+from app.common.db import release_request_connection
+from app.common.lookup_cache import cached_lookup, post_header_key, relationship_key, user_by_id_key, user_by_sub_key
+from app.common.rate_limit import RateLimitRule, raise_for_cancelled_hit, rate_limit_transact_item, rate_limited
 from app.repositories import showroom_repository, user_repository
 
 
@@ -17,13 +27,43 @@ MESSAGING_WS_URL = os.environ.get("MESSAGING_WS_URL", "")
 MESSAGING_WS_CALLBACK_URL = os.environ.get("MESSAGING_WS_CALLBACK_URL", "")
 DEFAULT_THREAD_PAGE_SIZE = 30
 MAX_THREAD_PAGE_SIZE = 50
+# Delta sync may hold the request open this long waiting for a new message.
+# Each waiting client occupies a whole Lambda execution environment (one
+# request per container) and spends a query per poll, so N idle clients
+# polling back to back keep about N containers busy and cost N * polls reads
+# per wait. The wait is kept short and the polls back off; websocket delivery
+# remains the primary path and long polling only covers missed events.
+MAX_SYNC_WAIT_SECONDS = 5
+SYNC_POLL_INITIAL_INTERVAL_SECONDS = 0.25
+SYNC_POLL_MAX_INTERVAL_SECONDS = 2.0
 MAX_MESSAGE_LENGTH = 500
 MAX_MESSAGES_PER_MINUTE = 20
 MAX_MESSAGES_PER_CONVERSATION_PER_MINUTE = 8
 MAX_NEW_REQUESTS_PER_HOUR = 12
-RATE_LIMIT_TTL_SECONDS = 3 * 60 * 60
 MAX_TRANSACTION_REVIEW_COMMENT_LENGTH = 1000
+MARK_READ_MAX_ATTEMPTS = 3
+WS_FANOUT_MAX_WORKERS = int(os.environ.get("WS_FANOUT_MAX_WORKERS", "8"))
+# "inline" posts websocket events inside the request. "outbox" writes them to
+# OUTBOX# rows in the same transaction as the message; app.outbox_handler
+# delivers them from the table stream and retries from a scheduled sweep.
+MESSAGING_DELIVERY_MODE = os.environ.get("MESSAGING_DELIVERY_MODE", "inline").strip().lower()
+OUTBOX_SHARD_COUNT = int(os.environ.get("MESSAGING_OUTBOX_SHARDS", "4"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("MESSAGING_OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_SECONDS = 5
+OUTBOX_STREAM_GRACE_SECONDS = int(os.environ.get("MESSAGING_OUTBOX_GRACE_SECONDS", "30"))
+OUTBOX_CLAIM_SECONDS = 60
+OUTBOX_DEAD_LETTER_TTL_SECONDS = 14 * 24 * 60 * 60
+# The index backfill runs inside the 30 s API Lambda, so each call does a
+# bounded slice of the table scan and hands back a cursor for the next one.
+BACKFILL_SCAN_PAGE_SIZE = 200
+BACKFILL_MAX_PAGES = 20
+BACKFILL_TIME_BUDGET_SECONDS = 20
+INBOX_INDEX_NAME = "GSI1"
+ORDER_INDEX_NAME = "GSI2"
 dynamodb = boto3.resource("dynamodb")
+_type_serializer = TypeSerializer()
+_websocket_client_instance = None
+_websocket_client_lock = threading.Lock()
 
 
 def _table():
@@ -49,6 +89,13 @@ def _user_pk(user_id):
     return f"USER#{user_id}"
 
 
+def _unread_total_key(user_id):
+    return {
+        "pk": _user_pk(user_id),
+        "sk": "UNREAD",
+    }
+
+
 def _iso_now():
     return datetime.now(timezone.utc).isoformat()
 
@@ -69,6 +116,37 @@ def _message_sort_key(created_at, message_id):
     return f"MSG#{created_at}#{message_id}"
 
 
+def _inbox_index_fields(user_id, conversation_id, last_message_at, seller_user_id=None, buyer_user_id=None):
+    # Index keys for the inbox row owned by user_id; see UserMessagingDynamoConstruct.
+    fields = {
+        "gsi1pk": f"INBOX#{user_id}",
+        "gsi1sk": f"{last_message_at}#{conversation_id}",
+    }
+    if seller_user_id and buyer_user_id:
+        role = "selling" if str(user_id) == str(seller_user_id) else "buying"
+        fields["gsi2pk"] = f"ORDER#{user_id}#{role}"
+        fields["gsi2sk"] = fields["gsi1sk"]
+    return fields
+
+
+def _encode_page_cursor(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    payload = json.dumps(last_evaluated_key, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_page_cursor(cursor, index_pk_name):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict) or not all(isinstance(key.get(name), str) for name in ("pk", "sk", index_pk_name)):
+        raise ValueError("Invalid cursor")
+    return key
+
+
 def _message_to_response(item):
     return {
         "id": item.get("messageId"),
@@ -80,26 +158,49 @@ def _message_to_response(item):
 
 
 def _websocket_client():
+    # boto3 clients are thread-safe, so one per container is shared by every
+    # fanout worker. MESSAGING_WS_CALLBACK_URL can point at a local stub of
+    # the API Gateway management API.
+    global _websocket_client_instance
+
     if not MESSAGING_WS_CALLBACK_URL:
         raise RuntimeError("MESSAGING_WS_CALLBACK_URL is not configured")
-    return boto3.client("apigatewaymanagementapi", endpoint_url=MESSAGING_WS_CALLBACK_URL)
-
-
-def _get_relationship_or_raise(actor_sub, target_user_id):
-    actor = user_repository.get_user_by_sub(actor_sub)
+    if _websocket_client_instance is None:
+        with _websocket_client_lock:
+            if _websocket_client_instance is None:
+                _websocket_client_instance = boto3.client("apigatewaymanagementapi", endpoint_url=MESSAGING_WS_CALLBACK_URL)
+    return _websocket_client_instance
+
+
+def _get_relationship_or_raise(actor_sub, target_user_id, fresh=False):
+    # Every send, read and accept resolves the same three rows, so they go
+    # through the per-request memo and short-TTL process cache. Writes pass
+    # fresh=True so a block or unfollow made through another container is
+    # honoured at once rather than after the cache TTL.
+    actor = cached_lookup(user_by_sub_key(actor_sub), lambda: user_repository.get_user_by_sub(actor_sub), fresh=fresh)
     if not actor:
         raise ValueError("Viewer not found")
 
-    target_user = user_repository.get_user_by_id(target_user_id)
+    target_user = cached_lookup(
+        user_by_id_key(target_user_id),
+        lambda: user_repository.get_user_by_id(target_user_id),
+        fresh=fresh,
+    )
     if not target_user:
         raise ValueError("User not found")
 
-    relationship = user_repository.get_follow_status(actor["id"], target_user_id)
+    actor_id = str(actor["id"])
+    target_id = str(target_user["id"])
+    relationship = cached_lookup(
+        relationship_key(actor_id, target_id),
+        lambda: user_repository.get_follow_status(actor_id, target_id),
+        fresh=fresh,
+    )
     return actor, target_user, relationship
 
 
-def _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=None):
-    actor, target_user, relationship = _get_relationship_or_raise(actor_sub, target_user_id)
+def _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=None, fresh=False):
+    actor, target_user, relationship = _get_relationship_or_raise(actor_sub, target_user_id, fresh=fresh)
     actor_id = str(actor["id"])
     target_id = str(target_user["id"])
 
@@ -120,13 +221,21 @@ def _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=No
     if not showroom_post_id:
         return context
 
-    showroom_post = showroom_repository.get_showroom_post(showroom_post_id, actor_id=actor_id)
+    showroom_post = cached_lookup(
+        post_header_key(showroom_post_id),
+        lambda: showroom_repository.get_showroom_post_header(showroom_post_id),
+        fresh=fresh,
+    )
     if not showroom_post:
         raise ValueError("Selling post not found")
-    if showroom_post.get("post_type") != "selling":
-        raise ValueError("Only selling posts support transaction chats")
 
     seller_user_id = str((showroom_post.get("author") or {}).get("id") or "")
+    # The header is shared across viewers, so the block filter
+    # get_showroom_post applied in SQL is checked against the relationship.
+    if seller_user_id == target_id and (relationship.get("blocking") or relationship.get("blockedBy")):
+        raise ValueError("Selling post not found")
+    if showroom_post.get("post_type") != "selling":
+        raise ValueError("Only selling posts support transaction chats")
     if not seller_user_id:
         raise ValueError("Selling post is missing a seller")
     if seller_user_id not in {actor_id, target_id}:
@@ -156,12 +265,13 @@ def _get_conversation_meta(conversation_id):
     ).get("Item")
 
 
-def _get_conversation_message_page(conversation_id, limit=DEFAULT_THREAD_PAGE_SIZE, before=None):
+def _get_conversation_message_page(conversation_id, limit=DEFAULT_THREAD_PAGE_SIZE, before=None, consistent_read=False):
     page_limit = max(1, min(limit, MAX_THREAD_PAGE_SIZE))
     query_kwargs = {
         "KeyConditionExpression": Key("pk").eq(_conversation_pk(conversation_id)),
         "ScanIndexForward": False,
         "Limit": page_limit + 5,
+        "ConsistentRead": consistent_read,
     }
     if before:
         query_kwargs["KeyConditionExpression"] = (
@@ -181,11 +291,61 @@ def _get_conversation_message_page(conversation_id, limit=DEFAULT_THREAD_PAGE_SI
     return message_items, next_cursor, has_more
 
 
-def _get_connection_items(user_id):
+def _get_conversation_messages_after(conversation_id, after, limit=DEFAULT_THREAD_PAGE_SIZE):
+    # Oldest first, strictly newer than the client's last seen sort key.
+    page_limit = max(1, min(limit, MAX_THREAD_PAGE_SIZE))
     response = _table().query(
-        KeyConditionExpression=Key("pk").eq(_user_pk(user_id)) & Key("sk").begins_with("WS#"),
+        KeyConditionExpression=Key("pk").eq(_conversation_pk(conversation_id)) & Key("sk").gt(after),
+        ScanIndexForward=True,
+        Limit=page_limit + 1,
+    )
+    message_items = [
+        item
+        for item in response.get("Items", [])
+        if item.get("itemType") == "MESSAGE"
+    ]
+    has_more = len(message_items) > page_limit or bool(response.get("LastEvaluatedKey"))
+    return message_items[:page_limit], has_more
+
+
+def _get_conversation_sync_state(actor_id, conversation_id):
+    # META and the viewer's inbox row in one BatchGetItem.
+    meta_key = {"pk": _conversation_pk(conversation_id), "sk": "META"}
+    inbox_key = {"pk": _user_pk(actor_id), "sk": f"CONV#{conversation_id}"}
+    response = dynamodb.batch_get_item(
+        RequestItems={MESSAGING_TABLE_NAME: {"Keys": [meta_key, inbox_key]}}
+    )
+    meta = None
+    inbox_item = None
+    for item in response.get("Responses", {}).get(MESSAGING_TABLE_NAME, []):
+        if item.get("sk") == "META":
+            meta = item
+        else:
+            inbox_item = item
+    return meta, inbox_item
+
+
+def _get_connection_ids(user_id):
+    # Uses the low-level client, which unlike the Table resource is safe to
+    # share across the fanout worker threads. TTL deletion lags, so rows past
+    # their expiresAt (no heartbeat) are filtered out here; rows written
+    # before connections carried a TTL have no expiresAt and still count.
+    response = dynamodb.meta.client.query(
+        TableName=MESSAGING_TABLE_NAME,
+        KeyConditionExpression="pk = :pk AND begins_with(sk, :prefix)",
+        FilterExpression="attribute_not_exists(expiresAt) OR expiresAt > :now",
+        ExpressionAttributeValues={
+            ":pk": {"S": _user_pk(user_id)},
+            ":prefix": {"S": "WS#"},
+            ":now": {"N": str(_epoch_now())},
+        },
+        ProjectionExpression="connectionId",
     )
-    return response.get("Items", [])
+    return [
+        item["connectionId"]["S"]
+        for item in response.get("Items", [])
+        if item.get("connectionId", {}).get("S")
+    ]
 
 
 def _conversation_mode(relationship, meta):
@@ -218,131 +378,434 @@ def _can_send(actor_id, relationship, meta):
     return True, None
 
 
-def _rate_limit_pk(user_id):
-    return f"RATE#{user_id}"
+def _serialize_key(key):
+    return {name: _type_serializer.serialize(value) for name, value in key.items()}
 
 
-def _increment_rate_counter(user_id, bucket_key, ttl_seconds=RATE_LIMIT_TTL_SECONDS):
-    response = _table().update_item(
-        Key={
-            "pk": _rate_limit_pk(user_id),
-            "sk": bucket_key,
-        },
-        UpdateExpression="ADD #count :inc SET itemType = :item_type, expiresAt = :expires_at, updatedAt = :updated_at",
-        ExpressionAttributeNames={
-            "#count": "count",
-        },
-        ExpressionAttributeValues={
-            ":inc": 1,
-            ":item_type": "RATE_LIMIT",
-            ":expires_at": _epoch_now() + ttl_seconds,
-            ":updated_at": _iso_now(),
-        },
-        ReturnValues="ALL_NEW",
-    )
-    return int((response.get("Attributes") or {}).get("count", 0) or 0)
+def _transact_put(item, condition_expression=None):
+    put = {
+        "TableName": MESSAGING_TABLE_NAME,
+        "Item": _serialize_key(item),
+    }
+    if condition_expression:
+        put["ConditionExpression"] = condition_expression
+    return {"Put": put}
+
+
+def _transact_update(key, set_fields=None, add_fields=None, condition_expression=None, condition_values=None):
+    names = {}
+    values = {}
+    set_clauses = []
+    add_clauses = []
+    for index, (field, value) in enumerate((set_fields or {}).items()):
+        names[f"#s{index}"] = field
+        values[f":s{index}"] = _type_serializer.serialize(value)
+        set_clauses.append(f"#s{index} = :s{index}")
+    for index, (field, value) in enumerate((add_fields or {}).items()):
+        names[f"#a{index}"] = field
+        values[f":a{index}"] = _type_serializer.serialize(value)
+        add_clauses.append(f"#a{index} :a{index}")
+
+    expression_parts = []
+    if set_clauses:
+        expression_parts.append("SET " + ", ".join(set_clauses))
+    if add_clauses:
+        expression_parts.append("ADD " + ", ".join(add_clauses))
+
+    update = {
+        "TableName": MESSAGING_TABLE_NAME,
+        "Key": _serialize_key(key),
+        "UpdateExpression": " ".join(expression_parts),
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+    if condition_expression:
+        update["ConditionExpression"] = condition_expression
+        for name, value in (condition_values or {}).items():
+            values[name] = _type_serializer.serialize(value)
+    return {"Update": update}
+
+
+def _rate_limit_rules(actor_id, target_id, relationship, meta):
+    conversation_hash = hashlib.sha1(_conversation_id(actor_id, target_id).encode("utf-8")).hexdigest()[:16]
+    rules = [
+        RateLimitRule(
+            "msg",
+            MAX_MESSAGES_PER_MINUTE,
+            60,
+            "You are sending messages too quickly. Please wait a minute and try again.",
+        ),
+        RateLimitRule(
+            f"convmsg.{conversation_hash}",
+            MAX_MESSAGES_PER_CONVERSATION_PER_MINUTE,
+            60,
+            "You are sending too many messages in this conversation too quickly. Please slow down.",
+        ),
+    ]
+    if not relationship.get("isFriend") and not meta:
+        rules.append(RateLimitRule(
+            "intro",
+            MAX_NEW_REQUESTS_PER_HOUR,
+            60 * 60,
+            "You have reached the limit for starting new direct message requests this hour.",
+        ))
+    return rules
+
+
+def _write_message(actor_id, target_id, relationship, rate_limit_meta, meta_fields, message_item, inbox_fields, ws_events):
+    # The send limits, the conversation meta, the message and both inbox rows
+    # go out as one TransactWriteItems call, so a send that fails does not use
+    # quota and a send over the limit writes nothing. The recipient's unread
+    # count is an atomic ADD, so concurrent sends cannot overwrite each
+    # other's increments. In outbox mode the websocket events ride in the
+    # same transaction.
+    rate_limit_subject = f"user:{actor_id}"
+    rate_limit_rules = _rate_limit_rules(actor_id, target_id, relationship, rate_limit_meta)
+    now = time.time()
+    rate_limit_item = rate_limit_transact_item(rate_limit_subject, rate_limit_rules, now)
+
+    conversation_id = message_item["conversationId"]
+    transact_items = [
+        _transact_update(
+            {
+                "pk": _conversation_pk(conversation_id),
+                "sk": "META",
+            },
+            set_fields=meta_fields,
+        ),
+        _transact_put(message_item, condition_expression="attribute_not_exists(sk)"),
+        _transact_update(
+            {
+                "pk": _user_pk(actor_id),
+                "sk": f"CONV#{conversation_id}",
+            },
+            set_fields={
+                **inbox_fields,
+                **_inbox_index_fields(
+                    actor_id,
+                    conversation_id,
+                    inbox_fields["lastMessageAt"],
+                    inbox_fields.get("sellerUserId"),
+                    inbox_fields.get("buyerUserId"),
+                ),
+                "partnerUserId": target_id,
+                "unreadCount": 0,
+            },
+        ),
+        _transact_update(
+            {
+                "pk": _user_pk(target_id),
+                "sk": f"CONV#{conversation_id}",
+            },
+            set_fields={
+                **inbox_fields,
+                **_inbox_index_fields(
+                    target_id,
+                    conversation_id,
+                    inbox_fields["lastMessageAt"],
+                    inbox_fields.get("sellerUserId"),
+                    inbox_fields.get("buyerUserId"),
+                ),
+                "partnerUserId": actor_id,
+            },
+            add_fields={"unreadCount": 1},
+        ),
+        _transact_update(_unread_total_key(target_id), add_fields={"unreadCount": 1}),
+    ]
+    if MESSAGING_DELIVERY_MODE == "outbox":
+        transact_items.append(_transact_put(_outbox_item(ws_events)))
+
+    if rate_limit_item is None:
+        # In-process limits cannot join the transaction; the hit is handed
+        # back if the write fails.
+        with rate_limited(rate_limit_subject, rate_limit_rules):
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+    else:
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=[rate_limit_item, *transact_items])
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") == "TransactionCanceledException":
+                reasons = error.response.get("CancellationReasons") or []
+                raise_for_cancelled_hit(rate_limit_rules, reasons[0] if reasons else None, now)
+            raise
 
+    if MESSAGING_DELIVERY_MODE != "outbox":
+        _fanout_ws_events(ws_events)
 
-def _enforce_rate_limits(actor_id, target_id, relationship, meta):
-    current_time = datetime.now(timezone.utc)
-    minute_bucket = current_time.strftime("%Y%m%d%H%M")
-    hour_bucket = current_time.strftime("%Y%m%d%H")
-    conversation_id = _conversation_id(actor_id, target_id)
 
-    message_count = _increment_rate_counter(actor_id, f"MSG#{minute_bucket}")
-    if message_count > MAX_MESSAGES_PER_MINUTE:
-        raise PermissionError("You are sending messages too quickly. Please wait a minute and try again.")
+def _build_sent_message_response(actor_id, target_id, relationship, meta, conversation_id):
+    # A consistent tail read so the page always includes the message just
+    # written, in the same shape the thread endpoint returns.
+    messages, next_cursor, has_more = _get_conversation_message_page(conversation_id, consistent_read=True)
+    actor_meta = dict(meta)
+    actor_meta["unreadCount"] = 0
+    return _build_conversation_response(
+        actor_id,
+        target_id,
+        relationship,
+        actor_meta,
+        messages,
+        next_cursor=next_cursor,
+        has_more=has_more,
+    )
 
-    conversation_count = _increment_rate_counter(actor_id, f"CONVMSG#{conversation_id}#{minute_bucket}")
-    if conversation_count > MAX_MESSAGES_PER_CONVERSATION_PER_MINUTE:
-        raise PermissionError("You are sending too many messages in this conversation too quickly. Please slow down.")
 
-    if not relationship.get("isFriend") and not meta:
-        intro_count = _increment_rate_counter(actor_id, f"INTRO#{hour_bucket}")
-        if intro_count > MAX_NEW_REQUESTS_PER_HOUR:
-            raise PermissionError("You have reached the limit for starting new direct message requests this hour.")
+def _post_ws_payload(client, user_id, connection_id, data, payload_type):
+    try:
+        client.post_to_connection(ConnectionId=connection_id, Data=data)
+    except ClientError as error:
+        code = error.response.get("Error", {}).get("Code")
+        if code == "GoneException":
+            return "stale"
+        print(
+            "messaging websocket post_to_connection failed",
+            json.dumps(
+                {
+                    "userId": user_id,
+                    "connectionId": connection_id,
+                    "code": code,
+                    "payloadType": payload_type,
+                }
+            ),
+        )
+        return "failed"
+    except Exception as error:
+        print(
+            "messaging websocket unexpected failure",
+            json.dumps(
+                {
+                    "userId": user_id,
+                    "connectionId": connection_id,
+                    "payloadType": payload_type,
+                    "error": str(error),
+                }
+            ),
+        )
+        return "failed"
+    return "delivered"
+
+
+def _delete_stale_connections(stale_connections):
+    with _table().batch_writer() as batch:
+        for user_id, connection_id in stale_connections:
+            batch.delete_item(
+                Key={
+                    "pk": _user_pk(user_id),
+                    "sk": f"WS#{connection_id}",
+                }
+            )
+            batch.delete_item(
+                Key={
+                    "pk": f"CONN#{connection_id}",
+                    "sk": "META",
+                }
+            )
 
 
-def _send_ws_event(user_id, payload):
+def _fanout_ws_events(events):
+    # events is a list of (user_id, payload). Each payload is serialized once,
+    # every connection of every recipient is posted to concurrently, and
+    # connections API Gateway reports as gone are removed in one batch write.
     try:
         client = _websocket_client()
     except RuntimeError:
-        return
+        return None
 
-    connection_items = _get_connection_items(user_id)
-    print(
-        "messaging websocket delivery attempt",
-        json.dumps(
+    started = time.perf_counter()
+    events = [(str(user_id), payload) for user_id, payload in events]
+    with ThreadPoolExecutor(max_workers=max(1, WS_FANOUT_MAX_WORKERS)) as executor:
+        recipient_ids = list(dict.fromkeys(user_id for user_id, _ in events))
+        connections_by_user = dict(zip(recipient_ids, executor.map(_get_connection_ids, recipient_ids)))
+
+        deliveries = []
+        for user_id, payload in events:
+            data = json.dumps(payload).encode("utf-8")
+            for connection_id in connections_by_user.get(user_id, []):
+                deliveries.append((user_id, connection_id, data, payload.get("type")))
+
+        outcomes = list(executor.map(lambda delivery: _post_ws_payload(client, *delivery), deliveries))
+
+    stale_connections = list(dict.fromkeys(
+        (delivery[0], delivery[1])
+        for delivery, outcome in zip(deliveries, outcomes)
+        if outcome == "stale"
+    ))
+    if stale_connections:
+        _delete_stale_connections(stale_connections)
+
+    metrics = {
+        "payloadTypes": sorted({payload.get("type") for _, payload in events if payload.get("type")}),
+        "recipientCount": len(recipient_ids),
+        "connectionCount": len(deliveries),
+        "deliveredCount": outcomes.count("delivered"),
+        "staleCount": outcomes.count("stale"),
+        "failedCount": outcomes.count("failed"),
+        "latencyMs": round((time.perf_counter() - started) * 1000, 2),
+    }
+    print("messaging websocket fanout", json.dumps(metrics))
+    return metrics
+
+
+def _outbox_item(events):
+    created_at = _iso_now()
+    outbox_id = str(uuid.uuid4())
+    return {
+        "pk": f"OUTBOX#PENDING#{random.randrange(max(1, OUTBOX_SHARD_COUNT))}",
+        "sk": f"{created_at}#{outbox_id}",
+        "itemType": "WS_OUTBOX",
+        "outboxId": outbox_id,
+        "events": [
             {
-                "userId": user_id,
-                "payloadType": payload.get("type"),
-                "connectionCount": len(connection_items),
+                "userId": str(user_id),
+                "payload": payload,
             }
-        ),
-    )
+            for user_id, payload in events
+        ],
+        "attempts": 0,
+        # The stream consumer delivers right away; the sweep only picks up
+        # rows that are still pending after this grace period.
+        "availableAt": _epoch_now() + OUTBOX_STREAM_GRACE_SECONDS,
+        "createdAt": created_at,
+    }
+
+
+def _deliver_ws_events(events):
+    if MESSAGING_DELIVERY_MODE == "outbox":
+        _table().put_item(Item=_outbox_item(events))
+        return None
+    return _fanout_ws_events(events)
 
-    for item in connection_items:
-        connection_id = item.get("connectionId")
-        if not connection_id:
-            continue
 
+def _send_ws_event(user_id, payload):
+    return _deliver_ws_events([(user_id, payload)])
+
+
+def process_message_outbox_item(item):
+    # Delivery is at least once. A retry re-sends every event in the row, which
+    # is harmless because the events only tell clients to refetch.
+    key = {
+        "pk": item["pk"],
+        "sk": item["sk"],
+    }
+    error_message = None
+    try:
+        metrics = _fanout_ws_events([
+            (event.get("userId"), event.get("payload") or {})
+            for event in item.get("events") or []
+        ])
+        if metrics and metrics["failedCount"]:
+            error_message = f"{metrics['failedCount']} post_to_connection calls failed"
+    except Exception as error:
+        error_message = str(error)
+
+    if error_message is None:
+        _table().delete_item(Key=key)
+        return "delivered"
+
+    attempts = int(item.get("attempts", 0) or 0) + 1
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        dead_item = {
+            **item,
+            "pk": "OUTBOX#DEAD",
+            # A distinct itemType keeps the dead row's INSERT out of the
+            # stream consumer's filter.
+            "itemType": "WS_OUTBOX_DEAD",
+            "attempts": attempts,
+            "lastError": error_message[:500],
+            "deadLetteredAt": _iso_now(),
+            "expiresAt": _epoch_now() + OUTBOX_DEAD_LETTER_TTL_SECONDS,
+        }
         try:
-            client.post_to_connection(
-                ConnectionId=connection_id,
-                Data=json.dumps(payload).encode("utf-8"),
-            )
-        except ClientError as error:
-            code = error.response.get("Error", {}).get("Code")
-            if code == "GoneException":
-                _table().delete_item(
-                    Key={
-                        "pk": _user_pk(user_id),
-                        "sk": f"WS#{connection_id}",
-                    }
-                )
-                _table().delete_item(
-                    Key={
-                        "pk": f"CONN#{connection_id}",
-                        "sk": "META",
+            dynamodb.meta.client.transact_write_items(TransactItems=[
+                _transact_put(dead_item),
+                {
+                    "Delete": {
+                        "TableName": MESSAGING_TABLE_NAME,
+                        "Key": _serialize_key(key),
+                        "ConditionExpression": "attribute_exists(pk)",
                     }
-                )
-                continue
-            print(
-                "messaging websocket post_to_connection failed",
-                json.dumps(
-                    {
-                        "userId": user_id,
-                        "connectionId": connection_id,
-                        "code": code,
-                        "payloadType": payload.get("type"),
-                    }
-                ),
-            )
-            continue
-        except Exception as error:
-            print(
-                "messaging websocket unexpected failure",
-                json.dumps(
-                    {
-                        "userId": user_id,
-                        "connectionId": connection_id,
-                        "payloadType": payload.get("type"),
-                        "error": str(error),
-                    }
-                ),
-            )
-            continue
-        else:
-            print(
-                "messaging websocket delivered",
-                json.dumps(
-                    {
-                        "userId": user_id,
-                        "connectionId": connection_id,
-                        "payloadType": payload.get("type"),
-                    }
-                ),
-            )
+                },
+            ])
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+                raise
+            # Another delivery of the same row succeeded and deleted it.
+            return "delivered"
+        print(
+            "messaging outbox dead-lettered",
+            json.dumps({"outboxId": item.get("outboxId"), "attempts": attempts, "error": error_message}),
+        )
+        return "dead_lettered"
+
+    try:
+        # Conditional so a row another delivery already deleted is not
+        # recreated as a partial item without its events.
+        _table().update_item(
+            Key=key,
+            UpdateExpression="SET attempts = :attempts, availableAt = :available_at, lastError = :error",
+            ConditionExpression="attribute_exists(pk)",
+            ExpressionAttributeValues={
+                ":attempts": attempts,
+                ":available_at": _epoch_now() + OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1)),
+                ":error": error_message[:500],
+            },
+        )
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        return "delivered"
+    print(
+        "messaging outbox retry scheduled",
+        json.dumps({"outboxId": item.get("outboxId"), "attempts": attempts, "error": error_message}),
+    )
+    return "retrying"
+
+
+def _claim_outbox_item(item):
+    # Pushes availableAt forward so concurrent sweeps skip this row while it
+    # is being delivered.
+    try:
+        _table().update_item(
+            Key={
+                "pk": item["pk"],
+                "sk": item["sk"],
+            },
+            UpdateExpression="SET availableAt = :claimed_until",
+            ConditionExpression="availableAt = :seen",
+            ExpressionAttributeValues={
+                ":claimed_until": _epoch_now() + OUTBOX_CLAIM_SECONDS,
+                ":seen": item.get("availableAt"),
+            },
+        )
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
+
+
+def drain_message_outbox(limit=25):
+    # The polling worker: delivers pending rows whose availableAt has passed.
+    # Runs on a schedule as the retry path, and locally against DynamoDB Local
+    # as the whole worker.
+    outcomes = {"delivered": 0, "retrying": 0, "dead_lettered": 0}
+    now = _epoch_now()
+    for shard in range(max(1, OUTBOX_SHARD_COUNT)):
+        query_kwargs = {
+            "KeyConditionExpression": Key("pk").eq(f"OUTBOX#PENDING#{shard}"),
+            "FilterExpression": Attr("availableAt").lte(now),
+        }
+        while sum(outcomes.values()) < limit:
+            response = _table().query(**query_kwargs)
+            for item in response.get("Items", []):
+                if sum(outcomes.values()) >= limit:
+                    break
+                if _claim_outbox_item(item):
+                    outcomes[process_message_outbox_item(item)] += 1
+            if not response.get("LastEvaluatedKey"):
+                break
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return outcomes
 
 
 def _build_conversation_response(actor_id, target_user_id, relationship, meta, messages, next_cursor=None, has_more=False):
@@ -498,6 +961,59 @@ def get_showroom_transaction_conversation(actor_sub, target_user_id, showroom_po
     )
 
 
+def _sync_conversation(context, after, limit, wait_seconds):
+    if not after or not after.startswith("MSG#"):
+        raise ValueError("Invalid sync cursor")
+
+    actor_id = context["actor_id"]
+    conversation_id = context["conversation_id"]
+    wait_seconds = max(0, min(wait_seconds or 0, MAX_SYNC_WAIT_SECONDS))
+    if wait_seconds:
+        # Everything below is DynamoDB; do not pin a Postgres connection
+        # for the length of the poll.
+        release_request_connection()
+    deadline = time.monotonic() + wait_seconds
+    interval = SYNC_POLL_INITIAL_INTERVAL_SECONDS
+    while True:
+        messages, has_more = _get_conversation_messages_after(conversation_id, after, limit=limit)
+        remaining = deadline - time.monotonic()
+        if messages or remaining <= 0:
+            break
+        # Quick first re-checks catch a reply that is already on its way;
+        # a quiet thread is then polled less and less often.
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, SYNC_POLL_MAX_INTERVAL_SECONDS)
+
+    meta, inbox_item = _get_conversation_sync_state(actor_id, conversation_id)
+    can_send, lock_reason = _can_send(actor_id, context["relationship"], meta)
+    return {
+        "conversationId": conversation_id,
+        "mode": _conversation_mode(context["relationship"], meta),
+        "canSend": can_send,
+        "lockReason": lock_reason,
+        "hasConversation": meta is not None,
+        "unreadCount": int((inbox_item or {}).get("unreadCount", 0) or 0),
+        "lastMessageAt": (inbox_item or {}).get("lastMessageAt"),
+        "transactionStatus": (meta or {}).get("transactionStatus") if context["conversation_type"] == "showroom_transaction" else None,
+        "messages": [_message_to_response(item) for item in messages],
+        "cursor": messages[-1]["sk"] if messages else after,
+        "hasMore": has_more,
+    }
+
+
+def sync_direct_conversation(actor_sub, target_user_id, after, limit=DEFAULT_THREAD_PAGE_SIZE, wait_seconds=0):
+    # Delta sync for reconnecting clients: only messages after the last seen
+    # sortKey plus the inbox counters, optionally long-polling until one
+    # arrives. Clients keep calling with the returned cursor while hasMore.
+    context = _resolve_conversation_context(actor_sub, target_user_id)
+    return _sync_conversation(context, after, limit, wait_seconds)
+
+
+def sync_showroom_transaction_conversation(actor_sub, target_user_id, showroom_post_id, after, limit=DEFAULT_THREAD_PAGE_SIZE, wait_seconds=0):
+    context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id)
+    return _sync_conversation(context, after, limit, wait_seconds)
+
+
 def create_socket_ticket(actor_sub):
     actor = user_repository.get_user_by_sub(actor_sub)
     if not actor:
@@ -505,7 +1021,9 @@ def create_socket_ticket(actor_sub):
     if not MESSAGING_WS_URL:
         raise RuntimeError("MESSAGING_WS_URL is not configured")
 
-    ticket = str(uuid.uuid4())
+    # The connect lambda reads the owner from the ticket itself so it can
+    # consume the ticket and register the connection in one transaction.
+    ticket = f"{actor['id']}.{uuid.uuid4()}"
     expires_at = _epoch_now() + 60
     _table().put_item(
         Item={
@@ -524,33 +1042,39 @@ def create_socket_ticket(actor_sub):
     }
 
 
-def list_direct_conversations(actor_sub):
+def list_direct_conversations(actor_sub, limit=50, cursor=None):
     actor = user_repository.get_user_by_sub(actor_sub)
     if not actor:
         raise ValueError("Viewer not found")
 
     actor_id = str(actor["id"])
-    response = _table().query(
-        KeyConditionExpression=Key("pk").eq(_user_pk(actor_id)),
-        ScanIndexForward=False,
-        Limit=50,
-    )
+    safe_limit = min(max(int(limit or 50), 1), 100)
+    query_kwargs = {
+        "IndexName": INBOX_INDEX_NAME,
+        "KeyConditionExpression": Key("gsi1pk").eq(f"INBOX#{actor_id}"),
+        "ScanIndexForward": False,
+        "Limit": safe_limit,
+    }
+    if cursor:
+        query_kwargs["ExclusiveStartKey"] = _decode_page_cursor(cursor, "gsi1pk")
+    response = _table().query(**query_kwargs)
     items = [
         item
         for item in response.get("Items", [])
-        if item.get("itemType") == "USER_CONVERSATION" and item.get("partnerUserId")
+        if item.get("partnerUserId")
     ]
     partner_ids = [item.get("partnerUserId") for item in items if item.get("partnerUserId")]
     partner_map = user_repository.get_users_by_ids(partner_ids)
+    relationship_map = user_repository.get_follow_statuses(actor_id, partner_ids)
 
     results = []
-    total_unread_count = 0
+    page_unread_count = 0
     for item in items:
         partner_id = item.get("partnerUserId")
-        relationship = user_repository.get_follow_status(actor_id, partner_id) if partner_id else {}
+        relationship = relationship_map.get(str(partner_id), {}) if partner_id else {}
         partner = partner_map.get(partner_id, {})
         unread_count = int(item.get("unreadCount", 0) or 0)
-        total_unread_count += unread_count
+        page_unread_count += unread_count
         results.append({
             "conversationId": item.get("conversationId"),
             "partnerUserId": partner_id,
@@ -583,11 +1107,116 @@ def list_direct_conversations(actor_sub):
             } if item.get("conversationType") == "showroom_transaction" else None,
         })
 
-    results.sort(key=lambda item: item.get("lastMessageAt") or "", reverse=True)
+    response_body = {
+        "items": results,
+        "pageUnreadCount": page_unread_count,
+        "limit": safe_limit,
+        "nextCursor": _encode_page_cursor(response.get("LastEvaluatedKey")),
+        "hasMore": bool(response.get("LastEvaluatedKey")),
+    }
+    if not cursor:
+        # Across every conversation, not just this page; read once per inbox
+        # load rather than on every page.
+        response_body["totalUnreadCount"] = _get_total_unread_count(actor_id)
+    return response_body
+
+
+def _get_total_unread_count(user_id):
+    # USER#<id> / UNREAD is moved by sends (+1) and mark-read (-n) in the same
+    # transactions as the inbox rows, so it stays equal to the sum of the
+    # user's unreadCount values without reading them.
+    item = _table().get_item(Key=_unread_total_key(user_id), ConsistentRead=True).get("Item") or {}
+    if item.get("seeded"):
+        return max(0, int(item.get("unreadCount", 0) or 0))
+    return _seed_total_unread_count(user_id)
+
+
+def _seed_total_unread_count(user_id):
+    # Inboxes that predate the counter get it once from their rows. A send or
+    # read landing while the rows are summed can be off by its own count
+    # until that conversation is next read.
+    total = 0
+    query_kwargs = {
+        "IndexName": INBOX_INDEX_NAME,
+        "KeyConditionExpression": Key("gsi1pk").eq(f"INBOX#{user_id}"),
+        "ProjectionExpression": "unreadCount",
+    }
+    while True:
+        response = _table().query(**query_kwargs)
+        total += sum(int(item.get("unreadCount", 0) or 0) for item in response.get("Items", []))
+        if not response.get("LastEvaluatedKey"):
+            break
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
+    try:
+        _table().update_item(
+            Key=_unread_total_key(user_id),
+            UpdateExpression="SET unreadCount = :total, seeded = :seeded, itemType = :item_type",
+            ConditionExpression="attribute_not_exists(seeded)",
+            ExpressionAttributeValues={
+                ":total": total,
+                ":seeded": True,
+                ":item_type": "UNREAD_TOTAL",
+            },
+        )
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        # Seeded concurrently; that value has been kept current since.
+        return _get_total_unread_count(user_id)
+    return total
+
+
+def backfill_conversation_index_keys(actor_sub, cursor=None, max_pages=BACKFILL_MAX_PAGES):
+    # One-off backfill of gsi1/gsi2 keys on inbox rows written before the
+    # indexes existed. Rows that already have them are skipped, so it can be
+    # re-run safely. Each call scans at most `max_pages` small pages and stops
+    # early near the API timeout; call again with the returned nextCursor
+    # until hasMore is false.
+    actor = user_repository.get_user_by_sub(actor_sub)
+    if not actor or actor.get("role") != "admin":
+        raise PermissionError("Admin access required")
+
+    table = _table()
+    deadline = time.monotonic() + BACKFILL_TIME_BUDGET_SECONDS
+    updated = 0
+    scan_kwargs = {
+        "FilterExpression": Attr("itemType").eq("USER_CONVERSATION") & Attr("gsi1pk").not_exists(),
+        "Limit": BACKFILL_SCAN_PAGE_SIZE,
+    }
+    if cursor:
+        scan_kwargs["ExclusiveStartKey"] = _decode_page_cursor(cursor, "pk")
+
+    last_evaluated_key = None
+    for _ in range(max(1, min(int(max_pages or 1), BACKFILL_MAX_PAGES))):
+        response = table.scan(**scan_kwargs)
+        for item in response.get("Items", []):
+            user_id = str(item["pk"])[len("USER#"):]
+            conversation_id = item.get("conversationId") or str(item["sk"])[len("CONV#"):]
+            index_fields = _inbox_index_fields(
+                user_id,
+                conversation_id,
+                item.get("lastMessageAt") or item.get("updatedAt") or "",
+                item.get("sellerUserId") if item.get("conversationType") == "showroom_transaction" else None,
+                item.get("buyerUserId") if item.get("conversationType") == "showroom_transaction" else None,
+            )
+            table.update_item(
+                Key={
+                    "pk": item["pk"],
+                    "sk": item["sk"],
+                },
+                UpdateExpression="SET " + ", ".join(f"{name} = :{name}" for name in index_fields),
+                ExpressionAttributeValues={f":{name}": value for name, value in index_fields.items()},
+            )
+            updated += 1
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key or time.monotonic() >= deadline:
+            break
+        scan_kwargs["ExclusiveStartKey"] = last_evaluated_key
     return {
-        "items": results,
-        "totalUnreadCount": total_unread_count,
+        "updated": updated,
+        "nextCursor": _encode_page_cursor(last_evaluated_key),
+        "hasMore": bool(last_evaluated_key),
     }
 
 
@@ -606,7 +1235,7 @@ def list_direct_conversation_partners(actor_sub):
     ]
 
 
-def list_showroom_transaction_history(actor_sub, role="selling", limit=20, offset=0):
+def list_showroom_transaction_history(actor_sub, role="selling", limit=20, offset=0, cursor=None, include_total=False):
     actor = user_repository.get_user_by_sub(actor_sub)
     if not actor:
         raise ValueError("Viewer not found")
@@ -617,36 +1246,57 @@ def list_showroom_transaction_history(actor_sub, role="selling", limit=20, offse
         raise ValueError("Invalid order history role")
 
     safe_limit = min(max(int(limit or 20), 1), 50)
-    safe_offset = max(int(offset or 0), 0)
-
-    response = _table().query(
-        KeyConditionExpression=Key("pk").eq(_user_pk(actor_id)),
-        ScanIndexForward=False,
-    )
-    items = [
-        item
-        for item in response.get("Items", [])
-        if item.get("itemType") == "USER_CONVERSATION"
-        and item.get("conversationType") == "showroom_transaction"
-        and item.get("showroomPostId")
-    ]
+    safe_offset = 0 if cursor else max(int(offset or 0), 0)
+    query_kwargs = {
+        "IndexName": ORDER_INDEX_NAME,
+        "KeyConditionExpression": Key("gsi2pk").eq(f"ORDER#{actor_id}#{normalized_role}"),
+        "ScanIndexForward": False,
+    }
 
-    filtered_items = []
-    for item in items:
-        seller_user_id = str(item.get("sellerUserId") or "")
-        buyer_user_id = str(item.get("buyerUserId") or "")
-        if normalized_role == "selling" and seller_user_id != actor_id:
-            continue
-        if normalized_role == "buying" and buyer_user_id != actor_id:
-            continue
-        filtered_items.append(item)
-
-    filtered_items.sort(key=lambda item: item.get("lastMessageAt") or "", reverse=True)
-    total = len(filtered_items)
-    page_items = filtered_items[safe_offset:safe_offset + safe_limit]
+    total = None
+    if include_total:
+        total = 0
+        count_kwargs = dict(query_kwargs, Select="COUNT")
+        while True:
+            count_response = _table().query(**count_kwargs)
+            total += int(count_response.get("Count", 0))
+            if not count_response.get("LastEvaluatedKey"):
+                break
+            count_kwargs["ExclusiveStartKey"] = count_response["LastEvaluatedKey"]
+
+    exhausted = False
+    if cursor:
+        query_kwargs["ExclusiveStartKey"] = _decode_page_cursor(cursor, "gsi2pk")
+    else:
+        # Offset paging is kept for older clients; it only reads keys up to the
+        # requested window rather than the whole history.
+        skipped = 0
+        while skipped < safe_offset:
+            skip_response = _table().query(
+                **query_kwargs,
+                Limit=safe_offset - skipped,
+                ProjectionExpression="pk, sk, gsi2pk, gsi2sk",
+            )
+            skipped += int(skip_response.get("Count", 0))
+            if not skip_response.get("LastEvaluatedKey"):
+                exhausted = True
+                break
+            query_kwargs["ExclusiveStartKey"] = skip_response["LastEvaluatedKey"]
+
+    if exhausted:
+        page_items = []
+        last_evaluated_key = None
+    else:
+        response = _table().query(**query_kwargs, Limit=safe_limit)
+        page_items = response.get("Items", [])
+        last_evaluated_key = response.get("LastEvaluatedKey")
 
     partner_ids = [item.get("partnerUserId") for item in page_items if item.get("partnerUserId")]
     partner_map = user_repository.get_users_by_ids(partner_ids)
+    reviewer_ids = showroom_repository.get_showroom_transaction_reviewer_ids(
+        (item.get("showroomPostId"), item.get("sellerUserId"), item.get("buyerUserId"))
+        for item in page_items
+    )
 
     return {
         "items": [
@@ -679,6 +1329,7 @@ def list_showroom_transaction_history(actor_sub, role="selling", limit=20, offse
                     item.get("showroomPostId"),
                     item.get("sellerUserId"),
                     item.get("buyerUserId"),
+                    reviewer_ids,
                 ),
             }
             for item in page_items
@@ -687,43 +1338,67 @@ def list_showroom_transaction_history(actor_sub, role="selling", limit=20, offse
         "limit": safe_limit,
         "offset": safe_offset,
         "role": normalized_role,
+        "nextCursor": _encode_page_cursor(last_evaluated_key),
+        "hasMore": bool(last_evaluated_key),
     }
 
 
-def _build_order_history_review_state(actor_id, showroom_post_id, seller_user_id, buyer_user_id):
+def _build_order_history_review_state(actor_id, showroom_post_id, seller_user_id, buyer_user_id, reviewer_ids):
     if not showroom_post_id or not seller_user_id or not buyer_user_id:
         return None
 
-    reviews = showroom_repository.list_showroom_transaction_reviews(
-        showroom_post_id,
-        seller_user_id,
-        buyer_user_id,
-    )
-    viewer_review = next((review for review in reviews if (review.get("reviewer") or {}).get("id") == actor_id), None)
-    partner_review = next((review for review in reviews if (review.get("reviewer") or {}).get("id") != actor_id), None)
+    reviewers = reviewer_ids.get((str(showroom_post_id), str(seller_user_id), str(buyer_user_id)), set())
     return {
-        "viewerHasReviewed": viewer_review is not None,
-        "partnerHasReviewed": partner_review is not None,
+        "viewerHasReviewed": actor_id in reviewers,
+        "partnerHasReviewed": any(reviewer_id != actor_id for reviewer_id in reviewers),
     }
 
 
-def mark_direct_conversation_read(actor_sub, target_user_id):
-    context = _resolve_conversation_context(actor_sub, target_user_id)
-    actor_id = context["actor_id"]
-    conversation_id = context["conversation_id"]
+def _mark_inbox_read(actor_id, conversation_id):
+    # Zeroes the inbox row and takes the same count off the user's unread
+    # total in one transaction. The row is read first; a send landing in
+    # between fails the condition and the pair is retried with the new count.
     inbox_key = {
         "pk": _user_pk(actor_id),
         "sk": f"CONV#{conversation_id}",
     }
+    for attempt in range(MARK_READ_MAX_ATTEMPTS):
+        inbox_item = _table().get_item(
+            Key=inbox_key,
+            ProjectionExpression="unreadCount",
+            ConsistentRead=True,
+        ).get("Item") or {}
+        unread_count = int(inbox_item.get("unreadCount", 0) or 0)
+        transact_items = [
+            _transact_update(
+                inbox_key,
+                set_fields={
+                    "unreadCount": 0,
+                    "updatedAt": _iso_now(),
+                },
+                condition_expression=(
+                    "unreadCount = :seen" if unread_count else "attribute_not_exists(unreadCount) OR unreadCount = :seen"
+                ),
+                condition_values={":seen": unread_count},
+            ),
+        ]
+        if unread_count:
+            transact_items.append(_transact_update(_unread_total_key(actor_id), add_fields={"unreadCount": -unread_count}))
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+            return
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+                raise
+            if attempt == MARK_READ_MAX_ATTEMPTS - 1:
+                raise RuntimeError("Conversation is busy; please retry marking it read.")
 
-    _table().update_item(
-        Key=inbox_key,
-        UpdateExpression="SET unreadCount = :zero, updatedAt = :updated_at",
-        ExpressionAttributeValues={
-            ":zero": 0,
-            ":updated_at": _iso_now(),
-        },
-    )
+
+def mark_direct_conversation_read(actor_sub, target_user_id):
+    context = _resolve_conversation_context(actor_sub, target_user_id)
+    actor_id = context["actor_id"]
+    conversation_id = context["conversation_id"]
+    _mark_inbox_read(actor_id, conversation_id)
 
     _send_ws_event(
         actor_id,
@@ -742,19 +1417,7 @@ def mark_showroom_transaction_read(actor_sub, target_user_id, showroom_post_id):
     context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id)
     actor_id = context["actor_id"]
     conversation_id = context["conversation_id"]
-    inbox_key = {
-        "pk": _user_pk(actor_id),
-        "sk": f"CONV#{conversation_id}",
-    }
-
-    _table().update_item(
-        Key=inbox_key,
-        UpdateExpression="SET unreadCount = :zero, updatedAt = :updated_at",
-        ExpressionAttributeValues={
-            ":zero": 0,
-            ":updated_at": _iso_now(),
-        },
-    )
+    _mark_inbox_read(actor_id, conversation_id)
 
     _send_ws_event(
         actor_id,
@@ -771,7 +1434,7 @@ def mark_showroom_transaction_read(actor_sub, target_user_id, showroom_post_id):
 
 
 def send_direct_message(actor_sub, target_user_id, text):
-    context = _resolve_conversation_context(actor_sub, target_user_id)
+    context = _resolve_conversation_context(actor_sub, target_user_id, fresh=True)
     actor_id = context["actor_id"]
     target_id = context["target_id"]
     relationship = context["relationship"]
@@ -784,23 +1447,11 @@ def send_direct_message(actor_sub, target_user_id, text):
         raise ValueError(f"Message is too long. Keep it under {MAX_MESSAGE_LENGTH} characters.")
 
     conversation_id = context["conversation_id"]
-    meta = _get_conversation_meta(conversation_id)
-    existing_messages, _, _ = _get_conversation_message_page(conversation_id, limit=MAX_THREAD_PAGE_SIZE)
-    actor_inbox_key = {
-        "pk": _user_pk(actor_id),
-        "sk": f"CONV#{conversation_id}",
-    }
-    target_inbox_key = {
-        "pk": _user_pk(target_id),
-        "sk": f"CONV#{conversation_id}",
-    }
-    actor_inbox_existing = _table().get_item(Key=actor_inbox_key).get("Item")
-    target_inbox_existing = _table().get_item(Key=target_inbox_key).get("Item")
+    existing_meta = _get_conversation_meta(conversation_id)
 
-    can_send, lock_reason = _can_send(actor_id, relationship, meta)
+    can_send, lock_reason = _can_send(actor_id, relationship, existing_meta)
     if not can_send:
         raise PermissionError(lock_reason)
-    _enforce_rate_limits(actor_id, target_id, relationship, meta)
 
     created_at = _iso_now()
     message_id = str(uuid.uuid4())
@@ -816,10 +1467,14 @@ def send_direct_message(actor_sub, target_user_id, text):
         "createdAt": created_at,
     }
 
-    if not meta:
-        meta = {
-            "pk": _conversation_pk(conversation_id),
-            "sk": "META",
+    last_message_fields = {
+        "lastMessageAt": created_at,
+        "lastMessagePreview": body[:180],
+        "lastMessageSenderId": actor_id,
+        "updatedAt": created_at,
+    }
+    if not existing_meta:
+        meta_fields = {
             "itemType": "CONVERSATION",
             "conversationId": conversation_id,
             "conversationType": "direct",
@@ -828,98 +1483,65 @@ def send_direct_message(actor_sub, target_user_id, text):
             "targetUserId": target_id,
             "pendingRequest": not relationship.get("isFriend"),
             "requestLockedUserId": None if relationship.get("isFriend") else actor_id,
-            "lastMessageAt": created_at,
-            "lastMessagePreview": body[:180],
-            "lastMessageSenderId": actor_id,
-            "updatedAt": created_at,
+            **last_message_fields,
         }
     else:
-        meta["lastMessageAt"] = created_at
-        meta["lastMessagePreview"] = body[:180]
-        meta["lastMessageSenderId"] = actor_id
-        meta["updatedAt"] = created_at
-        if not relationship.get("isFriend") and meta.get("pendingRequest") and meta.get("requestLockedUserId") != actor_id:
-            meta["pendingRequest"] = False
-            meta["requestLockedUserId"] = None
+        meta_fields = dict(last_message_fields)
+        if not relationship.get("isFriend") and existing_meta.get("pendingRequest") and existing_meta.get("requestLockedUserId") != actor_id:
+            meta_fields["pendingRequest"] = False
+            meta_fields["requestLockedUserId"] = None
         if relationship.get("isFriend"):
-            meta["pendingRequest"] = False
-            meta["requestLockedUserId"] = None
-
-    actor_inbox = {
-        "pk": actor_inbox_key["pk"],
-        "sk": actor_inbox_key["sk"],
-        "itemType": "USER_CONVERSATION",
-        "conversationId": conversation_id,
-        "conversationType": "direct",
-        "partnerUserId": target_id,
-        "lastMessageAt": created_at,
-        "lastMessagePreview": body[:180],
-        "lastMessageSenderId": actor_id,
-        "pendingRequest": meta.get("pendingRequest", False),
-        "unreadCount": 0,
-        "mode": _conversation_mode(relationship, meta),
-        "updatedAt": created_at,
-    }
-    target_inbox = {
-        "pk": target_inbox_key["pk"],
-        "sk": target_inbox_key["sk"],
-        "itemType": "USER_CONVERSATION",
-        "conversationId": conversation_id,
-        "conversationType": "direct",
-        "partnerUserId": actor_id,
-        "lastMessageAt": created_at,
-        "lastMessagePreview": body[:180],
-        "lastMessageSenderId": actor_id,
-        "pendingRequest": meta.get("pendingRequest", False),
-        "unreadCount": int((target_inbox_existing or {}).get("unreadCount", 0) or 0) + 1,
-        "mode": _conversation_mode(relationship, meta),
-        "updatedAt": created_at,
+            meta_fields["pendingRequest"] = False
+            meta_fields["requestLockedUserId"] = None
+    meta = {
+        **(existing_meta or {"pk": _conversation_pk(conversation_id), "sk": "META"}),
+        **meta_fields,
     }
 
-    table = _table()
-    table.put_item(Item=meta)
-    table.put_item(Item=message_item)
-    table.put_item(Item=actor_inbox)
-    table.put_item(Item=target_inbox)
-
-    updated_messages = existing_messages + [message_item]
-    actor_meta = dict(meta)
-    actor_meta["unreadCount"] = int((actor_inbox_existing or {}).get("unreadCount", 0) or 0)
-    actor_meta["unreadCount"] = 0
-    _send_ws_event(
+    ws_events = [
+        (
+            actor_id,
+            {
+                "type": "message.updated",
+                "conversationId": conversation_id,
+                "partnerUserId": target_id,
+                "senderId": actor_id,
+                "conversationType": "direct",
+            },
+        ),
+        (
+            target_id,
+            {
+                "type": "message.updated",
+                "conversationId": conversation_id,
+                "partnerUserId": actor_id,
+                "senderId": actor_id,
+                "conversationType": "direct",
+            },
+        ),
+    ]
+    _write_message(
         actor_id,
-        {
-            "type": "message.updated",
-            "conversationId": conversation_id,
-            "partnerUserId": target_id,
-            "senderId": actor_id,
-            "conversationType": "direct",
-        },
-    )
-    _send_ws_event(
         target_id,
+        relationship,
+        existing_meta,
+        meta_fields,
+        message_item,
         {
-            "type": "message.updated",
+            "itemType": "USER_CONVERSATION",
             "conversationId": conversation_id,
-            "partnerUserId": actor_id,
-            "senderId": actor_id,
             "conversationType": "direct",
+            "pendingRequest": meta.get("pendingRequest", False),
+            "mode": _conversation_mode(relationship, meta),
+            **last_message_fields,
         },
+        ws_events,
     )
-    trimmed_messages = updated_messages[-MAX_THREAD_PAGE_SIZE:]
-    return _build_conversation_response(
-        actor_id,
-        target_id,
-        relationship,
-        actor_meta,
-        trimmed_messages,
-        next_cursor=trimmed_messages[0].get("sk") if len(trimmed_messages) == MAX_THREAD_PAGE_SIZE else None,
-        has_more=len(updated_messages) > len(trimmed_messages),
-    )
+    return _build_sent_message_response(actor_id, target_id, relationship, meta, conversation_id)
 
 
 def send_showroom_transaction_message(actor_sub, target_user_id, showroom_post_id, text):
-    context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id)
+    context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id, fresh=True)
     actor_id = context["actor_id"]
     target_id = context["target_id"]
     relationship = context["relationship"]
@@ -932,26 +1554,14 @@ def send_showroom_transaction_message(actor_sub, target_user_id, showroom_post_i
         raise ValueError(f"Message is too long. Keep it under {MAX_MESSAGE_LENGTH} characters.")
 
     conversation_id = context["conversation_id"]
-    meta = _get_conversation_meta(conversation_id)
-    existing_messages, _, _ = _get_conversation_message_page(conversation_id, limit=MAX_THREAD_PAGE_SIZE)
-    actor_inbox_key = {
-        "pk": _user_pk(actor_id),
-        "sk": f"CONV#{conversation_id}",
-    }
-    target_inbox_key = {
-        "pk": _user_pk(target_id),
-        "sk": f"CONV#{conversation_id}",
-    }
-    actor_inbox_existing = _table().get_item(Key=actor_inbox_key).get("Item")
-    target_inbox_existing = _table().get_item(Key=target_inbox_key).get("Item")
+    existing_meta = _get_conversation_meta(conversation_id)
 
-    effective_meta = meta or {
+    effective_meta = existing_meta or {
         "conversationType": "showroom_transaction",
     }
     can_send, lock_reason = _can_send(actor_id, relationship, effective_meta)
     if not can_send:
         raise PermissionError(lock_reason)
-    _enforce_rate_limits(actor_id, target_id, relationship, effective_meta)
 
     created_at = _iso_now()
     message_id = str(uuid.uuid4())
@@ -967,16 +1577,19 @@ def send_showroom_transaction_message(actor_sub, target_user_id, showroom_post_i
         "createdAt": created_at,
     }
 
-    selling_details = showroom_post.get("selling_details") or {}
-    cover_image = None
-    images = showroom_post.get("images") or []
-    if images:
-        cover_image = (images[0] or {}).get("imageUrl") or (images[0] or {}).get("image_url")
-
-    if not meta:
-        meta = {
-            "pk": _conversation_pk(conversation_id),
-            "sk": "META",
+    last_message_fields = {
+        "lastMessageAt": created_at,
+        "lastMessagePreview": body[:180],
+        "lastMessageSenderId": actor_id,
+        "updatedAt": created_at,
+    }
+    if not existing_meta:
+        selling_details = showroom_post.get("selling_details") or {}
+        cover_image = None
+        images = showroom_post.get("images") or []
+        if images:
+            cover_image = (images[0] or {}).get("imageUrl") or (images[0] or {}).get("image_url")
+        meta_fields = {
             "itemType": "CONVERSATION",
             "conversationId": conversation_id,
             "conversationType": "showroom_transaction",
@@ -993,109 +1606,69 @@ def send_showroom_transaction_message(actor_sub, target_user_id, showroom_post_i
             "transactionStatus": selling_details.get("sellingStatus") or selling_details.get("selling_status") or "available",
             "sellerUserId": context["seller_user_id"],
             "buyerUserId": context["buyer_user_id"],
-            "lastMessageAt": created_at,
-            "lastMessagePreview": body[:180],
-            "lastMessageSenderId": actor_id,
-            "updatedAt": created_at,
+            **last_message_fields,
         }
     else:
-        meta["lastMessageAt"] = created_at
-        meta["lastMessagePreview"] = body[:180]
-        meta["lastMessageSenderId"] = actor_id
-        meta["updatedAt"] = created_at
-
-    actor_inbox = {
-        "pk": actor_inbox_key["pk"],
-        "sk": actor_inbox_key["sk"],
-        "itemType": "USER_CONVERSATION",
-        "conversationId": conversation_id,
-        "conversationType": "showroom_transaction",
-        "partnerUserId": target_id,
-        "showroomPostId": showroom_post_id,
-        "showroomTitle": meta.get("showroomTitle"),
-        "showroomCoverImageUrl": meta.get("showroomCoverImageUrl"),
-        "showroomPrice": meta.get("showroomPrice"),
-        "showroomCurrency": meta.get("showroomCurrency"),
-        "transactionStatus": meta.get("transactionStatus") or "available",
-        "sellerUserId": meta.get("sellerUserId"),
-        "buyerUserId": meta.get("buyerUserId"),
-        "lastMessageAt": created_at,
-        "lastMessagePreview": body[:180],
-        "lastMessageSenderId": actor_id,
-        "pendingRequest": False,
-        "unreadCount": 0,
-        "mode": _conversation_mode(relationship, meta),
-        "updatedAt": created_at,
-    }
-    target_inbox = {
-        "pk": target_inbox_key["pk"],
-        "sk": target_inbox_key["sk"],
-        "itemType": "USER_CONVERSATION",
-        "conversationId": conversation_id,
-        "conversationType": "showroom_transaction",
-        "partnerUserId": actor_id,
-        "showroomPostId": showroom_post_id,
-        "showroomTitle": meta.get("showroomTitle"),
-        "showroomCoverImageUrl": meta.get("showroomCoverImageUrl"),
-        "showroomPrice": meta.get("showroomPrice"),
-        "showroomCurrency": meta.get("showroomCurrency"),
-        "transactionStatus": meta.get("transactionStatus") or "available",
-        "sellerUserId": meta.get("sellerUserId"),
-        "buyerUserId": meta.get("buyerUserId"),
-        "lastMessageAt": created_at,
-        "lastMessagePreview": body[:180],
-        "lastMessageSenderId": actor_id,
-        "pendingRequest": False,
-        "unreadCount": int((target_inbox_existing or {}).get("unreadCount", 0) or 0) + 1,
-        "mode": _conversation_mode(relationship, meta),
-        "updatedAt": created_at,
+        meta_fields = dict(last_message_fields)
+    meta = {
+        **(existing_meta or {"pk": _conversation_pk(conversation_id), "sk": "META"}),
+        **meta_fields,
     }
 
-    table = _table()
-    table.put_item(Item=meta)
-    table.put_item(Item=message_item)
-    table.put_item(Item=actor_inbox)
-    table.put_item(Item=target_inbox)
-
-    updated_messages = existing_messages + [message_item]
-    actor_meta = dict(meta)
-    actor_meta["unreadCount"] = 0
-    _send_ws_event(
+    ws_events = [
+        (
+            actor_id,
+            {
+                "type": "message.updated",
+                "conversationId": conversation_id,
+                "partnerUserId": target_id,
+                "senderId": actor_id,
+                "conversationType": "showroom_transaction",
+                "showroomPostId": showroom_post_id,
+            },
+        ),
+        (
+            target_id,
+            {
+                "type": "message.updated",
+                "conversationId": conversation_id,
+                "partnerUserId": actor_id,
+                "senderId": actor_id,
+                "conversationType": "showroom_transaction",
+                "showroomPostId": showroom_post_id,
+            },
+        ),
+    ]
+    _write_message(
         actor_id,
-        {
-            "type": "message.updated",
-            "conversationId": conversation_id,
-            "partnerUserId": target_id,
-            "senderId": actor_id,
-            "conversationType": "showroom_transaction",
-            "showroomPostId": showroom_post_id,
-        },
-    )
-    _send_ws_event(
         target_id,
+        relationship,
+        effective_meta,
+        meta_fields,
+        message_item,
         {
-            "type": "message.updated",
+            "itemType": "USER_CONVERSATION",
             "conversationId": conversation_id,
-            "partnerUserId": actor_id,
-            "senderId": actor_id,
             "conversationType": "showroom_transaction",
             "showroomPostId": showroom_post_id,
+            "showroomTitle": meta.get("showroomTitle"),
+            "showroomCoverImageUrl": meta.get("showroomCoverImageUrl"),
+            "showroomPrice": meta.get("showroomPrice"),
+            "showroomCurrency": meta.get("showroomCurrency"),
+            "transactionStatus": meta.get("transactionStatus") or "available",
+            "sellerUserId": meta.get("sellerUserId"),
+            "buyerUserId": meta.get("buyerUserId"),
+            "pendingRequest": False,
+            "mode": _conversation_mode(relationship, meta),
+            **last_message_fields,
         },
+        ws_events,
     )
-    trimmed_messages = updated_messages[-MAX_THREAD_PAGE_SIZE:]
-    return _build_conversation_response(
-        actor_id,
-        target_id,
-        relationship,
-        actor_meta,
-        trimmed_messages,
-        next_cursor=trimmed_messages[0].get("sk") if len(trimmed_messages) == MAX_THREAD_PAGE_SIZE else None,
-        has_more=len(updated_messages) > len(trimmed_messages),
-    )
+    return _build_sent_message_response(actor_id, target_id, relationship, meta, conversation_id)
 
 
 def update_showroom_transaction_status(actor_sub, target_user_id, showroom_post_id, transaction_status):
-    context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id)
+    context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id, fresh=True)
     actor_id = context["actor_id"]
     if actor_id != context["seller_user_id"]:
         raise PermissionError("Only the seller can update transaction status from chat.")
@@ -1143,11 +1716,8 @@ def update_showroom_transaction_status(actor_sub, target_user_id, showroom_post_
         selling_status=normalized_status,
     )
 
-    for user_id, partner_id in (
-        (context["seller_user_id"], context["buyer_user_id"]),
-        (context["buyer_user_id"], context["seller_user_id"]),
-    ):
-        _send_ws_event(
+    _deliver_ws_events([
+        (
             user_id,
             {
                 "type": "conversation.transaction_status_updated",
@@ -1158,12 +1728,17 @@ def update_showroom_transaction_status(actor_sub, target_user_id, showroom_post_
                 "transactionStatus": normalized_status,
             },
         )
+        for user_id, partner_id in (
+            (context["seller_user_id"], context["buyer_user_id"]),
+            (context["buyer_user_id"], context["seller_user_id"]),
+        )
+    ])
 
     return get_showroom_transaction_conversation(actor_sub, target_user_id, showroom_post_id)
 
 
 def create_showroom_transaction_review(actor_sub, target_user_id, showroom_post_id, rating, comment):
-    context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id)
+    context = _resolve_conversation_context(actor_sub, target_user_id, showroom_post_id=showroom_post_id, fresh=True)
     actor_id = context["actor_id"]
     target_id = context["target_id"]
     if actor_id not in {context["seller_user_id"], context["buyer_user_id"]}:
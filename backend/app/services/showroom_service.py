@@ -1,5 +1,13 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
 import uuid
 
+from app.common.cache import get_cache
+from app.common.lookup_cache import invalidate_lookups, post_header_key
+from app.common.rate_limit import RateLimitRule, rate_limited
 from app.repositories import showroom_repository, user_repository
 from app.services import message_service
 from app.services import profile_image_service
@@ -15,6 +23,50 @@ MAX_REPORT_REASON_LENGTH = 120
 MAX_REPORT_DETAILS_LENGTH = 1000
 PUBLIC_FEED_MODES = {"recent", "hot_topics", "popular"}
 AUTH_FEED_MODES = PUBLIC_FEED_MODES | {"following", "friends"}
+# Public feed pages are shared by every anonymous visitor. Post writes made
+# through the API bump the generation; with the Redis cache backend that is
+# seen by every container at once, with the in-memory backend only by the
+# container that handled the write (others catch up within the TTL). Like and
+# comment counters are allowed to lag by at most the TTL either way.
+SHOWROOM_FEED_CACHE_TTL_SECONDS = int(os.environ.get("SHOWROOM_FEED_CACHE_TTL_SECONDS", "30"))
+SHOWROOM_FEED_GENERATION_KEY = "showroom:feed:generation"
+# Optional recency weighting for trending tags; unset keeps the plain
+# 45-day post count ordering.
+SHOWROOM_TRENDING_HALF_LIFE_DAYS = float(os.environ.get("SHOWROOM_TRENDING_HALF_LIFE_DAYS", "0")) or None
+
+
+def _encode_feed_cursor(position):
+    score, post_id = position
+    payload = json.dumps([score, post_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_feed_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, post_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(score), str(uuid.UUID(post_id))
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def _encode_feed_result(result):
+    if result.get("nextCursor") is not None:
+        result["nextCursor"] = _encode_feed_cursor(result["nextCursor"])
+    return result
+
+
+def _showroom_feed_cache_key(params):
+    generation = get_cache().get(SHOWROOM_FEED_GENERATION_KEY) or "0"
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"showroom:feed:{generation}:{digest}"
+
+
+def _invalidate_showroom_feed_cache(post_id=None):
+    get_cache().incr(SHOWROOM_FEED_GENERATION_KEY)
+    if post_id:
+        # Transaction chats read the post header through the lookup cache.
+        invalidate_lookups(post_header_key(post_id))
 
 
 def _normalize_tags(tags):
@@ -68,22 +120,29 @@ def _ensure_admin(actor_sub):
     return actor
 
 
-def _enforce_showroom_post_rate_limit(user_id):
-    recent_count = showroom_repository.count_recent_showroom_posts(user_id, window_minutes=60)
-    if recent_count >= 6:
-        raise ValueError("Too many showroom posts in a short time. Please wait before posting again.")
-
+SHOWROOM_POST_RATE_LIMIT = RateLimitRule(
+    "showroom_post",
+    6,
+    60 * 60,
+    "Too many showroom posts in a short time. Please wait before posting again.",
+)
+SHOWROOM_COMMENT_RATE_LIMIT = RateLimitRule(
+    "showroom_comment",
+    20,
+    10 * 60,
+    "Too many comments in a short time. Please slow down and try again shortly.",
+)
+SHOWROOM_REPORT_RATE_LIMIT = RateLimitRule(
+    "showroom_report",
+    10,
+    60 * 60,
+    "Too many reports in a short time. Please wait before submitting another report.",
+)
 
-def _enforce_showroom_comment_rate_limit(user_id):
-    recent_count = showroom_repository.count_recent_showroom_comments(user_id, window_minutes=10)
-    if recent_count >= 20:
-        raise ValueError("Too many comments in a short time. Please slow down and try again shortly.")
 
-
-def _enforce_showroom_report_rate_limit(user_id):
-    recent_count = showroom_repository.count_recent_showroom_reports(user_id, window_minutes=60)
-    if recent_count >= 10:
-        raise ValueError("Too many reports in a short time. Please wait before submitting another report.")
+def _showroom_rate_limit(user_id, rule):
+    # Failed writes (unconfirmed images, a rejected insert) are refunded.
+    return rate_limited(f"user:{user_id}", [rule])
 
 
 def create_showroom_image_upload(actor_sub, file_name, content_type):
@@ -94,23 +153,23 @@ def create_showroom_image_upload(actor_sub, file_name, content_type):
 def create_showroom_post(actor_sub, payload):
     actor = _ensure_actor(actor_sub)
     normalized = _normalize_showroom_post_payload(payload)
-    _enforce_showroom_post_rate_limit(actor["id"])
-
     post_id = str(uuid.uuid4())
-    confirmed_images = profile_image_service.confirm_showroom_images(actor_sub, post_id, normalized["images"])
-
-    showroom_repository.create_showroom_post(
-        post_id=post_id,
-        user_id=actor["id"],
-        post_type=normalized["post_type"],
-        title=normalized["title"],
-        description=normalized["description"],
-        visibility=normalized["visibility"],
-        tags=normalized["tags"],
-        car_ids=normalized["car_ids"],
-        images=confirmed_images,
-        selling_details=normalized["selling_details"],
-    )
+    with _showroom_rate_limit(actor["id"], SHOWROOM_POST_RATE_LIMIT):
+        confirmed_images = profile_image_service.confirm_showroom_images(actor_sub, post_id, normalized["images"])
+
+        showroom_repository.create_showroom_post(
+            post_id=post_id,
+            user_id=actor["id"],
+            post_type=normalized["post_type"],
+            title=normalized["title"],
+            description=normalized["description"],
+            visibility=normalized["visibility"],
+            tags=normalized["tags"],
+            car_ids=normalized["car_ids"],
+            images=confirmed_images,
+            selling_details=normalized["selling_details"],
+        )
+    _invalidate_showroom_feed_cache()
     return showroom_repository.get_showroom_post(post_id)
 
 
@@ -179,6 +238,7 @@ def update_showroom_post(actor_sub, post_id, payload):
     )
     if not result.get("updated"):
         raise ValueError("Post not found")
+    _invalidate_showroom_feed_cache(post_id)
     return showroom_repository.get_showroom_post(post_id)
 
 
@@ -205,6 +265,7 @@ def update_showroom_selling_status(actor_sub, post_id, selling_status):
         raise ValueError("Post not found")
     if normalized_status != "sold":
         showroom_repository.delete_showroom_sale_transaction(post_id, actor["id"])
+    _invalidate_showroom_feed_cache(post_id)
     return showroom_repository.get_showroom_post(post_id)
 
 
@@ -296,7 +357,7 @@ def _normalize_marketplace_filters(keyword=None, seller_query=None, min_price=No
     }
 
 
-def list_showroom_posts(limit=20, offset=0, user_id=None, post_type=None, feed_mode=None, tag_key=None, car_id=None, keyword=None, seller_query=None, min_price=None, max_price=None, shipping_supported=None, selling_status=None):
+def list_showroom_posts(limit=20, offset=0, user_id=None, post_type=None, feed_mode=None, tag_key=None, car_id=None, keyword=None, seller_query=None, min_price=None, max_price=None, shipping_supported=None, selling_status=None, cursor=None):
     normalized_feed_mode = (feed_mode or "recent").strip().lower()
     normalized_tag_key = _normalize_tag_key(tag_key) if tag_key else None
     filters = _normalize_marketplace_filters(
@@ -313,7 +374,27 @@ def list_showroom_posts(limit=20, offset=0, user_id=None, post_type=None, feed_m
         raise ValueError("Invalid public feed mode")
     if tag_key and not normalized_tag_key:
         raise ValueError("Invalid tag")
-    return showroom_repository.list_showroom_posts(
+    after = _decode_feed_cursor(cursor) if cursor else None
+
+    cache = get_cache()
+    cache_key = None
+    if SHOWROOM_FEED_CACHE_TTL_SECONDS > 0:
+        cache_key = _showroom_feed_cache_key({
+            "limit": limit,
+            "offset": 0 if cursor else offset,
+            "user_id": user_id,
+            "post_type": post_type,
+            "feed_mode": normalized_feed_mode,
+            "tag_key": normalized_tag_key,
+            "car_id": car_id,
+            "after": after,
+            **filters,
+        })
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
+    result = _encode_feed_result(showroom_repository.list_showroom_posts(
         limit=limit,
         offset=offset,
         user_id=user_id,
@@ -321,11 +402,16 @@ def list_showroom_posts(limit=20, offset=0, user_id=None, post_type=None, feed_m
         feed_mode=normalized_feed_mode,
         tag_key=normalized_tag_key,
         car_id=car_id,
+        cursor_mode=bool(cursor),
+        after=after,
         **filters,
-    )
+    ))
+    if cache_key:
+        cache.set(cache_key, json.dumps(result, separators=(",", ":")), SHOWROOM_FEED_CACHE_TTL_SECONDS)
+    return result
 
 
-def list_showroom_feed(actor_sub, feed_mode, limit=20, offset=0, post_type=None, tag_key=None, car_id=None, keyword=None, seller_query=None, min_price=None, max_price=None, shipping_supported=None, selling_status=None):
+def list_showroom_feed(actor_sub, feed_mode, limit=20, offset=0, post_type=None, tag_key=None, car_id=None, keyword=None, seller_query=None, min_price=None, max_price=None, shipping_supported=None, selling_status=None, cursor=None):
     actor = _ensure_actor(actor_sub)
 
     normalized_feed_mode = (feed_mode or "recent").strip().lower()
@@ -345,7 +431,7 @@ def list_showroom_feed(actor_sub, feed_mode, limit=20, offset=0, post_type=None,
     if tag_key and not normalized_tag_key:
         raise ValueError("Invalid tag")
 
-    return showroom_repository.list_showroom_posts(
+    return _encode_feed_result(showroom_repository.list_showroom_posts(
         limit=limit,
         offset=offset,
         post_type=post_type,
@@ -353,14 +439,19 @@ def list_showroom_feed(actor_sub, feed_mode, limit=20, offset=0, post_type=None,
         actor_id=actor["id"],
         tag_key=normalized_tag_key,
         car_id=car_id,
+        cursor_mode=bool(cursor),
+        after=_decode_feed_cursor(cursor) if cursor else None,
         **filters,
-    )
+    ))
 
 
 def list_trending_showroom_tags(limit=12):
     safe_limit = min(max(limit or 12, 1), 30)
     return {
-        "items": showroom_repository.list_trending_showroom_tags(limit=safe_limit),
+        "items": showroom_repository.list_trending_showroom_tags(
+            limit=safe_limit,
+            half_life_days=SHOWROOM_TRENDING_HALF_LIFE_DAYS,
+        ),
         "limit": safe_limit,
     }
 
@@ -411,13 +502,12 @@ def create_showroom_comment(actor_sub, post_id, content):
         raise ValueError("Comment text is required")
     if len(normalized_content) > MAX_COMMENT_LENGTH:
         raise ValueError(f"Comment is too long. Keep it under {MAX_COMMENT_LENGTH} characters.")
-    _enforce_showroom_comment_rate_limit(actor["id"])
-
-    return showroom_repository.create_showroom_comment(
-        post_id=post_id,
-        user_id=actor["id"],
-        content=normalized_content,
-    )
+    with _showroom_rate_limit(actor["id"], SHOWROOM_COMMENT_RATE_LIMIT):
+        return showroom_repository.create_showroom_comment(
+            post_id=post_id,
+            user_id=actor["id"],
+            content=normalized_content,
+        )
 
 
 def delete_showroom_comment(actor_sub, comment_id):
@@ -468,6 +558,7 @@ def delete_showroom_post(actor_sub, post_id):
     result = showroom_repository.delete_showroom_post(post_id=post_id, user_id=actor["id"])
     if not result["deleted"]:
         raise ValueError("Post not found")
+    _invalidate_showroom_feed_cache(post_id)
     return {"message": "deleted"}
 
 
@@ -488,14 +579,13 @@ def create_showroom_post_report(actor_sub, post_id, reason, details=None):
         raise ValueError(f"Report reason is too long. Keep it under {MAX_REPORT_REASON_LENGTH} characters.")
     if normalized_details and len(normalized_details) > MAX_REPORT_DETAILS_LENGTH:
         raise ValueError(f"Report details are too long. Keep them under {MAX_REPORT_DETAILS_LENGTH} characters.")
-    _enforce_showroom_report_rate_limit(actor["id"])
-
-    return showroom_repository.create_showroom_report(
-        reporter_id=actor["id"],
-        post_id=post_id,
-        reason=normalized_reason,
-        details=normalized_details,
-    )
+    with _showroom_rate_limit(actor["id"], SHOWROOM_REPORT_RATE_LIMIT):
+        return showroom_repository.create_showroom_report(
+            reporter_id=actor["id"],
+            post_id=post_id,
+            reason=normalized_reason,
+            details=normalized_details,
+        )
 
 
 def create_showroom_comment_report(actor_sub, comment_id, reason, details=None):
@@ -515,14 +605,13 @@ def create_showroom_comment_report(actor_sub, comment_id, reason, details=None):
         raise ValueError(f"Report reason is too long. Keep it under {MAX_REPORT_REASON_LENGTH} characters.")
     if normalized_details and len(normalized_details) > MAX_REPORT_DETAILS_LENGTH:
         raise ValueError(f"Report details are too long. Keep them under {MAX_REPORT_DETAILS_LENGTH} characters.")
-    _enforce_showroom_report_rate_limit(actor["id"])
-
-    return showroom_repository.create_showroom_report(
-        reporter_id=actor["id"],
-        comment_id=comment_id,
-        reason=normalized_reason,
-        details=normalized_details,
-    )
+    with _showroom_rate_limit(actor["id"], SHOWROOM_REPORT_RATE_LIMIT):
+        return showroom_repository.create_showroom_report(
+            reporter_id=actor["id"],
+            comment_id=comment_id,
+            reason=normalized_reason,
+            details=normalized_details,
+        )
 
 
 def list_admin_showroom_reports(actor_sub, limit=50, offset=0, status=None):
@@ -540,9 +629,16 @@ def moderate_showroom_post(actor_sub, post_id, status):
     result = showroom_repository.update_showroom_post_status(post_id, status)
     if not result["updated"]:
         raise ValueError("Post not found")
+    _invalidate_showroom_feed_cache(post_id)
     return {"message": "updated", "status": status}
 
 
+def rebuild_showroom_tag_daily_counts(actor_sub):
+    # The rollup is trigger-maintained; this backfills and repairs drift.
+    _ensure_admin(actor_sub)
+    return showroom_repository.rebuild_showroom_tag_daily_counts()
+
+
 def moderate_showroom_comment(actor_sub, comment_id, status):
     _ensure_admin(actor_sub)
     if status not in {"published", "deleted"}:
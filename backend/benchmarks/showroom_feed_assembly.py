@@ -0,0 +1,315 @@
+# backend/benchmarks/showroom_feed_assembly.py
+#
+# Compares the two showroom feed assembly paths on a synthetic dataset:
+#   correlated: _post_select_sql with the per-row json_agg subqueries
+#   batched:    _post_select_sql(include_children=False) + _attach_post_children
+#
+# The data lives in a throwaway schema, so point BENCH_DATABASE_URL at a
+# scratch database you can write to:
+#
+#   cd backend
+#   BENCH_DATABASE_URL=postgresql://localhost/scratch \
+#       python -m benchmarks.showroom_feed_assembly --posts 100000
+#
+# Pass --keep to reuse the generated schema on the next run.
+
+import argparse
+import os
+import statistics
+import time
+
+import psycopg2
+
+# app.common.db creates a boto3 client at import time; the benchmark never
+# uses it, but boto3 still needs a region to construct the client.
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from app.repositories.showroom_repository import (  # noqa: E402
+    SHOWROOM_HOT_SCORE_SQL,
+    _attach_post_children,
+    _normalize_post_row,
+    _post_select_sql,
+    _showroom_feed_order_by,
+)
+
+SCHEMA = "bench_showroom_feed"
+
+SCHEMA_SQL = f"""
+CREATE SCHEMA {SCHEMA};
+SET search_path TO {SCHEMA};
+
+CREATE TABLE users (
+    id uuid PRIMARY KEY,
+    username text NOT NULL,
+    profile_image_url text
+);
+
+CREATE TABLE cars (
+    id uuid PRIMARY KEY,
+    title text,
+    brand text,
+    original_id text,
+    images jsonb
+);
+
+CREATE TABLE showroom_posts (
+    id uuid PRIMARY KEY,
+    user_id uuid NOT NULL REFERENCES users(id),
+    post_type text NOT NULL,
+    title text NOT NULL,
+    description text,
+    visibility text NOT NULL,
+    status text NOT NULL,
+    like_count integer NOT NULL DEFAULT 0,
+    comment_count integer NOT NULL DEFAULT 0,
+    image_count integer NOT NULL DEFAULT 0,
+    tag_count integer NOT NULL DEFAULT 0,
+    hot_score double precision NOT NULL DEFAULT 0,
+    popular_score double precision NOT NULL DEFAULT 0,
+    created_at timestamp without time zone NOT NULL,
+    updated_at timestamp without time zone NOT NULL,
+    published_at timestamp without time zone
+);
+
+CREATE TABLE showroom_selling_details (
+    post_id uuid PRIMARY KEY REFERENCES showroom_posts(id),
+    price numeric,
+    currency text,
+    condition text,
+    location text,
+    shipping_supported boolean,
+    selling_status text
+);
+
+CREATE TABLE showroom_post_images (
+    id uuid PRIMARY KEY,
+    post_id uuid NOT NULL REFERENCES showroom_posts(id),
+    image_url text NOT NULL,
+    object_key text,
+    sort_order integer NOT NULL
+);
+
+CREATE TABLE showroom_tags (
+    id uuid PRIMARY KEY,
+    tag_key text UNIQUE NOT NULL,
+    display_name text NOT NULL
+);
+
+CREATE TABLE showroom_post_tag_links (
+    post_id uuid NOT NULL REFERENCES showroom_posts(id),
+    tag_id uuid NOT NULL REFERENCES showroom_tags(id),
+    PRIMARY KEY (post_id, tag_id)
+);
+
+CREATE TABLE showroom_post_car_links (
+    post_id uuid NOT NULL REFERENCES showroom_posts(id),
+    car_id uuid NOT NULL REFERENCES cars(id),
+    sort_order integer NOT NULL,
+    PRIMARY KEY (post_id, car_id)
+);
+"""
+
+# Mirrors the production indexes the feed relies on.
+INDEX_SQL = """
+CREATE UNIQUE INDEX ON showroom_post_images (post_id, sort_order);
+CREATE INDEX ON showroom_post_tag_links (tag_id);
+CREATE INDEX ON showroom_post_car_links (car_id);
+CREATE INDEX ON showroom_posts (created_at DESC);
+CREATE INDEX ON showroom_posts (hot_score DESC, id DESC)
+    WHERE status = 'published' AND visibility = 'public';
+ANALYZE;
+"""
+
+
+def populate(cur, post_count):
+    user_count = max(post_count // 20, 1)
+    car_count = max(post_count // 5, 1)
+
+    cur.execute(
+        """
+        INSERT INTO users (id, username, profile_image_url)
+        SELECT gen_random_uuid(), 'user_' || g, 'https://example.com/u/' || g || '.jpg'
+        FROM generate_series(1, %s) g
+        """,
+        (user_count,),
+    )
+    cur.execute(
+        """
+        INSERT INTO cars (id, title, brand, original_id, images)
+        SELECT
+            gen_random_uuid(),
+            'Car ' || g,
+            (ARRAY['MINI GT', 'Tarmac Works', 'INNO64', 'POP RACE', 'Hot Wheels'])[1 + g %% 5],
+            'SKU-' || g,
+            jsonb_build_array('https://example.com/c/' || g || '.jpg')
+        FROM generate_series(1, %s) g
+        """,
+        (car_count,),
+    )
+    cur.execute(
+        """
+        INSERT INTO showroom_tags (id, tag_key, display_name)
+        SELECT gen_random_uuid(), 'tag' || g, '#tag' || g
+        FROM generate_series(1, 200) g
+        """
+    )
+    cur.execute(
+        """
+        WITH numbered_users AS (
+            SELECT id, row_number() OVER () AS n FROM users
+        )
+        INSERT INTO showroom_posts (
+            id, user_id, post_type, title, description, visibility, status,
+            like_count, comment_count, image_count, tag_count,
+            created_at, updated_at, published_at
+        )
+        SELECT
+            gen_random_uuid(),
+            nu.id,
+            CASE WHEN g %% 3 = 0 THEN 'selling' ELSE 'display_only' END,
+            'Post ' || g,
+            'Synthetic showroom post ' || g,
+            'public',
+            'published',
+            (g * 7) %% 50,
+            (g * 3) %% 20,
+            3,
+            2,
+            now() - (g || ' minutes')::interval,
+            now() - (g || ' minutes')::interval,
+            now() - (g || ' minutes')::interval
+        FROM generate_series(1, %s) g
+        JOIN numbered_users nu ON nu.n = 1 + g %% %s
+        """,
+        (post_count, user_count),
+    )
+    cur.execute(f"UPDATE showroom_posts SET hot_score = {SHOWROOM_HOT_SCORE_SQL}")
+    cur.execute(
+        """
+        INSERT INTO showroom_selling_details (post_id, price, currency, condition, location, shipping_supported, selling_status)
+        SELECT id, 25.00, 'USD', 'new', 'Tokyo', true, 'available'
+        FROM showroom_posts
+        WHERE post_type = 'selling'
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO showroom_post_images (id, post_id, image_url, object_key, sort_order)
+        SELECT gen_random_uuid(), sp.id, 'https://example.com/p/' || sp.id || '/' || i || '.jpg', NULL, i
+        FROM showroom_posts sp
+        CROSS JOIN generate_series(0, 2) i
+        """
+    )
+    cur.execute(
+        """
+        WITH numbered_tags AS (
+            SELECT id, row_number() OVER () AS n FROM showroom_tags
+        ),
+        numbered_posts AS (
+            SELECT id, row_number() OVER () AS n FROM showroom_posts
+        )
+        INSERT INTO showroom_post_tag_links (post_id, tag_id)
+        SELECT np.id, nt.id
+        FROM numbered_posts np
+        CROSS JOIN generate_series(0, 1) i
+        JOIN numbered_tags nt ON nt.n = 1 + (np.n + i * 97) % 200
+        """
+    )
+    cur.execute(
+        """
+        WITH numbered_cars AS (
+            SELECT id, row_number() OVER () AS n FROM cars
+        ),
+        numbered_posts AS (
+            SELECT id, row_number() OVER () AS n FROM showroom_posts
+        )
+        INSERT INTO showroom_post_car_links (post_id, car_id, sort_order)
+        SELECT np.id, nc.id, i
+        FROM numbered_posts np
+        CROSS JOIN generate_series(0, 1) i
+        JOIN numbered_cars nc ON nc.n = 1 + (np.n * 2 + i) %% %s
+        """,
+        (car_count,),
+    )
+    cur.execute(INDEX_SQL)
+
+
+def run_correlated(cur, feed_mode, limit, offset):
+    cur.execute(
+        _post_select_sql("WHERE sp.status = 'published' AND sp.visibility = 'public'")
+        + _showroom_feed_order_by(feed_mode)
+        + " LIMIT %s OFFSET %s",
+        (limit, offset),
+    )
+    return [_normalize_post_row(row) for row in cur.fetchall()]
+
+
+def run_batched(cur, feed_mode, limit, offset):
+    cur.execute(
+        _post_select_sql("WHERE sp.status = 'published' AND sp.visibility = 'public'", include_children=False)
+        + _showroom_feed_order_by(feed_mode)
+        + " LIMIT %s OFFSET %s",
+        (limit, offset),
+    )
+    return [_normalize_post_row(row) for row in _attach_post_children(cur, cur.fetchall())]
+
+
+def time_path(cur, fn, feed_mode, limit, offsets, repeat):
+    samples = []
+    for _ in range(repeat):
+        for offset in offsets:
+            started = time.perf_counter()
+            fn(cur, feed_mode, limit, offset)
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+        "samples": len(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark showroom feed assembly paths")
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--feed-mode", default="recent", choices=["recent", "hot_topics"])
+    parser.add_argument("--keep", action="store_true", help="keep the generated schema for reuse")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ["BENCH_DATABASE_URL"])
+    conn.autocommit = True
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s", (SCHEMA,))
+            if cur.fetchone() is None:
+                print(f"Generating {args.posts} posts in schema {SCHEMA} ...")
+                started = time.perf_counter()
+                cur.execute(SCHEMA_SQL)
+                populate(cur, args.posts)
+                print(f"  done in {time.perf_counter() - started:.1f}s")
+            cur.execute(f"SET search_path TO {SCHEMA}")
+
+            # The two paths must assemble identical pages before timing means
+            # anything.
+            assert run_correlated(cur, args.feed_mode, args.limit, 0) == run_batched(cur, args.feed_mode, args.limit, 0)
+
+            offsets = [0, args.limit * 10, args.limit * 100]
+            for name, fn in (("correlated", run_correlated), ("batched", run_batched)):
+                fn(cur, args.feed_mode, args.limit, 0)
+                result = time_path(cur, fn, args.feed_mode, args.limit, offsets, args.repeat)
+                print(
+                    f"{name:>10}: median {result['median_ms']:.2f} ms, "
+                    f"p95 {result['p95_ms']:.2f} ms over {result['samples']} pages"
+                )
+    finally:
+        if not args.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
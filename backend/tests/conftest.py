@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The Lambda image runs the app from backend/, so tests import `app` the same
+# way. Module-level boto3 clients and settings need these before import.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("PROFILE_IMAGE_BUCKET", "test-profile-images")
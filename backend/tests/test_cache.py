@@ -0,0 +1,153 @@
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.common import cache as cache_module
+from app.common.cache import InMemoryLRUCache, RedisCache
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_cache(redis_server):
+    return RedisCache(fakeredis.FakeRedis(server=redis_server))
+
+
+@pytest.fixture
+def use_cache():
+    # Installs a backend for the code under test and restores the previous
+    # one afterwards.
+    previous = cache_module._CACHE
+
+    def install(cache):
+        cache_module.set_cache(cache)
+        return cache
+
+    yield install
+    cache_module.set_cache(previous)
+
+
+def test_redis_cache_round_trip(redis_cache):
+    assert redis_cache.get("missing") is None
+
+    redis_cache.set("feed", '{"items":[]}')
+    assert redis_cache.get("feed") == '{"items":[]}'
+
+    redis_cache.delete("feed")
+    assert redis_cache.get("feed") is None
+
+    stats = redis_cache.stats()
+    assert stats["backend"] == "redis"
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (1, 2, 0)
+
+
+def test_redis_cache_sets_ttl(redis_server, redis_cache):
+    redis_cache.set("feed", "page", ttl_seconds=30)
+    redis_cache.set("forever", "page")
+
+    client = fakeredis.FakeRedis(server=redis_server)
+    assert 0 < client.ttl("feed") <= 30
+    assert client.ttl("forever") == -1
+
+
+def test_redis_cache_incr(redis_cache):
+    assert redis_cache.incr("generation") == 1
+    assert redis_cache.incr("generation") == 2
+    assert redis_cache.get("generation") == "2"
+
+
+def test_redis_cache_degrades_when_unreachable(redis_server, redis_cache):
+    redis_server.connected = False
+
+    assert redis_cache.get("feed") is None
+    redis_cache.set("feed", "page", ttl_seconds=30)
+    redis_cache.delete("feed")
+    assert redis_cache.incr("generation") is None
+    assert redis_cache.stats()["errors"] == 4
+
+
+def test_memory_cache_evicts_least_recently_used_and_expires():
+    cache = InMemoryLRUCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    cache.set("short", "x", ttl_seconds=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+
+
+class FakeFeedRepository:
+    def __init__(self):
+        self.calls = []
+
+    def list_showroom_posts(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"items": [{"id": f"post-{len(self.calls)}"}], "total": 1, "limit": kwargs["limit"], "offset": kwargs["offset"]}
+
+
+@pytest.fixture
+def showroom(monkeypatch):
+    showroom_service = pytest.importorskip("app.services.showroom_service")
+    repository = FakeFeedRepository()
+    monkeypatch.setattr(showroom_service.showroom_repository, "list_showroom_posts", repository.list_showroom_posts)
+    monkeypatch.setattr(showroom_service, "SHOWROOM_FEED_CACHE_TTL_SECONDS", 30)
+    return showroom_service, repository
+
+
+def test_feed_pages_are_cached_by_normalized_filters(showroom, use_cache, redis_cache):
+    showroom_service, repository = showroom
+    use_cache(redis_cache)
+
+    first = showroom_service.list_showroom_posts(feed_mode="recent")
+    assert showroom_service.list_showroom_posts(feed_mode=" Recent ") == first
+    assert len(repository.calls) == 1
+
+    showroom_service.list_showroom_posts(feed_mode="popular")
+    assert len(repository.calls) == 2
+
+
+def test_post_writes_bump_the_feed_generation(showroom, monkeypatch, use_cache, redis_cache):
+    showroom_service, repository = showroom
+    use_cache(redis_cache)
+    monkeypatch.setattr(showroom_service, "_ensure_actor", lambda actor_sub: {"id": "user-1"})
+    monkeypatch.setattr(
+        showroom_service.showroom_repository,
+        "delete_showroom_post",
+        lambda post_id, user_id: {"deleted": True},
+    )
+
+    before = showroom_service.list_showroom_posts(feed_mode="recent")
+    showroom_service.delete_showroom_post("sub-1", "post-1")
+    after = showroom_service.list_showroom_posts(feed_mode="recent")
+
+    assert len(repository.calls) == 2
+    assert after != before
+    assert redis_cache.get(showroom_service.SHOWROOM_FEED_GENERATION_KEY) == "1"
+
+
+def test_invalidation_reaches_every_container_through_redis(showroom, use_cache, redis_server):
+    showroom_service, repository = showroom
+    # Two Lambda containers: separate clients, one Redis server.
+    container_a = RedisCache(fakeredis.FakeRedis(server=redis_server))
+    container_b = RedisCache(fakeredis.FakeRedis(server=redis_server))
+
+    use_cache(container_a)
+    showroom_service.list_showroom_posts(feed_mode="recent")
+    use_cache(container_b)
+    showroom_service.list_showroom_posts(feed_mode="recent")
+    assert len(repository.calls) == 1
+
+    showroom_service._invalidate_showroom_feed_cache()
+    use_cache(container_a)
+    showroom_service.list_showroom_posts(feed_mode="recent")
+    assert len(repository.calls) == 2
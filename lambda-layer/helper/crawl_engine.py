@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+import traceback
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from helper.fetch_cache import PageUnchanged
+from helper.image_ingest import ImageIngester, normalize_image_url
+
+# Shared fetch -> parse -> upload -> upsert loop for the product crawlers.
+#
+# Pages run on a bounded worker pool and their images on a second pool, so
+# one page's images download while the next pages are fetched. Politeness is
+# per host instead of a global sleep: requests to the same host are spaced at
+# least `page_delay` (pages) or `image_delay` (images) apart, while different
+# hosts (the shop and its image CDN) proceed independently.
+CRAWL_MAX_WORKERS = int(os.environ.get("CRAWL_MAX_WORKERS", "6"))
+CRAWL_IMAGE_WORKERS = int(os.environ.get("CRAWL_IMAGE_WORKERS", "8"))
+CRAWL_PAGE_DELAY = float(os.environ.get("CRAWL_PAGE_DELAY", os.environ.get("REQUEST_DELAY", "1.5")))
+CRAWL_IMAGE_DELAY = float(os.environ.get("CRAWL_IMAGE_DELAY", "0.1"))
+CRAWL_UPSERT_BATCH_SIZE = int(os.environ.get("CRAWL_UPSERT_BATCH_SIZE", "25"))
+CRAWL_MAX_RETRY_AFTER_SECONDS = 30
+
+
+class HostRateLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url, min_interval):
+        # Reserve the host's next free slot under the lock, sleep outside it,
+        # so waiting on one host never delays another.
+        host = urllib.parse.urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def back_off(self, url, seconds):
+        host = urllib.parse.urlparse(url).netloc.lower()
+        with self._lock:
+            self._next_slot[host] = max(self._next_slot.get(host, 0), time.monotonic() + seconds)
+
+
+class CrawlEngine:
+    def __init__(
+        self,
+        *,
+        s3_client,
+        s3_bucket,
+        region,
+        log,
+        user_agent,
+        max_workers=CRAWL_MAX_WORKERS,
+        image_workers=CRAWL_IMAGE_WORKERS,
+        page_delay=CRAWL_PAGE_DELAY,
+        image_delay=CRAWL_IMAGE_DELAY,
+        image_prefix="images/",
+        fetch_cache=None,
+    ):
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+        self.region = region
+        self.user_agent = user_agent
+        self.max_workers = max(1, max_workers)
+        self.image_workers = max(1, image_workers)
+        self.page_delay = page_delay
+        self.image_delay = image_delay
+        self.fetch_cache = fetch_cache
+        self.images = ImageIngester(
+            s3_client,
+            s3_bucket,
+            lambda url: self._get(url, self.image_delay, stream=True),
+            prefix=image_prefix,
+        )
+        self.limiter = HostRateLimiter()
+        self._log = log
+        self._log_lock = threading.Lock()
+        self._local = threading.local()
+        self._image_pool = None
+
+    def log(self, message):
+        # The crawlers' log() writes through a boto3 Table resource, which is
+        # not safe to share between threads.
+        with self._log_lock:
+            self._log(message)
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers["User-Agent"] = self.user_agent
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _get(self, url, min_interval, timeout=15, stream=False, headers=None):
+        for attempt in range(2):
+            self.limiter.wait(url, min_interval)
+            resp = self._session().get(url, timeout=timeout, stream=stream, headers=headers)
+            if resp.status_code in (429, 503) and attempt == 0:
+                retry_after = resp.headers.get("Retry-After", "")
+                delay = min(int(retry_after) if retry_after.isdigit() else 5, CRAWL_MAX_RETRY_AFTER_SECONDS)
+                resp.close()
+                self.limiter.back_off(url, delay)
+                continue
+            resp.raise_for_status()
+            return resp
+
+    def fetch(self, url, timeout=15):
+        # With a fetch cache the request is conditional, and a page that has
+        # not changed since the last persisted crawl raises PageUnchanged.
+        if self.fetch_cache is None:
+            return self._get(url, self.page_delay, timeout=timeout)
+
+        resp = self._get(url, self.page_delay, timeout=timeout, headers=self.fetch_cache.request_headers(url))
+        self.fetch_cache.check_response(url, resp)
+        return resp
+
+    def upload_image(self, img_url):
+        return self.images.ingest(img_url)
+
+    def upload_images(self, image_urls, known_images=None):
+        # Returns [{"s3_url", "original_url"}] in the order of image_urls,
+        # leaving out images that failed and repeats of an image already on
+        # the page (size variants, identical bytes). known_images maps normalized
+        # URLs to s3 urls already stored for them (known_images_from_rows).
+        known_images = known_images or {}
+        seen = set()
+        pending = []
+        for image_url in image_urls:
+            normalized = normalize_image_url(image_url)
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+
+            s3_url = known_images.get(normalized)
+            if s3_url:
+                self.log(f"Skipping fetching image for {image_url}, image already exists")
+                pending.append((image_url, s3_url, None))
+            else:
+                pending.append((image_url, None, self._image_pool.submit(self.upload_image, image_url)))
+
+        images = []
+        stored = set()
+        for image_url, s3_url, future in pending:
+            if future is not None:
+                try:
+                    s3_key = future.result()
+                except Exception as e:
+                    self.log(f"Failed to download image {image_url}: {e}")
+                    continue
+                s3_url = f"https://{self.s3_bucket}.s3.{self.region}.amazonaws.com/{s3_key}"
+                self.log(f"Stored image at s3://{self.s3_bucket}/{s3_key}")
+            # Different urls on one page can still carry the same bytes.
+            if s3_url in stored:
+                continue
+            stored.add(s3_url)
+            images.append({"s3_url": s3_url, "original_url": image_url})
+        return images
+
+    def run(self, urls, crawl_page, upsert=None, on_failure=None, batch_size=CRAWL_UPSERT_BATCH_SIZE, should_stop=None):
+        # crawl_page(url) fetches and parses one product page (using fetch and
+        # upload_images) and returns an item or None. Items are handed to
+        # upsert(items) in batches from the calling thread, so the database
+        # connection is never shared with the workers. on_failure(url, error)
+        # lets a crawler add its own job-log markers for failed pages.
+        #
+        # Only a couple of pages per worker are queued at a time, so once
+        # should_stop() turns true no further pages are started; the pages
+        # already in flight finish and are upserted. Returns
+        # (items, failures, unstarted_urls).
+        items = []
+        pending = []
+        failures = []
+        queue = list(urls)
+        queue.reverse()
+
+        self.images.stats = dict.fromkeys(self.images.stats, 0)
+        image_pool = ThreadPoolExecutor(max_workers=self.image_workers)
+        page_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._image_pool = image_pool
+        futures = {}
+
+        def fill():
+            while queue and len(futures) < self.max_workers * 2:
+                if should_stop and should_stop():
+                    return
+                url = queue.pop()
+                futures[page_pool.submit(crawl_page, url)] = url
+
+        try:
+            fill()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = futures.pop(future)
+                    try:
+                        item = future.result()
+                    except PageUnchanged:
+                        self.log(f"Skipping {url}, unchanged since the last crawl")
+                        continue
+                    except Exception as e:
+                        self.log(f"Failed crawling {url}: {e}")
+                        self.log("".join(traceback.format_exception(type(e), e, e.__traceback__)))
+                        failures.append({"url": url, "error": str(e)})
+                        if on_failure:
+                            on_failure(url, e)
+                        continue
+                    if not item:
+                        self.log(f"skipping {url}, because this page doesn't exist")
+                        continue
+
+                    items.append(item)
+                    pending.append(item)
+                    if upsert and len(pending) >= batch_size:
+                        upsert(pending)
+                        pending = []
+                fill()
+
+            if upsert and pending:
+                upsert(pending)
+        finally:
+            # On an upsert failure, drop pages that have not started yet.
+            page_pool.shutdown(wait=True, cancel_futures=True)
+            image_pool.shutdown(wait=True)
+            self._image_pool = None
+
+        if any(self.images.stats.values()):
+            self.log(
+                "Images: {uploaded} uploaded, {deduplicated} already stored, "
+                "{reused} reused by url".format(**self.images.stats)
+            )
+
+        queue.reverse()
+        return items, failures, queue
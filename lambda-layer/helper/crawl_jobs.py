@@ -0,0 +1,287 @@
+import json
+import os
+import time
+
+import boto3
+from psycopg2.extras import Json, execute_values
+
+# Resumable crawl jobs. A job's frontier (every URL it has to visit and the
+# outcome of each visit) lives in Postgres, so an invocation that runs out of
+# time hands the rest of the frontier to a fresh async invocation of the same
+# function instead of losing its work:
+#
+#   start_job -> acquire_job -> pending_urls -> (crawl, mark_urls) ...
+#       -> continue_job (budget spent) or finish_job (frontier empty)
+#
+# acquire_job takes a lease for the invocation's time budget, so a duplicate
+# async delivery of the same continuation backs off, while Lambda's own retry
+# of a timed-out invocation (whose lease has lapsed) picks the job up again.
+CRAWL_JOB_TIME_MARGIN_SECONDS = int(os.environ.get("CRAWL_JOB_TIME_MARGIN_SECONDS", "90"))
+CRAWL_JOB_FLUSH_SIZE = int(os.environ.get("CRAWL_JOB_FLUSH_SIZE", "25"))
+CRAWL_JOB_MAX_INVOCATIONS = int(os.environ.get("CRAWL_JOB_MAX_INVOCATIONS", "50"))
+CRAWL_JOB_LOCAL_LEASE_SECONDS = 3600
+
+_lambda_client = None
+
+
+class CrawlBudget:
+    # Wall-clock budget for one invocation: the Lambda's remaining time minus
+    # a margin for the last flush and the hand-off. Without a Lambda context
+    # (local runs) the budget never runs out.
+    def __init__(self, context, margin_seconds=CRAWL_JOB_TIME_MARGIN_SECONDS):
+        self._deadline = None
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            remaining = context.get_remaining_time_in_millis() / 1000
+            self._deadline = time.monotonic() + remaining - margin_seconds
+
+    def remaining_seconds(self):
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def exhausted(self):
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+
+def start_job(conn, job_id, crawler, params, targets, kind="page"):
+    # targets: urls or (url, discovered_from) pairs. Posting an existing job id
+    # again reopens it and only adds the URLs it has not seen yet.
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO crawl_jobs (id, crawler, params)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (id) DO UPDATE
+            SET status = 'running',
+                params = EXCLUDED.params,
+                finished_at = NULL,
+                updated_at = now()
+            """,
+            (job_id, crawler, Json(params or {})),
+        )
+    enqueue_urls(conn, job_id, targets, kind=kind)
+
+
+def enqueue_urls(conn, job_id, targets, kind="page"):
+    # A URL is visited at most once per job, which also stops category cycles.
+    rows = []
+    for target in targets:
+        url, discovered_from = (target, None) if isinstance(target, str) else target
+        rows.append((job_id, url, kind, discovered_from))
+
+    if rows:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO crawl_job_urls (job_id, url, kind, discovered_from)
+                VALUES %s
+                ON CONFLICT (job_id, url) DO NOTHING
+                """,
+                rows,
+            )
+    conn.commit()
+
+
+def acquire_job(conn, job_id, budget, log):
+    # Returns the invocation number, or None when this invocation must not
+    # crawl: the job is finished or unknown, another live invocation holds
+    # the lease, or the job has re-invoked itself too many times.
+    lease_seconds = budget.remaining_seconds()
+    if lease_seconds is None:
+        lease_seconds = CRAWL_JOB_LOCAL_LEASE_SECONDS
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE crawl_jobs
+            SET invocations = invocations + 1,
+                lease_expires_at = now() + make_interval(secs => %s),
+                updated_at = now()
+            WHERE id = %s
+              AND status = 'running'
+              AND (lease_expires_at IS NULL OR lease_expires_at < now())
+            RETURNING invocations
+            """,
+            (lease_seconds + CRAWL_JOB_TIME_MARGIN_SECONDS, job_id),
+        )
+        row = cur.fetchone()
+    conn.commit()
+
+    if not row:
+        log(f"Job {job_id} is finished or already running, nothing to resume")
+        return None
+    if row[0] > CRAWL_JOB_MAX_INVOCATIONS:
+        log(f"Job {job_id} gave up after {CRAWL_JOB_MAX_INVOCATIONS} invocations")
+        finish_job(conn, job_id, status="failed")
+        return None
+    return row[0]
+
+
+def pending_urls(conn, job_id, kind=None):
+    # [(url, kind, discovered_from)] in discovery order.
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT url, kind, discovered_from
+            FROM crawl_job_urls
+            WHERE job_id = %s
+              AND status = 'pending'
+              AND (%s::text IS NULL OR kind = %s)
+            ORDER BY seq
+            """,
+            (job_id, kind, kind),
+        )
+        return cur.fetchall()
+
+
+def mark_urls(conn, job_id, results, commit=True):
+    # results: (url, status, detail) with status done | skipped | failed and
+    # detail a JSON-able summary or None. Pass commit=False to land the marks
+    # in the same transaction as the rows parsed from those URLs.
+    if results:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE crawl_job_urls AS u
+                SET status = v.status,
+                    detail = v.detail::jsonb,
+                    updated_at = now()
+                FROM unnest(%s::text[], %s::text[], %s::text[]) AS v (url, status, detail)
+                WHERE u.job_id = %s
+                  AND u.url = v.url
+                """,
+                (
+                    [url for url, _, _ in results],
+                    [status for _, status, _ in results],
+                    [json.dumps(detail) if detail is not None else None for _, _, detail in results],
+                    job_id,
+                ),
+            )
+    if commit:
+        conn.commit()
+
+
+def job_summary(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT status, COUNT(*)
+            FROM crawl_job_urls
+            WHERE job_id = %s
+            GROUP BY status
+            """,
+            (job_id,),
+        )
+        counts = dict(cur.fetchall())
+    return {status: counts.get(status, 0) for status in ("pending", "done", "skipped", "failed")}
+
+
+def job_url_details(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT url, discovered_from, status, detail
+            FROM crawl_job_urls
+            WHERE job_id = %s
+              AND status <> 'pending'
+            ORDER BY seq
+            """,
+            (job_id,),
+        )
+        return cur.fetchall()
+
+
+def finish_job(conn, job_id, status="completed"):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE crawl_jobs
+            SET status = %s,
+                lease_expires_at = NULL,
+                finished_at = now(),
+                updated_at = now()
+            WHERE id = %s
+            """,
+            (status, job_id),
+        )
+    conn.commit()
+
+
+def fail_job(conn, job_id, log):
+    # Error path of a handler that holds the job's lease. The handler returns
+    # normally, so Lambda will not retry it: close the job as failed (which
+    # also drops the lease) so the same job id can be posted again right away.
+    # Best effort, since the error may have been the connection itself.
+    try:
+        conn.rollback()
+        finish_job(conn, job_id, status="failed")
+    except Exception as e:
+        log(f"Could not mark job {job_id} as failed: {e}")
+
+
+def continue_job(conn, job_id, context, payload):
+    # Drop the lease first so the continuation can take it straight away,
+    # then re-invoke this same function asynchronously with the job id. The
+    # frontier itself stays in Postgres, so the payload stays small.
+    global _lambda_client
+
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE crawl_jobs SET lease_expires_at = NULL, updated_at = now() WHERE id = %s",
+            (job_id,),
+        )
+    conn.commit()
+
+    if _lambda_client is None:
+        _lambda_client = boto3.client("lambda")
+    _lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType="Event",
+        Payload=json.dumps({**payload, "job_id": job_id, "resume": True}).encode("utf-8"),
+    )
+
+
+def crawl_frontier(engine, conn, job_id, urls, crawl_page, upsert, budget, on_failure=None):
+    # Runs the engine over `urls` in flushes of CRAWL_JOB_FLUSH_SIZE, marking
+    # each flush's URLs in the frontier once its items are upserted. Stops
+    # starting new pages once the budget is spent and returns the URLs that
+    # were never started; they stay pending for the next invocation.
+    fetch_cache = engine.fetch_cache
+    for offset in range(0, len(urls), CRAWL_JOB_FLUSH_SIZE):
+        if budget.exhausted():
+            return urls[offset:]
+
+        chunk = urls[offset:offset + CRAWL_JOB_FLUSH_SIZE]
+        _, failures, unstarted = engine.run(
+            chunk,
+            crawl_page,
+            upsert=upsert,
+            on_failure=on_failure,
+            batch_size=len(chunk),
+            should_stop=budget.exhausted,
+        )
+
+        failed = {failure["url"]: failure["error"] for failure in failures}
+        unchanged = fetch_cache.unchanged if fetch_cache else set()
+        not_started = set(unstarted)
+        results = []
+        for url in chunk:
+            if url in not_started:
+                continue
+            if url in failed:
+                results.append((url, "failed", {"error": failed[url]}))
+            elif url in unchanged:
+                results.append((url, "skipped", {"reason": "unchanged"}))
+            else:
+                results.append((url, "done", None))
+
+        mark_urls(conn, job_id, results, commit=False)
+        if fetch_cache:
+            fetch_cache.save(conn, [url for url, status, _ in results if status != "failed"], commit=False)
+        conn.commit()
+
+        if unstarted:
+            return unstarted + urls[offset + len(chunk):]
+
+    return []
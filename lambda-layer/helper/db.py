@@ -0,0 +1,132 @@
+import json
+import os
+import time
+
+import boto3
+import psycopg2
+from psycopg2 import InterfaceError, OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+# Secrets Manager reads are cached per container. A TTL still picks up a
+# rotated secret eventually, and an auth failure on connect forces a refresh
+# right away so rotation never needs a redeploy.
+SECRET_TTL_SECONDS = int(os.environ.get("DB_SECRET_TTL_SECONDS", "900"))
+# Warm connections that have been idle longer than this are pinged before
+# reuse; anything fresher is handed out without an extra round trip.
+IDLE_CHECK_SECONDS = int(os.environ.get("DB_IDLE_CHECK_SECONDS", "60"))
+CONNECT_TIMEOUT_SECONDS = int(os.environ.get("DB_CONNECT_TIMEOUT_SECONDS", "5"))
+
+secrets_client = boto3.client("secretsmanager")
+
+_SECRET_CACHE = {}
+_CONNECTIONS = {}
+
+
+def get_db_secret(secret_arn, force_refresh=False):
+    cached = _SECRET_CACHE.get(secret_arn)
+    now = time.monotonic()
+
+    if not force_refresh and cached and now - cached["fetched_at"] < SECRET_TTL_SECONDS:
+        return cached["secret"]
+
+    resp = secrets_client.get_secret_value(SecretId=secret_arn)
+    secret = json.loads(resp["SecretString"])
+    _SECRET_CACHE[secret_arn] = {"secret": secret, "fetched_at": now}
+    return secret
+
+
+def _is_auth_failure(error):
+    message = str(error).lower()
+    return "password authentication failed" in message or "authentication failed" in message
+
+
+def _connect(secret_arn, db_name, secret):
+    return psycopg2.connect(
+        dbname=db_name,
+        user=secret.get("username"),
+        password=secret.get("password"),
+        host=secret.get("host"),
+        port=int(secret.get("port", 5432)),
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+    )
+
+
+def _open_connection(secret_arn, db_name):
+    try:
+        return _connect(secret_arn, db_name, get_db_secret(secret_arn))
+    except OperationalError as error:
+        if not _is_auth_failure(error):
+            raise
+        # The cached password went stale after a rotation. Re-read the secret
+        # once and retry before surfacing the failure.
+        return _connect(secret_arn, db_name, get_db_secret(secret_arn, force_refresh=True))
+
+
+def _is_alive(conn):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        return True
+    except (OperationalError, InterfaceError):
+        return False
+
+
+def _discard(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def get_db_connection(secret_arn, db_name, autocommit=False):
+    key = (secret_arn, db_name)
+    entry = _CONNECTIONS.get(key)
+    now = time.monotonic()
+
+    if entry is not None:
+        conn = entry["conn"]
+        usable = not conn.closed and (
+            now - entry["released_at"] < IDLE_CHECK_SECONDS or _is_alive(conn)
+        )
+        if not usable:
+            _discard(conn)
+            _CONNECTIONS.pop(key, None)
+            entry = None
+
+    if entry is None:
+        entry = {"conn": _open_connection(secret_arn, db_name), "released_at": now}
+        _CONNECTIONS[key] = entry
+
+    conn = entry["conn"]
+    # A previous invocation that raised before releasing may have left a
+    # transaction open on the warm connection.
+    if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    if conn.autocommit != autocommit:
+        conn.autocommit = autocommit
+    return conn
+
+
+def release_db_connection(conn):
+    # Handlers call this instead of `conn.close()` so the connection stays warm
+    # for the next invocation. Any transaction the handler left open is rolled
+    # back, and a broken connection is dropped so the next call reconnects.
+    for key, entry in list(_CONNECTIONS.items()):
+        if entry["conn"] is not conn:
+            continue
+
+        try:
+            if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except (OperationalError, InterfaceError):
+            _discard(conn)
+
+        if conn.closed:
+            _CONNECTIONS.pop(key, None)
+        else:
+            entry["released_at"] = time.monotonic()
+        return
+
+    _discard(conn)
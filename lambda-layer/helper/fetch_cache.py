@@ -0,0 +1,141 @@
+import hashlib
+import threading
+
+from psycopg2.extras import execute_values
+
+# Per-URL validators from the last crawl that was persisted: ETag,
+# Last-Modified, a hash of the body and, for MediaWiki pages, the revision id.
+# A refresh crawl sends them back as a conditional request and skips parsing
+# and upserting a page whose content has not changed.
+#
+# Validators seen during a run are only staged in memory; save() writes them
+# once the rows parsed from those pages are committed, so a page whose upsert
+# failed is never mistaken for unchanged on the next run. The scope keys the
+# cache per crawler (plus parser version where one exists), so bumping the
+# parser re-parses everything once.
+VALIDATOR_FIELDS = ("etag", "last_modified", "content_hash", "revid")
+
+
+class PageUnchanged(Exception):
+    pass
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class FetchCache:
+    def __init__(self, scope, revalidate=True):
+        # With revalidate off the cache only records validators, e.g. for a
+        # forced re-parse, so later refreshes can still use them.
+        self.scope = scope
+        self.revalidate = revalidate
+        self.unchanged = set()
+        self._lock = threading.Lock()
+        self._known = {}
+        self._staged = {}
+
+    def load(self, conn, urls):
+        urls = [url for url in urls if url not in self._known]
+        if not urls:
+            return
+
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT url, etag, last_modified, content_hash, revid
+                FROM crawl_fetch_cache
+                WHERE scope = %s
+                  AND url = ANY(%s)
+                """,
+                (self.scope, urls),
+            )
+            rows = cur.fetchall()
+
+        with self._lock:
+            for url, *validators in rows:
+                self._known[url] = dict(zip(VALIDATOR_FIELDS, validators))
+
+    def known(self, url):
+        with self._lock:
+            return self._known.get(url)
+
+    def request_headers(self, url):
+        entry = self.known(url) if self.revalidate else None
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def check_response(self, url, resp):
+        # Raises PageUnchanged on a 304, or on a 200 whose body hashes the same
+        # as last time (servers that ignore conditional headers).
+        entry = self.known(url)
+        if resp.status_code == 304:
+            self._unchanged(url, entry or {})
+
+        validators = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "content_hash": content_hash(resp.content),
+            "revid": None,
+        }
+        if self.revalidate and entry and entry["content_hash"] == validators["content_hash"]:
+            self._unchanged(url, validators)
+        self.stage(url, validators)
+
+    def check_revid(self, url, revid):
+        # MediaWiki pages: the revision id alone says whether the page changed.
+        entry = self.known(url)
+        if self.revalidate and entry and revid is not None and entry["revid"] == revid:
+            self._unchanged(url, entry)
+
+    def stage(self, url, validators):
+        with self._lock:
+            self._staged[url] = {field: validators.get(field) for field in VALIDATOR_FIELDS}
+
+    def _unchanged(self, url, validators):
+        self.stage(url, validators)
+        with self._lock:
+            self.unchanged.add(url)
+        raise PageUnchanged(url)
+
+    def save(self, conn, urls, commit=True):
+        # Persists the staged validators of `urls`, the pages whose results
+        # (or unchanged status) are now committed.
+        with self._lock:
+            rows = [
+                (self.scope, url, *(self._staged[url][field] for field in VALIDATOR_FIELDS))
+                for url in urls
+                if url in self._staged
+            ]
+            for url in urls:
+                if url in self._staged:
+                    self._known[url] = self._staged.pop(url)
+
+        if rows:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO crawl_fetch_cache (scope, url, etag, last_modified, content_hash, revid)
+                    VALUES %s
+                    ON CONFLICT (scope, url) DO UPDATE
+                    SET etag = EXCLUDED.etag,
+                        last_modified = EXCLUDED.last_modified,
+                        content_hash = EXCLUDED.content_hash,
+                        revid = EXCLUDED.revid,
+                        changed_at = CASE
+                            WHEN crawl_fetch_cache.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                              OR crawl_fetch_cache.revid IS DISTINCT FROM EXCLUDED.revid
+                            THEN now()
+                            ELSE crawl_fetch_cache.changed_at
+                        END,
+                        checked_at = now()
+                    """,
+                    rows,
+                )
+        if commit:
+            conn.commit()
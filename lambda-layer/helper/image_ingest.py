@@ -0,0 +1,162 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+# Content-addressed image storage shared by the crawlers. Objects are keyed by
+# the sha256 of their bytes, so the same picture reached through different
+# URLs (CDN size variants, cache-busting query strings, another product page)
+# is stored once:
+#
+#   1. normalize the URL (drop CDN resize suffixes and sizing parameters),
+#   2. reuse an s3 url already recorded for it (cars.images or this process),
+#   3. otherwise download, hash, and HEAD the content key; PUT only on a miss.
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+IMAGE_INDEX_MAX_ENTRIES = int(os.environ.get("CRAWL_IMAGE_INDEX_MAX_ENTRIES", "20000"))
+
+# Shopify serves one upload under many names: foo_800x.jpg, foo_grande.jpg,
+# foo_1024x1024@2x.jpg, foo_300x300_crop_center.jpg all resolve to foo.jpg.
+# Of the legacy named sizes only the Shopify-specific words are stripped:
+# uploads are often really called wheel_large.jpg or box_thumb.jpg, and
+# folding those into wheel.jpg could reuse another picture's s3 url, while
+# leaving a real size variant alone only costs a download that the content
+# hash then dedupes.
+SHOPIFY_SIZE_SUFFIX = re.compile(
+    r"_(?:\d+x\d*|x\d+|pico|compact|grande)"
+    r"(?:_crop_[a-z]+)?(?:@\dx)?(?=\.[A-Za-z0-9]+$)"
+)
+# Shopify keeps `v` (the upload version); width/height/crop only resize.
+SHOPIFY_KEPT_PARAMS = {"v"}
+# Fandom/Wikia: .../Foo.jpg/revision/latest/scale-to-width-down/250?cb=...
+WIKIA_RESIZE_PATH = re.compile(r"(/revision/latest)/.+$")
+
+_index_lock = threading.Lock()
+_url_index = OrderedDict()
+_stored_keys = OrderedDict()
+
+
+def _is_shopify(parsed):
+    return parsed.netloc.endswith("cdn.shopify.com") or "/cdn/shop/" in parsed.path
+
+
+def normalize_image_url(url):
+    if url.startswith("//"):
+        url = f"https:{url}"
+    parsed = urllib.parse.urlparse(url)
+    netloc = parsed.netloc.lower()
+    path = parsed.path
+    query = parsed.query
+
+    if _is_shopify(parsed):
+        path = SHOPIFY_SIZE_SUFFIX.sub("", path)
+        params = [(k, v) for k, v in urllib.parse.parse_qsl(query) if k in SHOPIFY_KEPT_PARAMS]
+        query = urllib.parse.urlencode(params)
+    elif netloc.endswith("wikia.nocookie.net"):
+        path = WIKIA_RESIZE_PATH.sub(r"\1", path)
+
+    return urllib.parse.urlunparse((parsed.scheme.lower(), netloc, path, "", query, ""))
+
+
+def known_images_from_rows(rows):
+    # {normalized original url: s3 url} from cars rows' `images`, so a
+    # re-crawl reuses what is stored instead of fetching it again.
+    known = {}
+    for row in rows:
+        for image in row.get("images") or []:
+            if image.get("original_url") and image.get("s3_url"):
+                known[normalize_image_url(image["original_url"])] = image["s3_url"]
+    return known
+
+
+def _remember(index, key, value):
+    with _index_lock:
+        index[key] = value
+        index.move_to_end(key)
+        while len(index) > IMAGE_INDEX_MAX_ENTRIES:
+            index.popitem(last=False)
+
+
+def _recall(index, key):
+    with _index_lock:
+        value = index.get(key)
+        if value is not None:
+            index.move_to_end(key)
+        return value
+
+
+class ImageIngester:
+    def __init__(self, s3_client, s3_bucket, get, prefix="images/"):
+        # get(url) -> streamed requests response; the engine passes its
+        # rate-limited getter so images keep per-host politeness.
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+        self.prefix = prefix
+        self._get = get
+        self._lock = threading.Lock()
+        self.stats = {"uploaded": 0, "deduplicated": 0, "reused": 0}
+
+    def _count(self, field):
+        with self._lock:
+            self.stats[field] += 1
+
+    def _download(self, url):
+        resp = self._get(url)
+        try:
+            content_length = resp.headers.get("Content-Length")
+            if content_length and int(content_length) > MAX_IMAGE_BYTES:
+                raise ValueError("Image too large")
+            body = resp.raw.read(MAX_IMAGE_BYTES + 1, decode_content=True)
+            if len(body) > MAX_IMAGE_BYTES:
+                raise ValueError("Image too large")
+            return body, resp.headers.get("Content-Type", "application/octet-stream")
+        finally:
+            resp.close()
+
+    def _exists(self, s3_key):
+        try:
+            self.s3_client.head_object(Bucket=self.s3_bucket, Key=s3_key)
+            return True
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def ingest(self, image_url):
+        # Returns the s3 key holding the image's bytes.
+        normalized = normalize_image_url(image_url)
+        index_key = (self.s3_bucket, self.prefix, normalized)
+        s3_key = _recall(_url_index, index_key)
+        if s3_key:
+            self._count("reused")
+            return s3_key
+
+        try:
+            body, content_type = self._download(normalized)
+        except Exception:
+            if normalized == image_url:
+                raise
+            # Some hosts do not serve the un-resized original; fall back to
+            # the URL exactly as the page gave it.
+            body, content_type = self._download(image_url)
+
+        ext = os.path.splitext(urllib.parse.urlparse(normalized).path)[1].lower()
+        if not ext:
+            ext = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ".jpg"
+        s3_key = f"{self.prefix}{hashlib.sha256(body).hexdigest()}{ext}"
+
+        if _recall(_stored_keys, (self.s3_bucket, s3_key)) or self._exists(s3_key):
+            self._count("deduplicated")
+        else:
+            self.s3_client.put_object(
+                Bucket=self.s3_bucket, Key=s3_key, Body=body, ContentType=content_type
+            )
+            self._count("uploaded")
+
+        _remember(_stored_keys, (self.s3_bucket, s3_key), True)
+        _remember(_url_index, index_key, s3_key)
+        return s3_key
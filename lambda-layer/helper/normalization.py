@@ -0,0 +1,104 @@
+import os
+import threading
+from collections import OrderedDict
+
+from psycopg2.extras import execute_values
+
+# Batch resolution of the brands / makes / product_lines lookup tables for
+# crawler upserts. Every distinct value in a batch is resolved with a single
+# INSERT ... ON CONFLICT ... RETURNING per table, so an import costs a query
+# per table rather than one per item. Resolved ids are remembered in a
+# bounded per-container LRU; values are inserted in sorted order so two
+# crawlers resolving overlapping batches cannot deadlock on each other.
+NORMALIZATION_CACHE_MAX_ENTRIES = int(os.environ.get("NORMALIZATION_CACHE_MAX_ENTRIES", "4096"))
+
+_lock = threading.Lock()
+_cache = {
+    "brands": OrderedDict(),
+    "makes": OrderedDict(),
+    "product_lines": OrderedDict(),
+}
+
+
+def normalize_name(value):
+    if not value:
+        return None
+    return value.strip().lower() or None
+
+
+def _lookup(table, keys):
+    resolved = {}
+    missing = []
+    with _lock:
+        cache = _cache[table]
+        for key in keys:
+            if key in cache:
+                cache.move_to_end(key)
+                resolved[key] = cache[key]
+            else:
+                missing.append(key)
+    return resolved, missing
+
+
+def _remember(table, resolved):
+    with _lock:
+        cache = _cache[table]
+        for key, row_id in resolved.items():
+            cache[key] = row_id
+            cache.move_to_end(key)
+        while len(cache) > NORMALIZATION_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+
+def resolve_names(conn, table, values, log):
+    # table is brands or makes. Returns {normalized name: id}.
+    names = {normalize_name(value) for value in values} - {None}
+    resolved, missing = _lookup(table, names)
+    if not missing:
+        return resolved
+
+    with conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            f"INSERT INTO {table} (name) VALUES %s "
+            f"ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name "
+            f"RETURNING name, id",
+            [(name,) for name in sorted(missing)],
+            fetch=True,
+        )
+
+    fresh = dict(rows)
+    _remember(table, fresh)
+    resolved.update(fresh)
+    log(f"Resolved {table}: {', '.join(sorted(fresh))}")
+    return resolved
+
+
+def resolve_product_lines(conn, pairs, log):
+    # pairs are (product line, brand_id); product line names are only unique
+    # per brand. Returns {(normalized name, brand_id): id}.
+    keys = {(normalize_name(name), brand_id) for name, brand_id in pairs}
+    keys = {key for key in keys if key[0] is not None}
+    resolved, missing = _lookup("product_lines", keys)
+    if not missing:
+        return resolved
+
+    with conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            """
+            INSERT INTO product_lines (name, brand_id)
+            VALUES %s
+            ON CONFLICT (name, brand_id)
+            DO UPDATE SET name = EXCLUDED.name
+            RETURNING name, brand_id, id
+            """,
+            sorted(missing, key=lambda key: (key[0], str(key[1]))),
+            fetch=True,
+        )
+
+    fresh = {(name, brand_id): row_id for name, brand_id, row_id in rows}
+    _remember("product_lines", fresh)
+    resolved.update(fresh)
+    log(f"Resolved product_lines: {', '.join(sorted(name for name, _ in fresh))}")
+    return resolved
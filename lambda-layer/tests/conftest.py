@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The layer ships `helper` at the package root (/opt/python/helper), so the
+# tests import it the same way the crawlers do.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,245 @@
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("botocore")
+pytest.importorskip("psycopg2")
+
+from botocore.exceptions import ClientError
+
+from helper.crawl_engine import CrawlEngine, HostRateLimiter
+
+# Fixture site served by a local http.server: product pages that reference
+# images, an image reachable under two urls, and a page that answers 429 with
+# Retry-After once before serving normally.
+PNG = b"\x89PNG\r\n\x1a\n" + b"fixture-image" * 8
+
+PAGES = {
+    f"/products/{n}": f'<h1>Product {n}</h1><img src="/images/{n}.png"><img src="/images/shared.png">'
+    for n in range(6)
+}
+PAGES["/products/twins"] = '<h1>Twins</h1><img src="/images/a.png"><img src="/images/b.png">'
+TWIN_IMAGES = {"/images/a.png", "/images/b.png"}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits.append((self.path, time.monotonic()))
+            busy_hits = sum(1 for path, _ in server.hits if path == "/busy")
+
+        if self.path == "/busy" and busy_hits == 1:
+            self._send(429, b"slow down", "text/plain", {"Retry-After": "1"})
+        elif self.path == "/busy":
+            self._send(200, b"<h1>Busy</h1>", "text/html")
+        elif self.path in PAGES:
+            self._send(200, PAGES[self.path].encode("utf-8"), "text/html")
+        elif self.path.startswith("/images/"):
+            body = PNG if self.path in TWIN_IMAGES else PNG + self.path.encode("utf-8")
+            self._send(200, body, "image/png")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def head_object(self, Bucket, Key):
+        with self.lock:
+            if (Bucket, Key) not in self.objects:
+                raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        with self.lock:
+            self.objects[(Bucket, Key)] = Body
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.hits = []
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_engine(s3=None, **overrides):
+    options = {
+        "s3_client": s3 or FakeS3(),
+        # A fresh bucket per engine keeps the module-level image index from
+        # leaking between tests.
+        "s3_bucket": f"bucket-{uuid.uuid4().hex}",
+        "region": "us-east-1",
+        "log": lambda message: None,
+        "user_agent": "crawl-engine-tests",
+        "max_workers": 4,
+        "page_delay": 0,
+        "image_delay": 0,
+    }
+    options.update(overrides)
+    return CrawlEngine(**options)
+
+
+def crawl_with_images(engine, root):
+    def crawl_page(url):
+        html = engine.fetch(url).text
+        title = re.search(r"<h1>(.*?)</h1>", html).group(1)
+        images = engine.upload_images([root + src for src in re.findall(r'src="([^"]+)"', html)])
+        return {"source_url": url, "title": title, "images": images}
+
+    return crawl_page
+
+
+def page_hits(server, prefix="/products/"):
+    with server.lock:
+        return [(path, at) for path, at in server.hits if path.startswith(prefix)]
+
+
+def test_pages_to_one_host_are_spaced_by_page_delay(site):
+    root = base_url(site)
+    engine = make_engine(page_delay=0.2)
+    urls = [f"{root}/products/{n}" for n in range(4)]
+
+    items, failures, unstarted = engine.run(urls, lambda url: {"source_url": url, "html": engine.fetch(url).text})
+
+    assert failures == [] and unstarted == []
+    assert sorted(item["source_url"] for item in items) == sorted(urls)
+    times = sorted(at for _, at in page_hits(site))
+    assert len(times) == 4
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    # Four workers are free, so any spacing comes from the per-host limiter.
+    assert min(gaps) >= 0.15
+
+
+def test_rate_limiter_does_not_delay_other_hosts():
+    limiter = HostRateLimiter()
+    limiter.wait("https://shop.example/a", 5)
+
+    started = time.monotonic()
+    limiter.wait("https://cdn.example/image.png", 5)
+    limiter.wait("https://other.example/b", 5)
+
+    assert time.monotonic() - started < 0.1
+
+
+def test_retry_after_backs_off_and_retries_once(site):
+    root = base_url(site)
+    engine = make_engine()
+
+    items, failures, _ = engine.run([f"{root}/busy"], lambda url: {"html": engine.fetch(url).text})
+
+    assert failures == []
+    assert items == [{"html": "<h1>Busy</h1>"}]
+    times = [at for _, at in page_hits(site, "/busy")]
+    assert len(times) == 2
+    assert times[1] - times[0] >= 0.95
+
+
+def test_failed_pages_are_reported_without_stopping_the_run(site):
+    root = base_url(site)
+    engine = make_engine()
+    failed = []
+
+    items, failures, _ = engine.run(
+        [f"{root}/products/0", f"{root}/missing"],
+        lambda url: {"html": engine.fetch(url).text},
+        on_failure=lambda url, error: failed.append(url),
+    )
+
+    assert len(items) == 1
+    assert [failure["url"] for failure in failures] == [f"{root}/missing"]
+    assert failed == [f"{root}/missing"]
+
+
+def test_should_stop_leaves_unstarted_urls_in_order(site):
+    root = base_url(site)
+    engine = make_engine(max_workers=1)
+    urls = [f"{root}/products/{n}" for n in range(6)]
+    checks = []
+
+    def should_stop():
+        # The budget runs out once the first two pages have been started.
+        checks.append(True)
+        return len(checks) > 2
+
+    items, failures, unstarted = engine.run(
+        urls,
+        lambda url: {"source_url": url, "html": engine.fetch(url).text},
+        should_stop=should_stop,
+    )
+
+    # Pages already in flight finish; nothing new starts.
+    assert failures == []
+    assert sorted(item["source_url"] for item in items) == urls[:2]
+    assert unstarted == urls[2:]
+    assert len(page_hits(site)) == 2
+
+
+def test_items_are_upserted_in_batches_on_the_calling_thread(site):
+    root = base_url(site)
+    engine = make_engine()
+    urls = [f"{root}/products/{n}" for n in range(5)]
+    batches = []
+
+    def upsert(items):
+        batches.append((threading.current_thread(), [item["source_url"] for item in items]))
+
+    items, _, _ = engine.run(urls, lambda url: {"source_url": url, "html": engine.fetch(url).text}, upsert=upsert, batch_size=2)
+
+    assert [len(batch) for _, batch in batches] == [2, 2, 1]
+    assert all(thread is threading.current_thread() for thread, _ in batches)
+    assert sorted(url for _, batch in batches for url in batch) == sorted(urls)
+    assert len(items) == 5
+
+
+def test_images_are_stored_once_per_content(site):
+    root = base_url(site)
+    s3 = FakeS3()
+    engine = make_engine(s3=s3, max_workers=2)
+    urls = [f"{root}/products/0", f"{root}/products/1", f"{root}/products/twins"]
+
+    items, failures, _ = engine.run(urls, crawl_with_images(engine, root))
+
+    assert failures == []
+    by_title = {item["title"]: item for item in items}
+    # a.png and b.png carry the same bytes, so the page keeps one of them.
+    assert len(by_title["Twins"]["images"]) == 1
+    for n in (0, 1):
+        images = by_title[f"Product {n}"]["images"]
+        assert [image["original_url"] for image in images] == [
+            f"{root}/images/{n}.png",
+            f"{root}/images/shared.png",
+        ]
+        assert all(image["s3_url"].startswith(f"https://{engine.s3_bucket}.s3.us-east-1.amazonaws.com/images/") for image in images)
+    # 0.png, 1.png, shared.png and the twins' single content.
+    assert len(s3.objects) == 4
@@ -0,0 +1,213 @@
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("psycopg2")
+
+from helper import crawl_jobs
+from helper.crawl_jobs import CrawlBudget, acquire_job, crawl_frontier
+from helper.fetch_cache import FetchCache
+
+# Postgres is replaced by a connection that records statements and hands back
+# scripted rows, so these tests cover the Python side of the job protocol:
+# what is claimed, marked, saved and committed.
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.connection = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = sql.decode("utf-8") if isinstance(sql, bytes) else sql
+        self.conn.statements.append((" ".join(sql.split()), params))
+
+    def mogrify(self, template, args):
+        # Enough for execute_values, which joins mogrified rows into one statement.
+        self.conn.rows.append(tuple(args))
+        return repr(tuple(args)).encode("utf-8")
+
+    def fetchone(self):
+        return self.conn.fetchone_results.pop(0)
+
+
+class FakeConnection:
+    encoding = "UTF8"
+
+    def __init__(self, fetchone_results=()):
+        self.fetchone_results = list(fetchone_results)
+        self.statements = []
+        self.rows = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def executed(self, prefix):
+        return [params for sql, params in self.statements if sql.startswith(prefix)]
+
+
+class FakeBudget:
+    def __init__(self, remaining=300.0, checks_left=None):
+        self.remaining = remaining
+        self.checks_left = checks_left
+
+    def remaining_seconds(self):
+        return self.remaining
+
+    def exhausted(self):
+        if self.checks_left is None:
+            return False
+        self.checks_left -= 1
+        return self.checks_left < 0
+
+
+class FakeEngine:
+    # Mirrors CrawlEngine.run: should_stop is checked before each page starts,
+    # and every page that starts has its validators staged, as a fetch would.
+    def __init__(self, fetch_cache=None, failing=()):
+        self.fetch_cache = fetch_cache
+        self.failing = set(failing)
+        self.runs = []
+
+    def run(self, urls, crawl_page, upsert=None, on_failure=None, batch_size=None, should_stop=None):
+        self.runs.append(list(urls))
+        items, failures, unstarted = [], [], []
+        for index, url in enumerate(urls):
+            if should_stop and should_stop():
+                unstarted = list(urls[index:])
+                break
+            if self.fetch_cache:
+                self.fetch_cache.stage(url, {"etag": f'"{url}"'})
+            if url in self.failing:
+                failures.append({"url": url, "error": "boom"})
+            else:
+                items.append(crawl_page(url))
+        if upsert and items:
+            upsert(items)
+        return items, failures, unstarted
+
+
+def marked(conn):
+    # {url: status} from every mark_urls statement.
+    statuses = {}
+    for urls, status_values, _, _ in conn.executed("UPDATE crawl_job_urls"):
+        statuses.update(zip(urls, status_values))
+    return statuses
+
+
+def test_acquire_job_returns_the_invocation_number_and_leases_the_budget():
+    conn = FakeConnection(fetchone_results=[(3,)])
+
+    assert acquire_job(conn, "job-1", FakeBudget(remaining=300.0), print) == 3
+
+    [(lease_seconds, job_id)] = conn.executed("UPDATE crawl_jobs SET invocations")
+    assert job_id == "job-1"
+    assert lease_seconds == 300.0 + crawl_jobs.CRAWL_JOB_TIME_MARGIN_SECONDS
+    assert conn.commits == 1
+
+
+def test_acquire_job_leases_local_runs_for_an_hour():
+    conn = FakeConnection(fetchone_results=[(1,)])
+
+    assert acquire_job(conn, "job-1", CrawlBudget(None), print) == 1
+
+    [(lease_seconds, _)] = conn.executed("UPDATE crawl_jobs SET invocations")
+    assert lease_seconds == crawl_jobs.CRAWL_JOB_LOCAL_LEASE_SECONDS + crawl_jobs.CRAWL_JOB_TIME_MARGIN_SECONDS
+
+
+def test_acquire_job_backs_off_while_another_invocation_holds_the_lease():
+    conn = FakeConnection(fetchone_results=[None])
+    logged = []
+
+    assert acquire_job(conn, "job-1", FakeBudget(), logged.append) is None
+
+    assert "already running" in logged[0]
+    assert conn.executed("UPDATE crawl_jobs SET status") == []
+
+
+def test_acquire_job_fails_the_job_past_the_invocation_cap(monkeypatch):
+    monkeypatch.setattr(crawl_jobs, "CRAWL_JOB_MAX_INVOCATIONS", 5)
+    conn = FakeConnection(fetchone_results=[(5,), (6,)])
+    logged = []
+
+    assert acquire_job(conn, "job-1", FakeBudget(), logged.append) == 5
+    assert acquire_job(conn, "job-1", FakeBudget(), logged.append) is None
+
+    assert conn.executed("UPDATE crawl_jobs SET status") == [("failed", "job-1")]
+    assert "gave up after 5 invocations" in logged[0]
+
+
+def test_crawl_frontier_leaves_unstarted_urls_pending(monkeypatch):
+    monkeypatch.setattr(crawl_jobs, "CRAWL_JOB_FLUSH_SIZE", 3)
+    conn = FakeConnection()
+    engine = FakeEngine()
+    urls = [f"https://example.com/{n}" for n in range(7)]
+    upserted = []
+
+    # Two pages start, then the budget runs out mid-flush.
+    remaining = crawl_frontier(
+        engine,
+        conn,
+        "job-1",
+        urls,
+        lambda url: {"source_url": url},
+        upserted.extend,
+        FakeBudget(checks_left=3),
+    )
+
+    assert remaining == urls[2:]
+    assert marked(conn) == {urls[0]: "done", urls[1]: "done"}
+    assert [item["source_url"] for item in upserted] == urls[:2]
+    assert engine.runs == [urls[:3]]
+    assert conn.commits == 1
+
+
+def test_crawl_frontier_stops_before_a_flush_once_the_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(crawl_jobs, "CRAWL_JOB_FLUSH_SIZE", 2)
+    conn = FakeConnection()
+    engine = FakeEngine()
+    urls = [f"https://example.com/{n}" for n in range(4)]
+
+    remaining = crawl_frontier(engine, conn, "job-1", urls, lambda url: {}, None, FakeBudget(checks_left=0))
+
+    assert remaining == urls
+    assert engine.runs == []
+    assert conn.statements == []
+
+
+def test_failed_urls_do_not_save_fetch_cache_validators(monkeypatch):
+    monkeypatch.setattr(crawl_jobs, "CRAWL_JOB_FLUSH_SIZE", 10)
+    conn = FakeConnection()
+    cache = FetchCache("tests")
+    cache.unchanged.add("https://example.com/same")
+    engine = FakeEngine(fetch_cache=cache, failing={"https://example.com/broken"})
+    urls = ["https://example.com/new", "https://example.com/broken", "https://example.com/same"]
+
+    remaining = crawl_frontier(engine, conn, "job-1", urls, lambda url: {}, None, FakeBudget())
+
+    assert remaining == []
+    assert marked(conn) == {
+        "https://example.com/new": "done",
+        "https://example.com/broken": "failed",
+        "https://example.com/same": "skipped",
+    }
+    saved_urls = [row[1] for row in conn.rows if row[0] == "tests"]
+    assert saved_urls == ["https://example.com/new", "https://example.com/same"]
+    # The failed page is re-fetched in full next time rather than trusted.
+    assert cache.known("https://example.com/broken") is None
+    assert cache.known("https://example.com/new")["etag"] == '"https://example.com/new"'
+    # Marks and validators land in one transaction.
+    assert conn.commits == 1
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("botocore")
+
+from helper.image_ingest import known_images_from_rows, normalize_image_url
+
+SHOPIFY = "https://cdn.shopify.com/s/files/1/0001/products"
+WIKIA = "https://static.wikia.nocookie.net/hotwheels/images/a/ab"
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        # Resize suffixes fold into the upload's own name.
+        (f"{SHOPIFY}/gtr_800x.jpg", f"{SHOPIFY}/gtr.jpg"),
+        (f"{SHOPIFY}/gtr_x600.jpg", f"{SHOPIFY}/gtr.jpg"),
+        (f"{SHOPIFY}/gtr_1024x1024@2x.jpg", f"{SHOPIFY}/gtr.jpg"),
+        (f"{SHOPIFY}/gtr_300x300_crop_center.jpg", f"{SHOPIFY}/gtr.jpg"),
+        (f"{SHOPIFY}/gtr_grande.png", f"{SHOPIFY}/gtr.png"),
+        # The upload version is kept; sizing parameters are dropped.
+        (f"{SHOPIFY}/gtr.jpg?v=1699999999", f"{SHOPIFY}/gtr.jpg?v=1699999999"),
+        (f"{SHOPIFY}/gtr_800x.jpg?v=17&width=400&height=300", f"{SHOPIFY}/gtr.jpg?v=17"),
+        (f"{SHOPIFY}/gtr.jpg?width=400", f"{SHOPIFY}/gtr.jpg"),
+        # Storefront domains serve the same CDN under /cdn/shop/.
+        (
+            "https://shop.example.com/cdn/shop/products/gtr_800x.jpg?width=200",
+            "https://shop.example.com/cdn/shop/products/gtr.jpg",
+        ),
+        ("//cdn.shopify.com/s/files/1/0001/products/gtr_800x.jpg", f"{SHOPIFY}/gtr.jpg"),
+        # Names that merely look like sizes are somebody's real file name.
+        (f"{SHOPIFY}/wheel_large.jpg", f"{SHOPIFY}/wheel_large.jpg"),
+        (f"{SHOPIFY}/box_thumb.jpg", f"{SHOPIFY}/box_thumb.jpg"),
+        (f"{SHOPIFY}/gtr_800x_box.jpg", f"{SHOPIFY}/gtr_800x_box.jpg"),
+        # Wikia resize paths collapse to the original revision.
+        (
+            f"{WIKIA}/Skyline.jpg/revision/latest/scale-to-width-down/250?cb=20200101",
+            f"{WIKIA}/Skyline.jpg/revision/latest?cb=20200101",
+        ),
+        (f"{WIKIA}/Skyline.jpg/revision/latest?cb=20200101", f"{WIKIA}/Skyline.jpg/revision/latest?cb=20200101"),
+        # Other hosts are only lower-cased in scheme and host.
+        ("HTTPS://Images.Example.com/cars/gtr_800x.jpg?width=3", "https://images.example.com/cars/gtr_800x.jpg?width=3"),
+    ],
+)
+def test_normalize_image_url(url, expected):
+    assert normalize_image_url(url) == expected
+
+
+def test_known_images_are_keyed_by_normalized_url():
+    rows = [
+        {"images": [{"original_url": f"{SHOPIFY}/gtr_800x.jpg?width=400", "s3_url": "https://bucket/images/a.jpg"}]},
+        {"images": [{"original_url": f"{SHOPIFY}/nsx.jpg"}]},
+        {"images": None},
+    ]
+
+    assert known_images_from_rows(rows) == {f"{SHOPIFY}/gtr.jpg": "https://bucket/images/a.jpg"}
@@ -0,0 +1,147 @@
+import re
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from helper import normalization
+from helper.normalization import normalize_name, resolve_names, resolve_product_lines
+
+
+class FakeCursor:
+    # Plays the INSERT ... ON CONFLICT ... RETURNING statements that
+    # execute_values sends: existing keys keep their id, new ones get the next.
+    def __init__(self, db):
+        self.db = db
+        self.connection = db
+        self._pending = []
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, template, args):
+        self._pending.append(tuple(args))
+        return b"(...)"
+
+    def execute(self, sql, params=None):
+        sql = sql.decode("utf-8") if isinstance(sql, bytes) else sql
+        table = re.search(r"INSERT INTO (\w+)", sql).group(1)
+        rows = self.db.tables.setdefault(table, {})
+        self.db.queries.append((table, list(self._pending)))
+        self._result = []
+        for key in self._pending:
+            row_id = rows.setdefault(key, f"{table}-{len(rows) + 1}")
+            self._result.append((*key, row_id))
+        self._pending = []
+
+    def fetchall(self):
+        return self._result
+
+
+class FakeDatabase:
+    encoding = "UTF8"
+
+    def __init__(self):
+        self.tables = {}
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    for cache in normalization._cache.values():
+        cache.clear()
+    yield
+    for cache in normalization._cache.values():
+        cache.clear()
+
+
+def log(message):
+    pass
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, None),
+        ("", None),
+        ("   ", None),
+        ("\t\n", None),
+        ("Mini GT", "mini gt"),
+        ("  Tarmac Works ", "tarmac works"),
+    ],
+)
+def test_normalize_name(value, expected):
+    assert normalize_name(value) == expected
+
+
+def test_resolve_names_inserts_each_distinct_name_once():
+    db = FakeDatabase()
+
+    ids = resolve_names(db, "brands", ["Mini GT", " mini gt", "INNO64", None, "   ", ""], log)
+
+    assert ids == {"inno64": "brands-1", "mini gt": "brands-2"}
+    # One statement for the batch, in sorted order, without blank names.
+    assert db.queries == [("brands", [("inno64",), ("mini gt",)])]
+
+
+def test_resolve_names_only_queries_names_it_has_not_seen():
+    db = FakeDatabase()
+    resolve_names(db, "makes", ["Nissan", "Honda"], log)
+
+    ids = resolve_names(db, "makes", ["nissan", "Toyota"], log)
+
+    assert ids == {"nissan": "makes-2", "toyota": "makes-3"}
+    assert db.queries[1] == ("makes", [("toyota",)])
+
+    resolve_names(db, "makes", ["Honda", "Toyota"], log)
+    assert len(db.queries) == 2
+
+
+def test_whitespace_names_resolve_to_no_id():
+    db = FakeDatabase()
+
+    ids = resolve_names(db, "makes", ["  ", None], log)
+
+    assert ids == {}
+    assert db.queries == []
+    assert ids.get(normalize_name("  ")) is None
+
+
+def test_product_lines_with_one_name_resolve_per_brand():
+    db = FakeDatabase()
+
+    ids = resolve_product_lines(
+        db,
+        [("Premium", "brand-a"), ("premium ", "brand-b"), ("PREMIUM", "brand-a"), ("  ", "brand-a")],
+        log,
+    )
+
+    assert ids == {
+        ("premium", "brand-a"): "product_lines-1",
+        ("premium", "brand-b"): "product_lines-2",
+    }
+    assert db.queries == [("product_lines", [("premium", "brand-a"), ("premium", "brand-b")])]
+
+    # A third brand's line of the same name is new; the other two are cached.
+    ids = resolve_product_lines(db, [("Premium", "brand-b"), ("Premium", "brand-c")], log)
+    assert ids[("premium", "brand-c")] == "product_lines-3"
+    assert db.queries[1] == ("product_lines", [("premium", "brand-c")])
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(normalization, "NORMALIZATION_CACHE_MAX_ENTRIES", 2)
+    db = FakeDatabase()
+
+    resolve_names(db, "brands", ["a", "b"], log)
+    resolve_names(db, "brands", ["c"], log)
+
+    assert list(normalization._cache["brands"]) == ["b", "c"]
+    resolve_names(db, "brands", ["a"], log)
+    assert db.queries[-1] == ("brands", [("a",)])
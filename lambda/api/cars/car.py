@@ -2,11 +2,10 @@ import os
 import json
 import psycopg2
 import psycopg2.extras
-import boto3
 import uuid
 import traceback
 
-secrets_client = boto3.client("secretsmanager")
+from helper.db import get_db_connection, release_db_connection
 
 SECRET_ARN = os.environ["DB_SECRET_ARN"]
 DB_NAME = os.environ["DB_NAME"]
@@ -25,19 +24,6 @@ def parse_bool(value):
     return str(value).lower() in {"1", "true", "yes", "on"}
 
 
-def get_conn():
-    secret = json.loads(
-        secrets_client.get_secret_value(SecretId=SECRET_ARN)["SecretString"]
-    )
-    return psycopg2.connect(
-        dbname=DB_NAME,
-        user=secret["username"],
-        password=secret["password"],
-        host=secret["host"],
-        port=int(secret.get("port", 5432)),
-    )
-
-
 def parse_uuid(value, name):
     if not value:
         return None
@@ -47,28 +33,6 @@ def parse_uuid(value, name):
         raise ValueError(f"Invalid {name}: {value}")
 
 
-# -----------------------------
-# SQL: shared stats CTE
-# (better for scaling vs repeating subqueries)
-# -----------------------------
-STATS_CTE = """
-WITH car_stats AS (
-  SELECT
-    car_id,
-    COUNT(DISTINCT user_id) AS owners_count
-  FROM user_collection_items
-  GROUP BY car_id
-),
-like_stats AS (
-  SELECT
-    car_id,
-    COUNT(*) AS likes_count
-  FROM user_liked_items
-  GROUP BY car_id
-)
-"""
-
-
 # ---------------------------------------------------
 # SQL: single car
 # ---------------------------------------------------
@@ -100,7 +64,6 @@ def fetch_car_detail(cur, car_id, user_id=None):
         user_join = "LEFT JOIN user_liked_items uli ON false"
 
     sql = f"""
-    {STATS_CTE}
     SELECT
         c.id,
         c.original_id,
@@ -123,7 +86,7 @@ def fetch_car_detail(cur, car_id, user_id=None):
         {liked_expr} AS liked,
 
         COALESCE(cs.owners_count, 0) AS owners_count,
-        COALESCE(ls.likes_count, 0) AS likes_count
+        COALESCE(cs.likes_count, 0) AS likes_count
 
     FROM cars c
 
@@ -134,7 +97,6 @@ def fetch_car_detail(cur, car_id, user_id=None):
     {user_join}
 
     LEFT JOIN car_stats cs ON cs.car_id = c.id
-    LEFT JOIN like_stats ls ON ls.car_id = c.id
 
     WHERE c.id = %s
     """
@@ -226,7 +188,6 @@ def fetch_car_list(cur, filters, params, user_id, limit, offset, order_clause):
     where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
 
     sql = f"""
-    {STATS_CTE}
     SELECT
       c.id,
       c.title,
@@ -246,7 +207,7 @@ def fetch_car_list(cur, filters, params, user_id, limit, offset, order_clause):
       {liked_expr} AS liked,
 
       COALESCE(cs.owners_count, 0) AS owners_count,
-      COALESCE(ls.likes_count, 0) AS likes_count
+      COALESCE(cs.likes_count, 0) AS likes_count
 
     FROM cars c
 
@@ -257,7 +218,6 @@ def fetch_car_list(cur, filters, params, user_id, limit, offset, order_clause):
     {user_join}
 
     LEFT JOIN car_stats cs ON cs.car_id = c.id
-    LEFT JOIN like_stats ls ON ls.car_id = c.id
 
     {where_clause}
     {order_clause}
@@ -296,7 +256,7 @@ def handler(event, context):
         limit = int(params.get("limit", 20))
         offset = int(params.get("offset", 0))
 
-        conn = get_conn()
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             if owners_only:
                 if not cid:
@@ -358,7 +318,7 @@ def handler(event, context):
 
             brands = fetch_brands(cur)
 
-        conn.close()
+        release_db_connection(conn)
 
         return {
             "statusCode": 200,
@@ -1,35 +1,11 @@
 import json
 import os
-import boto3
-import psycopg2
 import traceback
 
-secrets_client = boto3.client("secretsmanager")
+from helper.db import get_db_connection, release_db_connection
+
 SECRET_ARN = os.environ.get("SECRET_ARN", "SECRET")
 DB_NAME = os.environ.get("DB_NAME", "DB")
-DB_SECRET = None
-DB_CONN = None
-
-
-def get_db_connection():
-    global DB_SECRET, DB_CONN
-
-    # Cache secret
-    if DB_SECRET is None:
-        resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
-        DB_SECRET = json.loads(resp["SecretString"])
-
-    # Cache connection
-    if DB_CONN is None or DB_CONN.closed:
-        DB_CONN = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_SECRET["username"],
-            password=DB_SECRET["password"],
-            host=DB_SECRET["host"],
-            port=int(DB_SECRET.get("port", 5432)),
-        )
-
-    return DB_CONN
 
 
 def success_response(data=None, message="Success"):
@@ -95,7 +71,7 @@ def handler(event, context):
                 "body": json.dumps({"error": "userId is required"}),
             }
 
-        conn = get_db_connection()
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
         conn.autocommit = False
 
         try:
@@ -190,7 +166,7 @@ def handler(event, context):
             conn.rollback()
             raise
         finally:
-            conn.close()
+            release_db_connection(conn)
 
     except Exception as e:
         print("Error:", e)
@@ -1,34 +1,10 @@
 import json
 import os
-import boto3
-import psycopg2
 
-secrets_client = boto3.client("secretsmanager")
+from helper.db import get_db_connection, release_db_connection
+
 SECRET_ARN = os.environ.get("SECRET_ARN", "SECRET")
 DB_NAME = os.environ.get("DB_NAME", "DB")
-DB_SECRET = None
-DB_CONN = None
-
-
-def get_db_connection():
-    global DB_SECRET, DB_CONN
-
-    # Cache secret
-    if DB_SECRET is None:
-        resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
-        DB_SECRET = json.loads(resp["SecretString"])
-
-    # Cache connection
-    if DB_CONN is None or DB_CONN.closed:
-        DB_CONN = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_SECRET["username"],
-            password=DB_SECRET["password"],
-            host=DB_SECRET["host"],
-            port=int(DB_SECRET.get("port", 5432)),
-        )
-
-    return DB_CONN
 
 
 def handler(event, context):
@@ -53,7 +29,7 @@ def handler(event, context):
                 "body": json.dumps({"error": "userId is required"}),
             }
 
-        conn = get_db_connection()
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
 
         with conn.cursor() as cur:
             sql = """
@@ -87,7 +63,7 @@ def handler(event, context):
             rows = cur.fetchall()
             conn.commit()
 
-        conn.close()
+        release_db_connection(conn)
 
         return {
             "statusCode": 200,
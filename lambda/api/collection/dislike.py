@@ -1,28 +1,12 @@
 import json
 import os
-import boto3
-import psycopg2
 
-secrets_client = boto3.client("secretsmanager")
+from helper.db import get_db_connection, release_db_connection
+
 SECRET_ARN = os.environ.get("SECRET_ARN", "SECRET")
 DB_NAME = os.environ.get("DB_NAME", "DB")
 
 
-def get_db_connection():
-    resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
-    secret = json.loads(resp["SecretString"])
-
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=secret.get("username"),
-        password=secret.get("password"),
-        host=secret.get("host"),
-        port=int(secret.get("port", 5432)),
-    )
-
-    return conn
-
-
 def handler(event, context):
     try:
         params = event.get("queryStringParameters") or {}
@@ -43,7 +27,7 @@ def handler(event, context):
                 "body": json.dumps({"error": "userId is required"}),
             }
 
-        conn = get_db_connection()
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
 
         with conn.cursor() as cur:
             sql = """
@@ -56,7 +40,7 @@ def handler(event, context):
             row = cur.fetchone()
             conn.commit()
 
-        conn.close()
+        release_db_connection(conn)
 
         return {
             "statusCode": 200,
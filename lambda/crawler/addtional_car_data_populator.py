@@ -4,6 +4,8 @@ import logging
 import os
 from psycopg2.extras import execute_values
 import psycopg2
+from helper.db import get_db_connection, release_db_connection
+from helper.normalization import normalize_name, resolve_names
 import json
 from datetime import date
 import time
@@ -15,22 +17,10 @@ LOGS_TABLE_NAME = os.environ.get("LOGS_TABLE_NAME", "CrawlerLogsTable")
 
 
 # AWS clients
-secrets_client = boto3.client("secretsmanager")
 dynamodb = boto3.resource("dynamodb")
 
 log_table = dynamodb.Table(LOGS_TABLE_NAME)
 
-def get_db_credentials():
-    resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
-    secret = json.loads(resp["SecretString"])
-    return {
-        "host": secret.get("host"),
-        "username": secret.get("username"),
-        "password": secret.get("password"),
-        "port": int(secret.get("port", 5432)),
-    }
-
-
 def combine_month_year(metadata):
     """
     metadata: {"release_month": 4, "release_year": 2024, ...}
@@ -106,6 +96,8 @@ def ensure_chase_variant(conn, base_car_id, log):
         log(f"Created chase variant for {base_car_id}")
 
 def update_ai_metadata_only(conn, items, a_version, log):
+    make_ids = resolve_names(conn, "makes", [it.get("make") for it in items], log)
+
     with conn.cursor() as cur:
 
         update_sql = """
@@ -126,7 +118,7 @@ def update_ai_metadata_only(conn, items, a_version, log):
             release_date = combine_month_year(it)
             is_limited = it.get("is_limited", False)
             limited_pieces = it.get("limited_pieces")
-            make_id = get_or_create_normalized(conn, it.get("make"), log)
+            make_id = make_ids.get(normalize_name(it.get("make")))
 
             cur.execute(
                 update_sql,
@@ -148,38 +140,6 @@ def update_ai_metadata_only(conn, items, a_version, log):
 
         conn.commit()
 
-def get_or_create_normalized(conn, value, log):
-    if not value:
-        return None
-
-    value = value.strip().lower()
-
-    with conn.cursor() as cur:
-        cur.execute(
-            f"INSERT INTO makes (name) VALUES (%s) "
-            f"ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name "
-            f"RETURNING id",
-            (value,)
-        )
-        
-        row_id = cur.fetchone()[0]
-
-    log(f"Resolved makes: {value}")
-    return row_id
-
-
-def get_db_conn(creds):
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=creds["username"],
-        password=creds["password"],
-        host=creds["host"],
-        port=creds["port"],
-    )
-
-    return conn
-
-
 def get_cars_to_update(conn, new_a_ver, limit, log):
     items = []
     data_query = f"""
@@ -329,8 +289,7 @@ def handler(event, context):
         a_version = body.get("a_version", 1)
         limit = body.get("limit")
 
-        creds = get_db_credentials()
-        conn = get_db_conn(creds)
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
 
         if car_ids:
             items_to_update = get_cars_to_update_by_id(conn, car_ids, log)
@@ -342,7 +301,7 @@ def handler(event, context):
         if len(items_to_insert) > 0:
             update_ai_metadata_only(conn, items_to_insert, a_version, log)
 
-        conn.close()
+        release_db_connection(conn)
         log(f"{[t['id'] for t in items_to_insert]}")
 
         log("DONE")
@@ -16,6 +16,23 @@ from bs4 import BeautifulSoup
 from requests import HTTPError
 from psycopg2.extras import Json, execute_values
 
+from helper.crawl_jobs import (
+    CRAWL_JOB_FLUSH_SIZE,
+    CrawlBudget,
+    acquire_job,
+    continue_job,
+    enqueue_urls,
+    fail_job,
+    finish_job,
+    job_summary,
+    job_url_details,
+    mark_urls,
+    pending_urls,
+    start_job,
+)
+from helper.db import get_db_connection, release_db_connection
+from helper.fetch_cache import FetchCache, PageUnchanged, content_hash
+
 
 S3_BUCKET = os.environ.get("BUCKET_NAME", "DiecastDataBucket")
 SECRET_ARN = os.environ.get("DB_SECRET_ARN", "SECRET")
@@ -33,6 +50,7 @@ LOGS_TABLE_NAME = os.environ.get("LOGS_TABLE_NAME", "CrawlerLogsTable")
 REQUEST_DELAY = float(os.environ.get("REQUEST_DELAY", "1.0"))
 RAW_HTML_PREFIX = os.environ.get("HOTWHEELS_RAW_HTML_PREFIX", "hotwheels/raw-html/")
 PARSER_VERSION = "2026-04-25-v2"
+FANDOM_QUERY_TITLES_LIMIT = 50
 SKIPPED_CATEGORY_PAGE_TITLES = {
     "List of 1968 Hot Wheels",
     "List of 1968 Hot Wheels new castings",
@@ -41,7 +59,6 @@ SKIPPED_CATEGORY_PAGE_TITLES = {
 
 s3 = boto3.client("s3")
 dynamodb = boto3.resource("dynamodb")
-secrets_client = boto3.client("secretsmanager")
 log_table = dynamodb.Table(LOGS_TABLE_NAME)
 
 logger = logging.getLogger()
@@ -59,27 +76,6 @@ CORS_HEADERS = {
 # DB and platform helpers
 # ---------------------------------------------------------------------------
 
-def get_db_credentials():
-    resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
-    secret = json.loads(resp["SecretString"])
-    return {
-        "host": secret.get("host"),
-        "username": secret.get("username"),
-        "password": secret.get("password"),
-        "port": int(secret.get("port", 5432)),
-    }
-
-
-def get_db_conn(creds):
-    return psycopg2.connect(
-        dbname=DB_NAME,
-        user=creds["username"],
-        password=creds["password"],
-        host=creds["host"],
-        port=creds["port"],
-    )
-
-
 def safe_get(url, timeout=20):
     headers = {
         "User-Agent": USER_AGENT,
@@ -155,7 +151,8 @@ def fetch_fandom_page_html_via_api(url, timeout=20):
     if not html:
         raise ValueError("Fandom API returned no parsed HTML")
 
-    return html, normalize_space(BeautifulSoup(title, "html.parser").get_text(" ", strip=True))
+    page_title = normalize_space(BeautifulSoup(title, "html.parser").get_text(" ", strip=True))
+    return html, page_title, parsed_page.get("revid")
 
 
 def fetch_fandom_api_json(url, params, timeout=20):
@@ -172,6 +169,43 @@ def fetch_fandom_api_json(url, params, timeout=20):
     return resp.json()
 
 
+def fetch_fandom_revisions(page_urls):
+    # Returns {page_url: latest revision id}. One query request covers up to
+    # FANDOM_QUERY_TITLES_LIMIT pages, so a refresh can tell which casting
+    # pages changed without parsing any of them.
+    titles_by_host = {}
+    for page_url in page_urls:
+        page_name = extract_fandom_page_name(page_url)
+        if page_name:
+            host = urllib.parse.urlparse(page_url).netloc
+            titles_by_host.setdefault(host, {})[page_name.replace("_", " ")] = page_url
+
+    revisions = {}
+    for titles in titles_by_host.values():
+        base_url = next(iter(titles.values()))
+        names = list(titles)
+        for offset in range(0, len(names), FANDOM_QUERY_TITLES_LIMIT):
+            payload = fetch_fandom_api_json(
+                base_url,
+                {
+                    "action": "query",
+                    "prop": "info",
+                    "titles": "|".join(names[offset:offset + FANDOM_QUERY_TITLES_LIMIT]),
+                    "format": "json",
+                    "formatversion": "2",
+                },
+            )
+            query = payload.get("query") or {}
+            requested = {item["to"]: item["from"] for item in query.get("normalized") or []}
+            for page in query.get("pages") or []:
+                title = page.get("title")
+                page_url = titles.get(requested.get(title, title))
+                if page_url and page.get("lastrevid") is not None:
+                    revisions[page_url] = page["lastrevid"]
+
+    return revisions
+
+
 # ---------------------------------------------------------------------------
 # Generic parsing helpers
 # ---------------------------------------------------------------------------
@@ -678,7 +712,7 @@ def dedupe_stage_rows(items):
     return list(deduped.values())
 
 
-def upsert_stage_rows(conn, items):
+def upsert_stage_rows(conn, items, commit=True):
     if not items:
         return 0
 
@@ -751,108 +785,75 @@ def upsert_stage_rows(conn, items):
         # has been imported, that linked cars.id stays attached so later re-crawls
         # and re-approvals continue to target the same live car row.
         execute_values(cur, sql, values)
-        conn.commit()
+        if commit:
+            conn.commit()
 
     return len(items)
 
 
-def casting_page_already_staged(conn, source_url):
+def staged_casting_pages(conn, source_urls):
+    if not source_urls:
+        return set()
+
     with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT EXISTS (
-                SELECT 1
-                FROM hot_wheels_fandom_staging
-                WHERE source_url = %s
-                  AND page_type = 'casting_page'
-            )
+            SELECT DISTINCT source_url
+            FROM hot_wheels_fandom_staging
+            WHERE source_url = ANY(%s)
+              AND page_type = 'casting_page'
             """,
-            (source_url,),
+            (list(source_urls),),
         )
-        row = cur.fetchone()
-        return bool(row and row[0])
+        return {row[0] for row in cur.fetchall()}
 
 
 # ---------------------------------------------------------------------------
 # Category discovery and crawl orchestration
 # ---------------------------------------------------------------------------
 
-def discover_category_member_targets(url):
-    page_name = extract_fandom_page_name(url)
-    if not is_category_page_name(page_name):
-        return [], []
-
-    crawl_targets = []
-    category_summaries = []
-    pending_categories = [(page_name, url, None)]
-    seen_member_titles = set()
-    seen_categories = {page_name}
-
-    # Hot Wheels category pages can point to other Category:* pages before they
-    # finally expose the casting pages we want. Walk category-to-category until
-    # we reach namespace-0 member pages, while tracking visited categories so a
-    # cyclical category graph cannot loop forever.
-    while pending_categories:
-        current_category, current_category_url, parent_category_url = pending_categories.pop(0)
-        continuation = None
-        discovered_count = 0
-
-        while True:
-            params = {
-                "action": "query",
-                "list": "categorymembers",
-                "cmtitle": current_category,
-                "cmlimit": "max",
-                "format": "json",
-                "formatversion": "2",
-            }
-            if continuation:
-                params["cmcontinue"] = continuation
-
-            payload = fetch_fandom_api_json(url, params)
-            for member in (payload.get("query") or {}).get("categorymembers") or []:
-                title = normalize_space(member.get("title"))
-                if not title or title in seen_member_titles:
-                    continue
-                if should_skip_category_member_title(title):
-                    continue
-
-                if is_category_page_name(title):
-                    if title not in seen_categories:
-                        seen_categories.add(title)
-                        pending_categories.append(
-                            (
-                                title,
-                                build_fandom_page_url(url, title),
-                                current_category_url,
-                            )
-                        )
-                    continue
+def discover_category_members(url):
+    # Lists one category's direct members as (page_urls, category_urls). The
+    # crawl job's frontier walks nested categories breadth-first, one category
+    # per step, and its per-job URL uniqueness stops cyclical category graphs.
+    page_urls = []
+    category_urls = []
+    continuation = None
+
+    while True:
+        params = {
+            "action": "query",
+            "list": "categorymembers",
+            "cmtitle": extract_fandom_page_name(url),
+            "cmlimit": "max",
+            "format": "json",
+            "formatversion": "2",
+        }
+        if continuation:
+            params["cmcontinue"] = continuation
 
-                seen_member_titles.add(title)
-                crawl_targets.append((build_fandom_page_url(url, title), current_category_url))
-                discovered_count += 1
+        payload = fetch_fandom_api_json(url, params)
+        for member in (payload.get("query") or {}).get("categorymembers") or []:
+            title = normalize_space(member.get("title"))
+            if not title or should_skip_category_member_title(title):
+                continue
 
-            continuation = ((payload.get("continue") or {}).get("cmcontinue"))
-            # Large year categories are paginated on the web UI via a "next"
-            # link. The MediaWiki API exposes the same pagination through
-            # cmcontinue, so keep following it until the category is exhausted.
-            if not continuation:
-                break
+            if is_category_page_name(title):
+                category_urls.append(build_fandom_page_url(url, title))
+            else:
+                page_urls.append(build_fandom_page_url(url, title))
 
-        category_summaries.append(
-            {
-                "source_url": current_category_url,
-                "discovered_from": parent_category_url,
-                "page_type": "category_members",
-                "discovered_count": discovered_count,
-            }
-        )
+        continuation = ((payload.get("continue") or {}).get("cmcontinue"))
+        # Large year categories are paginated on the web UI via a "next"
+        # link. The MediaWiki API exposes the same pagination through
+        # cmcontinue, so keep following it until the category is exhausted.
+        if not continuation:
+            break
 
-    return crawl_targets, category_summaries
+    return page_urls, category_urls
 
 
-def crawl_page(url, job_id, log, discovered_from=None):
+def crawl_page(url, job_id, log, fetch_cache, discovered_from=None):
     log(f"Crawling Hot Wheels catalog page {url}")
     time.sleep(REQUEST_DELAY)
     try:
@@ -860,13 +861,16 @@ def crawl_page(url, job_id, log, discovered_from=None):
         # with 403s, while the MediaWiki parse API is much more reliable for
         # crawler traffic. Use the API first and only fall back to direct HTML
         # if the API path fails for some unexpected reason.
-        html, page_title = fetch_fandom_page_html_via_api(url)
-        return parse_hot_wheels_page(url, html, job_id, page_title, discovered_from=discovered_from)
+        html, page_title, revid = fetch_fandom_page_html_via_api(url)
     except Exception as error:
         log(f"Fandom API parse fetch failed for {url}: {error}. Falling back to direct page fetch.")
         resp = safe_get(url)
+        fetch_cache.check_response(url, resp)
         return parse_hot_wheels_page(url, resp.text, job_id, discovered_from=discovered_from)
 
+    fetch_cache.stage(url, {"revid": revid, "content_hash": content_hash(html.encode("utf-8"))})
+    return parse_hot_wheels_page(url, html, job_id, page_title, discovered_from=discovered_from)
+
 
 # ---------------------------------------------------------------------------
 # Lambda entrypoint
@@ -880,6 +884,7 @@ def handler(event, context):
 
     job_id = body.get("job_id") or f"hotwheels-{int(time.time())}"
     override = bool(body.get("override"))
+    force = bool(body.get("force"))
     one_month = 30 * 24 * 60 * 60
 
     def log(message):
@@ -896,88 +901,172 @@ def handler(event, context):
 
     log("Start Hot Wheels staging crawl")
 
+    budget = CrawlBudget(context)
     page_urls = body.get("page_urls") or []
-    if not page_urls:
+    if not page_urls and not body.get("resume"):
         return {
             "statusCode": 400,
             "headers": CORS_HEADERS,
             "body": json.dumps({"error": "page_urls is required"}),
         }
 
+    conn = None
+    invocation = None
     try:
-        creds = get_db_credentials()
-        conn = get_db_conn(creds)
-
-        total_rows = 0
-        page_summaries = []
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
+
+        if not body.get("resume"):
+            start_job(conn, job_id, "hotwheels", {"override": override}, [])
+            for page_url in page_urls:
+                kind = "category" if is_category_page_name(extract_fandom_page_name(page_url)) else "page"
+                enqueue_urls(conn, job_id, [page_url], kind=kind)
+
+        invocation = acquire_job(conn, job_id, budget, log)
+        if invocation is None:
+            release_db_connection(conn)
+            return {
+                "statusCode": 409,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "job is finished or already running"}),
+            }
 
-        for page_url in page_urls:
-            crawl_targets = [(page_url, None)]
+        # Scoped by parser version so a parser change re-parses every page.
+        fetch_cache = FetchCache(f"hotwheels:{PARSER_VERSION}", revalidate=not force)
+        stage_rows = []
+        url_results = []
+
+        def flush():
+            # Parsed rows and the frontier marks for the pages they came from
+            # commit together, so a resumed job never loses or repeats a page.
+            upsert_stage_rows(conn, stage_rows, commit=False)
+            mark_urls(conn, job_id, url_results, commit=False)
+            fetch_cache.save(conn, [url for url, status, _ in url_results if status != "failed"], commit=False)
+            conn.commit()
+            stage_rows.clear()
+            url_results.clear()
+
+        while not budget.exhausted():
+            frontier = pending_urls(conn, job_id)
+            if not frontier:
+                break
 
-            if is_category_page_name(extract_fandom_page_name(page_url)):
+            staged = staged_casting_pages(conn, [url for url, kind, _ in frontier if kind == "page"])
+            already_staged = set() if override else staged
+            revisions = {}
+            if override and not force and staged:
+                # An override refresh only needs the staged pages whose wiki
+                # revision moved on since they were last parsed.
+                fetch_cache.load(conn, staged)
                 try:
-                    crawl_targets, category_summaries = discover_category_member_targets(page_url)
-                    log(f"Discovered {len(crawl_targets)} casting pages from {page_url}")
-                    page_summaries.extend(category_summaries)
+                    revisions = fetch_fandom_revisions([url for url in staged if fetch_cache.known(url)])
                 except Exception as exc:
-                    log(f"Failed discovering category members for {page_url}: {exc}")
-                    log(traceback.format_exc())
-                    page_summaries.append(
-                        {
-                            "source_url": page_url,
-                            "page_type": "category_members",
-                            "error": str(exc),
-                        }
+                    log(f"Failed fetching page revisions, crawling every page: {exc}")
+
+            for target_url, kind, discovered_from in frontier:
+                if budget.exhausted():
+                    break
+
+                if kind == "category":
+                    try:
+                        member_urls, category_urls = discover_category_members(target_url)
+                        # Hot Wheels category pages can point to other
+                        # Category:* pages before they finally expose the
+                        # casting pages we want, so nested categories go back
+                        # on the frontier and are walked in later steps.
+                        enqueue_urls(conn, job_id, [(url, target_url) for url in category_urls], kind="category")
+                        enqueue_urls(conn, job_id, [(url, target_url) for url in member_urls])
+                        log(f"Discovered {len(member_urls)} casting pages from {target_url}")
+                        url_results.append(
+                            (target_url, "done", {"page_type": "category_members", "discovered_count": len(member_urls)})
+                        )
+                    except Exception as exc:
+                        log(f"Failed discovering category members for {target_url}: {exc}")
+                        log(traceback.format_exc())
+                        url_results.append(
+                            (target_url, "failed", {"page_type": "category_members", "error": str(exc)})
+                        )
+                    continue
+
+                if target_url in already_staged:
+                    # Category crawls often rediscover the same casting page
+                    # across different year buckets. Skip it by default so
+                    # we do not restage the same casting repeatedly unless
+                    # an admin explicitly asks for an override refresh.
+                    log(f"Skipping already staged casting page {target_url}")
+                    url_results.append(
+                        (
+                            target_url,
+                            "skipped",
+                            {"page_type": "casting_page", "skipped": True, "reason": "already_staged"},
+                        )
                     )
                     continue
 
-            for target_url, discovered_from in crawl_targets:
                 try:
-                    if not override and casting_page_already_staged(conn, target_url):
-                        # Category crawls often rediscover the same casting page
-                        # across different year buckets. Skip it by default so
-                        # we do not restage the same casting repeatedly unless
-                        # an admin explicitly asks for an override refresh.
-                        log(f"Skipping already staged casting page {target_url}")
-                        page_summaries.append(
+                    if target_url in revisions:
+                        fetch_cache.check_revid(target_url, revisions[target_url])
+                    result = crawl_page(target_url, job_id, log, fetch_cache, discovered_from=discovered_from)
+                    row_count = len(dedupe_stage_rows(result["rows"]))
+                    stage_rows.extend(result["rows"])
+                    url_results.append(
+                        (
+                            target_url,
+                            "done",
                             {
-                                "source_url": target_url,
-                                "discovered_from": discovered_from,
-                                "page_type": "casting_page",
-                                "skipped": True,
-                                "reason": "already_staged",
-                            }
+                                "page_title": result["page_title"],
+                                "page_type": result["page_type"],
+                                "row_count": row_count,
+                            },
                         )
-                        continue
-
-                    result = crawl_page(target_url, job_id, log, discovered_from=discovered_from)
-                    inserted_count = upsert_stage_rows(conn, result["rows"])
-                    total_rows += inserted_count
-                    page_summaries.append(
-                        {
-                            "source_url": target_url,
-                            "discovered_from": discovered_from,
-                            "page_title": result["page_title"],
-                            "page_type": result["page_type"],
-                            "row_count": inserted_count,
-                        }
                     )
                     log(
-                        f"Parsed {inserted_count} staged rows from {target_url} "
+                        f"Parsed {row_count} staged rows from {target_url} "
                         f"({result['page_type']})"
                     )
+                except PageUnchanged:
+                    log(f"Skipping {target_url}, unchanged since the last crawl")
+                    url_results.append(
+                        (
+                            target_url,
+                            "skipped",
+                            {"page_type": "casting_page", "skipped": True, "reason": "unchanged"},
+                        )
+                    )
                 except Exception as exc:
                     log(f"Failed crawling {target_url}: {exc}")
                     log(traceback.format_exc())
-                    page_summaries.append(
-                        {
-                            "source_url": target_url,
-                            "discovered_from": discovered_from,
-                            "error": str(exc),
-                        }
-                    )
+                    url_results.append((target_url, "failed", {"error": str(exc)}))
+
+                if len(url_results) >= CRAWL_JOB_FLUSH_SIZE:
+                    flush()
+
+            flush()
+
+        remaining = job_summary(conn, job_id)["pending"]
+        if remaining:
+            log(f"Time budget reached, continuing {remaining} pages in a new invocation")
+            continue_job(conn, job_id, context, {"override": override, "force": force})
+            release_db_connection(conn)
+            return {
+                "statusCode": 202,
+                "headers": CORS_HEADERS,
+                "body": json.dumps(
+                    {
+                        "message": "hot wheels staging crawl continuing",
+                        "job_id": job_id,
+                        "remaining": remaining,
+                    }
+                ),
+            }
+
+        finish_job(conn, job_id)
+        page_summaries = [
+            {"source_url": url, "discovered_from": discovered_from, **(detail or {})}
+            for url, discovered_from, _status, detail in job_url_details(conn, job_id)
+        ]
+        total_rows = sum(summary.get("row_count") or 0 for summary in page_summaries)
 
-        conn.close()
+        release_db_connection(conn)
         log("DONE")
 
         return {
@@ -995,6 +1084,10 @@ def handler(event, context):
     except Exception as exc:
         log(f"Failed to crawl: {exc}")
         log(traceback.format_exc())
+        if conn is not None:
+            if invocation is not None:
+                fail_job(conn, job_id, log)
+            release_db_connection(conn)
         return {
             "statusCode": 500,
             "headers": CORS_HEADERS,
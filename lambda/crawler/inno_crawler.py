@@ -1,18 +1,31 @@
 import boto3
-import requests
 from io import BytesIO
 from bs4 import BeautifulSoup
 import time
-import hashlib
 import datetime
 import logging
 import os
 import urllib.parse
 from psycopg2.extras import execute_values, RealDictCursor
 import psycopg2
+from helper.crawl_engine import CrawlEngine
+from helper.crawl_jobs import (
+    CrawlBudget,
+    acquire_job,
+    continue_job,
+    crawl_frontier,
+    fail_job,
+    finish_job,
+    mark_urls,
+    pending_urls,
+    start_job,
+)
+from helper.db import get_db_connection, release_db_connection
+from helper.fetch_cache import FetchCache
+from helper.image_ingest import known_images_from_rows
+from helper.normalization import normalize_name, resolve_names
 import json
 import time
-import traceback
 from urllib.parse import urlparse
 import re
 
@@ -29,23 +42,14 @@ LOGS_TABLE_NAME = os.environ.get("LOGS_TABLE_NAME", "CrawlerLogsTable")
 
 region = os.environ.get("AWS_REGION", "us-east-1")
 
-REQUEST_DELAY = float(os.environ.get("REQUEST_DELAY", "1.5"))
-
 # AWS clients
 s3 = boto3.client("s3")
 dynamodb = boto3.resource("dynamodb")
-secrets_client = boto3.client("secretsmanager")
 log_table = dynamodb.Table(LOGS_TABLE_NAME)
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-NORMALIZATION_CACHE = {
-    "brands": {},
-    "makes": {},
-    "product_lines": {}
-}
-
 cors_headers = {
     "Access-Control-Allow-Origin": "*",
     "Access-Control-Allow-Headers": "*",
@@ -53,25 +57,17 @@ cors_headers = {
     "Content-Type": "application/json",
 }
 
-def get_db_credentials():
-    resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
-    secret = json.loads(resp["SecretString"])
-    return {
-        "host": secret.get("host"),
-        "username": secret.get("username"),
-        "password": secret.get("password"),
-        "port": int(secret.get("port", 5432)),
-    }
-
-
 def upsert_items(conn, items, log):
+    brand_ids = resolve_names(conn, "brands", [it.get("brand") for it in items], log)
+    make_ids = resolve_names(conn, "makes", [it.get("make") for it in items], log)
+
     with conn.cursor() as cur:
 
         values = []
 
         for it in items:
-            brand_id = get_or_create_normalized(conn, "brands", it.get("brand"), log)
-            make_id = get_or_create_normalized(conn, "makes", it.get("make"), log)
+            brand_id = brand_ids.get(normalize_name(it.get("brand")))
+            make_id = make_ids.get(normalize_name(it.get("make")))
 
             images = it.get("images", [])
             if isinstance(images, (dict, list)):
@@ -136,41 +132,7 @@ def upsert_items(conn, items, log):
         conn.commit()
 
 
-def get_db_conn(creds):
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=creds["username"],
-        password=creds["password"],
-        host=creds["host"],
-        port=creds["port"],
-    )
-
-    return conn
-
-
 ################################
-def safe_get(url, timeout=15, stream=False):
-    headers = {"User-Agent": USER_AGENT}
-    resp = requests.get(url, headers=headers, timeout=timeout, stream=stream)
-    resp.raise_for_status()
-    return resp
-
-
-def download_image_to_s3(img_url, s3_bucket, prefix="images/"):
-    resp = safe_get(img_url, stream=True)
-    content_length = resp.headers.get("Content-Length")
-    if content_length and int(content_length) > (10 * 1024 * 1024):
-        raise ValueError("Image too large")
-    content_type = resp.headers.get("Content-Type", "application/octet-stream")
-    parsed = urllib.parse.urlparse(img_url)
-    ext = os.path.splitext(parsed.path)[1] or ".jpg"
-    key_hash = hashlib.sha1(img_url.encode("utf-8")).hexdigest()
-    s3_key = f"{prefix}{key_hash}{ext}"
-    s3.upload_fileobj(
-        resp.raw, s3_bucket, s3_key, ExtraArgs={"ContentType": content_type}
-    )
-    return s3_key
-
 def get_lower_ver_rows(conn, version, brand, limit=100):
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         cur.execute("""
@@ -200,47 +162,6 @@ def parse_month_year(date_str):
             continue
     return None
 
-def get_or_create_normalized(conn, table, value, log, brand_id=None):
-    if not value:
-        return None
-
-    value = value.strip().lower()
-
-    # Create a unique cache key for product_lines since name isn't unique globally
-    cache_key = f"{value}_{brand_id}" if table == "product_lines" else value
-
-    if cache_key in NORMALIZATION_CACHE[table]:
-        return NORMALIZATION_CACHE[table][cache_key]
-
-    with conn.cursor() as cur:
-        if table == "product_lines":
-            # Product lines require the brand_id for the unique constraint
-            cur.execute(
-                f"""
-                INSERT INTO {table} (name, brand_id)
-                VALUES (%s, %s)
-                ON CONFLICT (name, brand_id) 
-                DO UPDATE SET name = EXCLUDED.name
-                RETURNING id
-                """,
-                (value, brand_id)
-            )
-        else:
-            # brands and makes (assuming they only have 'name' constraints)
-            cur.execute(
-                f"INSERT INTO {table} (name) VALUES (%s) "
-                f"ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name "
-                f"RETURNING id",
-                (value,)
-            )
-
-        row_id = cur.fetchone()[0]
-
-    NORMALIZATION_CACHE[table][cache_key] = row_id
-    log(f"Resolved {table}: {value}")
-    return row_id
-
-
 def natural_key(url):
     # Extract just filename
     filename = os.path.basename(urlparse(url).path)
@@ -250,10 +171,9 @@ def natural_key(url):
         int(part) if part.isdigit() else part for part in re.split(r"(\d+)", filename)
     ]
 
-def crawl_inno_product_page(url, historical_image_urls, log, s3_bucket=S3_BUCKET):
-    log(f"Crawling product {url}")
-    time.sleep(REQUEST_DELAY)
-    resp = safe_get(url)
+def crawl_inno_product_page(engine, url, known_images):
+    engine.log(f"Crawling product {url}")
+    resp = engine.fetch(url)
     html = resp.text
     soup = BeautifulSoup(html, "html.parser")
 
@@ -282,23 +202,7 @@ def crawl_inno_product_page(url, historical_image_urls, log, s3_bucket=S3_BUCKET
     imgs = soup.select('.iconic-woothumbs-images__image')
     img_urls = list(set([i.get('data-large_image') for i in imgs]))
     sorted_urls = sorted(img_urls, key=natural_key)
-    image_s3_key = None
-    s3_image_urls = []
-
-    for iu in sorted_urls:
-        if iu in historical_image_urls:
-            log(f"Skipping fetching image for {iu}, image already exists")
-            continue
-
-        try:
-            image_s3_key = download_image_to_s3(iu, s3_bucket)
-            image_s3_url = (
-                f"https://{s3_bucket}.s3.{region}.amazonaws.com/{image_s3_key}"
-            )
-            s3_image_urls.append({"s3_url": image_s3_url, "original_url": iu})
-            log(f"Downloaded image to s3://{s3_bucket}/{image_s3_key}")
-        except Exception as e:
-            log(f"Failed to download image {iu}: {e}")
+    s3_image_urls = engine.upload_images(sorted_urls, known_images)
 
     item = {
         "code": f"INNO_{sku}",
@@ -318,7 +222,7 @@ def crawl_inno_product_page(url, historical_image_urls, log, s3_bucket=S3_BUCKET
         "scale": scale,
     }
 
-    log(f"### Crawled: {sku}, {make}, {title}, {scale}, {url}")
+    engine.log(f"### Crawled: {sku}, {make}, {title}, {scale}, {url}")
 
     return item
 
@@ -330,7 +234,7 @@ def handler(event, context):
     else:
         body = event
 
-    job_id = body.get("job_id")
+    job_id = body.get("job_id") or f"inno-{int(time.time())}"
 
     ONE_MONTH = 30 * 24 * 60 * 60
 
@@ -348,36 +252,42 @@ def handler(event, context):
 
     log('Start crawling')
 
+    conn = None
+    invocation = None
     try:        
-        creds = get_db_credentials()
-        conn = get_db_conn(creds)
-        urls = body.get("product_urls", [])
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
+        budget = CrawlBudget(context)
         override = body.get("override")
 
-        if not urls:
-            log("No product urls is given")
+        if body.get("resume"):
+            urls = [url for url, _kind, _discovered_from in pending_urls(conn, job_id)]
+        else:
+            urls = body.get("product_urls", [])
+
+            if not urls:
+                log("No product urls is given")
+                return {
+                    "statusCode": 500,
+                    "body": json.dumps({"error": "need product urls"}),
+                }
+
+            start_job(conn, job_id, "inno", {"override": override}, urls)
+
+        invocation = acquire_job(conn, job_id, budget, log)
+        if invocation is None:
+            release_db_connection(conn)
             return {
-                "statusCode": 500,
-                "body": json.dumps({"error": "need product urls"}),
+                "statusCode": 409,
+                "body": json.dumps({"error": "job is finished or already running"}),
             }
 
-        historical_image_urls = []
+        fetch_cache = FetchCache("inno", revalidate=not body.get("force"))
+        existing_rows = get_existing_urls(conn, urls)
+        # Images already stored for these pages are reused by url
+        # instead of being fetched again.
+        known_images = known_images_from_rows(existing_rows)
         if not override: 
-            historical_rows = get_existing_urls(conn, urls)
-
-            historical_image_urls = [
-                img["original_url"]
-                for row in historical_rows
-                if row.get("images")
-                for img in row["images"]
-                if img.get("original_url")
-            ]
-
-            historical_urls = [
-                row["source_url"]
-                for row in historical_rows
-                if row.get("source_url")
-            ]
+            historical_urls = {row["source_url"] for row in existing_rows if row.get("source_url")}
 
             for hu in historical_urls:
                 log(
@@ -386,34 +296,50 @@ def handler(event, context):
 
             print(f'history url {historical_urls}, current url {urls}')
 
+            mark_urls(
+                conn,
+                job_id,
+                [(hu, "skipped", {"reason": "already_crawled"}) for hu in historical_urls],
+            )
+
             urls = [
                 u for u in urls if u not in historical_urls
             ]
         else:
             log("Override mode is ON, it will erase the existing matching rows and replace with the new crawled data")
+            # Only pages that still have a stored row may be skipped as
+            # unchanged; anything else is crawled in full.
+            fetch_cache.load(
+                conn,
+                [row["source_url"] for row in existing_rows if row.get("source_url")],
+            )
 
-        items_to_insert = []
-        results = []
-
-        for u in urls:
-            try:
-                item = crawl_inno_product_page(u, historical_image_urls, log, s3_bucket=S3_BUCKET)
-                items_to_insert.append(item)
-
-                print(f"""
-                    {len(body.get("product_urls", []))} given urls.
-                    {len(urls)} new urls
-                """)
-
-            except Exception as e:
-                log(f"Failed crawling {u}: {e}")
-                log(traceback.format_exc())
-                results.append({"url": u, "error": str(e)})
+        engine = CrawlEngine(s3_client=s3, s3_bucket=S3_BUCKET, region=region, log=log, user_agent=USER_AGENT, fetch_cache=fetch_cache)
+        remaining = crawl_frontier(
+            engine,
+            conn,
+            job_id,
+            urls,
+            lambda u: crawl_inno_product_page(engine, u, known_images),
+            lambda items: upsert_items(conn, items, engine.log),
+            budget,
+        )
 
-        if len(items_to_insert) > 0:
-            upsert_items(conn, items_to_insert, log)
+        if remaining:
+            log(f"Time budget reached, continuing {len(remaining)} pages in a new invocation")
+            continue_job(conn, job_id, context, {"override": override, "force": body.get("force")})
+            release_db_connection(conn)
+            return {
+                "statusCode": 202,
+                "body": json.dumps({
+                    "message": "crawl continuing",
+                    "job_id": job_id,
+                    "remaining": len(remaining),
+                })
+            }
 
-        conn.close()
+        finish_job(conn, job_id)
+        release_db_connection(conn)
         log('DONE')
 
         return {
@@ -425,6 +351,10 @@ def handler(event, context):
 
     except Exception as e:
         log(f"Failed to crawl: {e}")
+        if conn is not None:
+            if invocation is not None:
+                fail_job(conn, job_id, log)
+            release_db_connection(conn)
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
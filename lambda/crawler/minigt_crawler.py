@@ -12,6 +12,22 @@ import urllib.parse
 import re
 from psycopg2.extras import execute_values, RealDictCursor
 import psycopg2
+from helper.crawl_engine import CrawlEngine
+from helper.crawl_jobs import (
+    CrawlBudget,
+    acquire_job,
+    continue_job,
+    crawl_frontier,
+    fail_job,
+    finish_job,
+    mark_urls,
+    pending_urls,
+    start_job,
+)
+from helper.db import get_db_connection, release_db_connection
+from helper.fetch_cache import FetchCache
+from helper.image_ingest import known_images_from_rows
+from helper.normalization import normalize_name, resolve_names, resolve_product_lines
 import json
 import time
 
@@ -34,7 +50,6 @@ REQUEST_DELAY = float(os.environ.get("REQUEST_DELAY", "1.5"))
 # AWS clients
 s3 = boto3.client("s3")
 dynamodb = boto3.resource("dynamodb")
-secrets_client = boto3.client("secretsmanager")
 table = dynamodb.Table(DDB_TABLE)
 log_table = dynamodb.Table(LOGS_TABLE_NAME)
 
@@ -49,39 +64,24 @@ urls = {
     "inno64": os.getenv("INNO64_URL"),
 }
 
-NORMALIZATION_CACHE = {
-    "brands": {},
-    "makes": {},
-    "product_lines": {}
-}
-
-
-def get_db_credentials():
-    resp = secrets_client.get_secret_value(SecretId=SECRET_ARN)
-    secret = json.loads(resp["SecretString"])
-    return {
-        "host": secret.get("host"),
-        "username": secret.get("username"),
-        "password": secret.get("password"),
-        "port": int(secret.get("port", 5432)),
-    }
-
 
 def upsert_items(conn, items, log):
+    brand_ids = resolve_names(conn, "brands", [it.get("brand") for it in items], log)
+    make_ids = resolve_names(conn, "makes", [it.get("make") for it in items], log)
+    product_line_ids = resolve_product_lines(
+        conn,
+        [(it.get("product_line"), brand_ids.get(normalize_name(it.get("brand")))) for it in items],
+        log,
+    )
+
     with conn.cursor() as cur:
 
         values = []
 
         for it in items:
-            brand_id = get_or_create_normalized(conn, "brands", it.get("brand"), log)
-            make_id = get_or_create_normalized(conn, "makes", it.get("make"), log)
-            product_line_id = get_or_create_normalized(
-                conn,
-                "product_lines",
-                it.get("product_line"),
-                log,
-                brand_id=brand_id
-            )
+            brand_id = brand_ids.get(normalize_name(it.get("brand")))
+            make_id = make_ids.get(normalize_name(it.get("make")))
+            product_line_id = product_line_ids.get((normalize_name(it.get("product_line")), brand_id))
 
             images = it.get("images", [])
             if isinstance(images, (dict, list)):
@@ -149,18 +149,6 @@ def upsert_items(conn, items, log):
         conn.commit()
 
 
-def get_db_conn(creds):
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=creds["username"],
-        password=creds["password"],
-        host=creds["host"],
-        port=creds["port"],
-    )
-
-    return conn
-
-
 ################################
 def safe_get(url, timeout=15, stream=False):
     headers = {"User-Agent": USER_AGENT}
@@ -277,52 +265,9 @@ def get_existing_urls(conn, urls):
         )
         return cur.fetchall()
 
-def get_or_create_normalized(conn, table, value, log, brand_id=None):
-    if not value:
-        return None
-
-    value = value.strip().lower()
-    
-    # Create a unique cache key for product_lines since name isn't unique globally
-    cache_key = f"{value}_{brand_id}" if table == "product_lines" else value
-
-    if cache_key in NORMALIZATION_CACHE[table]:
-        return NORMALIZATION_CACHE[table][cache_key]
-
-    with conn.cursor() as cur:
-        if table == "product_lines":
-            # Product lines require the brand_id for the unique constraint
-            cur.execute(
-                f"""
-                INSERT INTO {table} (name, brand_id)
-                VALUES (%s, %s)
-                ON CONFLICT (name, brand_id) 
-                DO UPDATE SET name = EXCLUDED.name
-                RETURNING id
-                """,
-                (value, brand_id)
-            )
-        else:
-            # brands and makes (assuming they only have 'name' constraints)
-            cur.execute(
-                f"INSERT INTO {table} (name) VALUES (%s) "
-                f"ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name "
-                f"RETURNING id",
-                (value,)
-            )
-        
-        row_id = cur.fetchone()[0]
-
-    NORMALIZATION_CACHE[table][cache_key] = row_id
-    log(f"Resolved {table}: {value}")
-    return row_id
-
-
-
-def crawl_minigt_product_page(url, historical_image_urls, log, s3_bucket=S3_BUCKET):
-    log(f"Crawling product {url}")
-    time.sleep(REQUEST_DELAY)
-    resp = safe_get(url)
+def crawl_minigt_product_page(engine, url, known_images):
+    engine.log(f"Crawling product {url}")
+    resp = engine.fetch(url)
     html = resp.text
     soup = BeautifulSoup(html, "html.parser")
 
@@ -347,22 +292,7 @@ def crawl_minigt_product_page(url, historical_image_urls, log, s3_bucket=S3_BUCK
         product_line = "Qube Carz"
 
     image_urls = get_minigt_og_image(soup, url)
-    images = []
-
-    for u in image_urls:
-        print(f'checking image url {u}')
-        if u in historical_image_urls:
-            log(f"Skipping fetching image for {u}, image already exists")
-            continue
-        try:
-            image_s3_key = download_image_to_s3(u, s3_bucket)
-            image_s3_url = (
-                f"https://{s3_bucket}.s3.{region}.amazonaws.com/{image_s3_key}"
-            )
-            images.append({"s3_url": image_s3_url, "original_url": u})
-            log(f"Downloaded image to s3://{s3_bucket}/{image_s3_key}")
-        except Exception as e:
-            log(f"Failed to download image {u}: {e}")
+    images = engine.upload_images(image_urls, known_images)
 
     item = {
         "code": f"MGT_{details["id"]}",
@@ -382,7 +312,7 @@ def crawl_minigt_product_page(url, historical_image_urls, log, s3_bucket=S3_BUCK
         "scale": "1:64",
     }
 
-    log(f"### Crawled: {item["original_id"]}, {item["make"]}, {title}, {item["product_line"]}, {item["source_url"]}")
+    engine.log(f"### Crawled: {item["original_id"]}, {item["make"]}, {title}, {item["product_line"]}, {item["source_url"]}")
 
     return item
 
@@ -636,7 +566,7 @@ def handler(event, context):
     else:
         body = event
 
-    job_id = body.get("job_id")
+    job_id = body.get("job_id") or f"minigt-{int(time.time())}"
     ONE_MONTH = 30 * 24 * 60 * 60
 
     def log(msg):
@@ -654,9 +584,11 @@ def handler(event, context):
 
     log('Start crawling')
 
+    conn = None
+    invocation = None
     try: 
-        creds = get_db_credentials()
-        conn = get_db_conn(creds)
+        conn = get_db_connection(SECRET_ARN, DB_NAME)
+        budget = CrawlBudget(context)
         urls = body.get("product_urls", [])
         # lower_version_rows = get_lower_ver_rows(conn, version, brand, max_pages)
         # print(f'lower_versoin_rows {lower_version_rows}')
@@ -671,7 +603,9 @@ def handler(event, context):
         # ]
         # print(f'historical images: {historical_image_urls}')
         
-        if "catalog_url" in body:
+        if body.get("resume"):
+            urls = [url for url, _kind, _discovered_from in pending_urls(conn, job_id)]
+        elif "catalog_url" in body:
             try:
                 urls.extend(extract_minigt_links_from_catalog(
                     body["catalog_url"], urls, log
@@ -688,72 +622,75 @@ def handler(event, context):
                 log(f"Failed to extract from catalog: {e}")
                 return {"error": str(e)}
             
-        historical_image_urls = []
-            
         override = body.get("override")
+        if not body.get("resume"):
+            start_job(conn, job_id, "minigt", {"override": override}, urls)
+
+        invocation = acquire_job(conn, job_id, budget, log)
+        if invocation is None:
+            release_db_connection(conn)
+            return {
+                "statusCode": 409,
+                "body": json.dumps({"error": "job is finished or already running"}),
+            }
 
+        fetch_cache = FetchCache("minigt", revalidate=not body.get("force"))
+        existing_rows = get_existing_urls(conn, urls)
+        # Images already stored for these pages are reused by url
+        # instead of being fetched again.
+        known_images = known_images_from_rows(existing_rows)
         if not override: 
-            historical_rows = get_existing_urls(conn, urls)
-
-            historical_image_urls = [
-                img["original_url"]
-                for row in historical_rows
-                if row.get("images")
-                for img in row["images"]
-                if img.get("original_url")
-            ]
-
-            historical_urls = [
-                row["source_url"]
-                for row in historical_rows
-                if row.get("source_url")
-            ]
+            historical_urls = {row["source_url"] for row in existing_rows if row.get("source_url")}
 
             for hu in historical_urls:
                 log(f"### Crawled: {hu}, this url is skipped because override mode is OFF")
 
             print(f'history url {historical_urls}, current url {urls}')
 
+            mark_urls(
+                conn,
+                job_id,
+                [(hu, "skipped", {"reason": "already_crawled"}) for hu in historical_urls],
+            )
+
             urls = [
                 u for u in urls if u not in historical_urls
             ]
         else:
             log("Override mode is ON, it will erase the existing matching rows and replace with the new crawled data")
+            # Only pages that still have a stored row may be skipped as
+            # unchanged; anything else is crawled in full.
+            fetch_cache.load(
+                conn,
+                [row["source_url"] for row in existing_rows if row.get("source_url")],
+            )
 
-        items_to_insert = []
-        results = []
-        
-        for u in urls:
-            try:
-                item = crawl_minigt_product_page(u, historical_image_urls, log)
-                if not item.get("original_id"):
-                    log(f"skipping {u}, because this page doesn't exist")
-                    break
-                items_to_insert.append(item)
-
-                # elif brand == "hotwheels":
-                #     items = crawl_hotwheels_product_page(u)
-                #     items_to_insert.extend(items)
-
-                # elif brand == "hotwheels":
-                #     item = crawl_hotwheels_164custom_product_page(u, historical_image_urls, version, log)
-                #     items_to_insert.append(item)
-                #     # return {"count": len(items_to_insert), "results": items_to_insert}
-                # else:
-                #     log("no brand specified")
-                
-                print(f"""
-                    {len(body.get("product_urls", []))} given urls.
-                    {len(urls)} new urls
-                """)
+        engine = CrawlEngine(s3_client=s3, s3_bucket=S3_BUCKET, region=region, log=log, user_agent=USER_AGENT, fetch_cache=fetch_cache)
+        remaining = crawl_frontier(
+            engine,
+            conn,
+            job_id,
+            urls,
+            lambda u: crawl_minigt_product_page(engine, u, known_images),
+            lambda items: upsert_items(conn, items, engine.log),
+            budget,
+        )
 
-            except Exception as e:
-                log(f"Failed crawling {u}: {e}")
-                results.append({"url": u, "error": str(e)})
-        if len(items_to_insert) > 0:
-            upsert_items(conn, items_to_insert, log)
+        if remaining:
+            log(f"Time budget reached, continuing {len(remaining)} pages in a new invocation")
+            continue_job(conn, job_id, context, {"override": override, "force": body.get("force")})
+            release_db_connection(conn)
+            return {
+                "statusCode": 202,
+                "body": json.dumps({
+                    "message": "crawl continuing",
+                    "job_id": job_id,
+                    "remaining": len(remaining),
+                })
+            }
 
-        conn.close()
+        finish_job(conn, job_id)
+        release_db_connection(conn)
         log('DONE')
 
         return {
@@ -765,6 +702,10 @@ def handler(event, context):
 
     except Exception as e:
         log(f"Failed to crawl: {e}")
+        if conn is not None:
+            if invocation is not None:
+                fail_job(conn, job_id, log)
+            release_db_connection(conn)
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
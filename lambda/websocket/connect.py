@@ -2,11 +2,14 @@ import os
 import time
 
 import boto3
+from botocore.exceptions import ClientError
 
 
 TABLE_NAME = os.environ["USER_MESSAGING_TABLE"]
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(TABLE_NAME)
+# Connection rows expire unless the client sends {"action": "heartbeat"}
+# more often than this; the table TTL and the fanout filter both use it.
+CONNECTION_TTL_SECONDS = int(os.environ.get("WS_CONNECTION_TTL_SECONDS", "900"))
+client = boto3.client("dynamodb")
 
 
 def _response(status_code, body):
@@ -25,46 +28,70 @@ def handler(event, _context):
         print(f"messaging websocket missing ticket connectionId={connection_id}")
         return _response(401, "Missing ticket")
 
-    ticket_item = table.get_item(
-        Key={
-            "pk": f"TICKET#{ticket}",
-            "sk": "META",
-        }
-    ).get("Item")
-
-    if not ticket_item:
+    # Tickets are "<userId>.<nonce>", so the connection rows can be written
+    # in the same transaction that consumes the ticket. The conditional delete
+    # checks the owner and expiry, and only one connect can consume a ticket.
+    user_id, _, nonce = ticket.partition(".")
+    if not user_id or not nonce:
         print(f"messaging websocket invalid ticket connectionId={connection_id}")
         return _response(401, "Invalid ticket")
 
-    if int(ticket_item.get("expiresAt", 0) or 0) < int(time.time()):
-        table.delete_item(Key={"pk": f"TICKET#{ticket}", "sk": "META"})
-        print(f"messaging websocket expired ticket connectionId={connection_id}")
-        return _response(401, "Expired ticket")
-
-    user_id = ticket_item.get("userId")
     connected_at = int(time.time())
+    expires_at = connected_at + CONNECTION_TTL_SECONDS
+    connection_fields = {
+        "userId": {"S": user_id},
+        "connectionId": {"S": connection_id},
+        "connectedAt": {"N": str(connected_at)},
+        "expiresAt": {"N": str(expires_at)},
+    }
+
+    try:
+        client.transact_write_items(
+            TransactItems=[
+                {
+                    "Delete": {
+                        "TableName": TABLE_NAME,
+                        "Key": {"pk": {"S": f"TICKET#{ticket}"}, "sk": {"S": "META"}},
+                        "ConditionExpression": "userId = :userId AND expiresAt >= :now",
+                        "ExpressionAttributeValues": {
+                            ":userId": {"S": user_id},
+                            ":now": {"N": str(connected_at)},
+                        },
+                    }
+                },
+                {
+                    "Put": {
+                        "TableName": TABLE_NAME,
+                        "Item": {
+                            "pk": {"S": f"USER#{user_id}"},
+                            "sk": {"S": f"WS#{connection_id}"},
+                            "itemType": {"S": "WS_CONNECTION"},
+                            **connection_fields,
+                        },
+                    }
+                },
+                {
+                    "Put": {
+                        "TableName": TABLE_NAME,
+                        "Item": {
+                            "pk": {"S": f"CONN#{connection_id}"},
+                            "sk": {"S": "META"},
+                            "itemType": {"S": "WS_CONNECTION_LOOKUP"},
+                            **connection_fields,
+                        },
+                    }
+                },
+            ]
+        )
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+            raise
+        reasons = error.response.get("CancellationReasons") or []
+        if reasons and reasons[0].get("Code") == "ConditionalCheckFailed":
+            print(f"messaging websocket invalid or expired ticket connectionId={connection_id}")
+            return _response(401, "Invalid ticket")
+        raise
 
-    table.put_item(
-        Item={
-            "pk": f"USER#{user_id}",
-            "sk": f"WS#{connection_id}",
-            "itemType": "WS_CONNECTION",
-            "userId": user_id,
-            "connectionId": connection_id,
-            "connectedAt": connected_at,
-        }
-    )
-    table.put_item(
-        Item={
-            "pk": f"CONN#{connection_id}",
-            "sk": "META",
-            "itemType": "WS_CONNECTION_LOOKUP",
-            "userId": user_id,
-            "connectionId": connection_id,
-            "connectedAt": connected_at,
-        }
-    )
-    table.delete_item(Key={"pk": f"TICKET#{ticket}", "sk": "META"})
     print(f"messaging websocket connected userId={user_id} connectionId={connection_id}")
 
     return _response(200, "Connected")
@@ -10,8 +10,12 @@ table = dynamodb.Table(TABLE_NAME)
 
 def handler(event, _context):
     connection_id = event["requestContext"]["connectionId"]
-    lookup_key = {"pk": f"CONN#{connection_id}", "sk": "META"}
-    lookup = table.get_item(Key=lookup_key).get("Item")
+    # The lookup row is the only place the connection's user is recorded, so
+    # deleting it returns the owner instead of reading it first.
+    lookup = table.delete_item(
+        Key={"pk": f"CONN#{connection_id}", "sk": "META"},
+        ReturnValues="ALL_OLD",
+    ).get("Attributes")
 
     if lookup:
         user_id = lookup.get("userId")
@@ -21,7 +25,6 @@ def handler(event, _context):
                 "sk": f"WS#{connection_id}",
             }
         )
-        table.delete_item(Key=lookup_key)
         print(f"messaging websocket disconnected userId={user_id} connectionId={connection_id}")
     else:
         print(f"messaging websocket disconnect lookup-miss connectionId={connection_id}")
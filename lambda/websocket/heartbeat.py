@@ -0,0 +1,45 @@
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+
+TABLE_NAME = os.environ["USER_MESSAGING_TABLE"]
+CONNECTION_TTL_SECONDS = int(os.environ.get("WS_CONNECTION_TTL_SECONDS", "900"))
+dynamodb = boto3.resource("dynamodb")
+table = dynamodb.Table(TABLE_NAME)
+
+
+def _extend(key, expires_at, now):
+    # attribute_exists keeps a late heartbeat from recreating rows that a
+    # disconnect already removed.
+    return table.update_item(
+        Key=key,
+        UpdateExpression="SET expiresAt = :expiresAt, lastSeenAt = :now",
+        ConditionExpression="attribute_exists(pk)",
+        ExpressionAttributeValues={":expiresAt": expires_at, ":now": now},
+        ReturnValues="ALL_NEW",
+    ).get("Attributes") or {}
+
+
+def handler(event, _context):
+    # Route "heartbeat": clients send {"action": "heartbeat"} every few
+    # minutes to keep their connection rows ahead of the TTL.
+    connection_id = event["requestContext"]["connectionId"]
+    now = int(time.time())
+    expires_at = now + CONNECTION_TTL_SECONDS
+
+    try:
+        lookup = _extend({"pk": f"CONN#{connection_id}", "sk": "META"}, expires_at, now)
+        _extend({"pk": f"USER#{lookup.get('userId')}", "sk": f"WS#{connection_id}"}, expires_at, now)
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        print(f"messaging websocket heartbeat for unknown connectionId={connection_id}")
+        return {"statusCode": 410, "body": "Gone"}
+
+    return {
+        "statusCode": 200,
+        "body": "OK",
+    }
@@ -65,6 +65,7 @@ export class UserFastApiConstruct extends Construct {
                 USER_MESSAGING_TABLE: userMessagingTable.tableName,
                 MESSAGING_WS_URL: messagingWebSocketUrl,
                 MESSAGING_WS_CALLBACK_URL: messagingWebSocketCallbackUrl,
+                MESSAGING_DELIVERY_MODE: "outbox",
                 BRAVE_SEARCH_API_KEY: process.env.BRAVE_SEARCH_API_KEY || "",
             },
         });
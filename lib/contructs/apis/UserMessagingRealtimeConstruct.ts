@@ -1,12 +1,17 @@
-import { Duration } from "aws-cdk-lib";
+import { Duration, Stack } from "aws-cdk-lib";
 import * as apigwv2 from "aws-cdk-lib/aws-apigatewayv2";
 import * as dynamodb from "aws-cdk-lib/aws-dynamodb";
 import { WebSocketLambdaIntegration } from "aws-cdk-lib/aws-apigatewayv2-integrations";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
+import * as iam from "aws-cdk-lib/aws-iam";
 import * as lambda from "aws-cdk-lib/aws-lambda";
+import { DynamoEventSource } from "aws-cdk-lib/aws-lambda-event-sources";
 import { Construct } from "constructs";
 
 interface UserMessagingRealtimeConstructProps {
     userMessagingTable: dynamodb.ITable;
+    layer: lambda.LayerVersion;
 }
 
 export class UserMessagingRealtimeConstruct extends Construct {
@@ -16,7 +21,7 @@ export class UserMessagingRealtimeConstruct extends Construct {
     constructor(scope: Construct, id: string, props: UserMessagingRealtimeConstructProps) {
         super(scope, id);
 
-        const { userMessagingTable } = props;
+        const { userMessagingTable, layer } = props;
 
         const connectFn = new lambda.Function(this, "MessagingWsConnectFn", {
             runtime: lambda.Runtime.PYTHON_3_12,
@@ -40,6 +45,17 @@ export class UserMessagingRealtimeConstruct extends Construct {
             },
         });
 
+        const heartbeatFn = new lambda.Function(this, "MessagingWsHeartbeatFn", {
+            runtime: lambda.Runtime.PYTHON_3_12,
+            handler: "heartbeat.handler",
+            code: lambda.Code.fromAsset("lambda/websocket"),
+            memorySize: 256,
+            timeout: Duration.seconds(10),
+            environment: {
+                USER_MESSAGING_TABLE: userMessagingTable.tableName,
+            },
+        });
+
         const defaultFn = new lambda.Function(this, "MessagingWsDefaultFn", {
             runtime: lambda.Runtime.PYTHON_3_12,
             handler: "default.handler",
@@ -50,6 +66,7 @@ export class UserMessagingRealtimeConstruct extends Construct {
 
         userMessagingTable.grantReadWriteData(connectFn);
         userMessagingTable.grantReadWriteData(disconnectFn);
+        userMessagingTable.grantReadWriteData(heartbeatFn);
 
         this.webSocketApi = new apigwv2.WebSocketApi(this, "MessagingWebSocketApi", {
             connectRouteOptions: {
@@ -63,10 +80,75 @@ export class UserMessagingRealtimeConstruct extends Construct {
             },
         });
 
+        // Clients send {"action": "heartbeat"} to keep their connection rows
+        // ahead of the table TTL.
+        this.webSocketApi.addRoute("heartbeat", {
+            integration: new WebSocketLambdaIntegration("MessagingHeartbeatIntegration", heartbeatFn),
+        });
+
         this.stage = new apigwv2.WebSocketStage(this, "MessagingWebSocketStage", {
             webSocketApi: this.webSocketApi,
             stageName: "live",
             autoDeploy: true,
         });
+
+        // Outbox worker: delivers WS_OUTBOX rows written by the FastAPI app in
+        // MESSAGING_DELIVERY_MODE=outbox. The stream handles first delivery; the
+        // scheduled sweep retries with backoff and dead-letters to OUTBOX#DEAD.
+        const outboxEnvironment = {
+            USER_MESSAGING_TABLE: userMessagingTable.tableName,
+            MESSAGING_WS_CALLBACK_URL: this.stage.callbackUrl,
+        };
+        const outboxStreamFn = new lambda.Function(this, "MessagingOutboxStreamFn", {
+            runtime: lambda.Runtime.PYTHON_3_12,
+            handler: "app.outbox_handler.stream_handler",
+            code: lambda.Code.fromAsset("backend"),
+            memorySize: 256,
+            timeout: Duration.seconds(30),
+            environment: outboxEnvironment,
+        });
+        const outboxSweepFn = new lambda.Function(this, "MessagingOutboxSweepFn", {
+            runtime: lambda.Runtime.PYTHON_3_12,
+            handler: "app.outbox_handler.poll_handler",
+            code: lambda.Code.fromAsset("backend"),
+            memorySize: 256,
+            timeout: Duration.seconds(55),
+            environment: outboxEnvironment,
+        });
+
+        const stack = Stack.of(this);
+        for (const fn of [outboxStreamFn, outboxSweepFn]) {
+            fn.addLayers(layer);
+            userMessagingTable.grantReadWriteData(fn);
+            fn.addToRolePolicy(new iam.PolicyStatement({
+                actions: ["execute-api:ManageConnections"],
+                resources: [
+                    `arn:aws:execute-api:${stack.region}:${stack.account}:${this.webSocketApi.apiId}/*/@connections/*`,
+                ],
+            }));
+        }
+
+        outboxStreamFn.addEventSource(new DynamoEventSource(userMessagingTable, {
+            startingPosition: lambda.StartingPosition.LATEST,
+            batchSize: 25,
+            maxBatchingWindow: Duration.millis(100),
+            retryAttempts: 2,
+            filters: [
+                lambda.FilterCriteria.filter({
+                    eventName: lambda.FilterRule.isEqual("INSERT"),
+                    dynamodb: {
+                        NewImage: {
+                            pk: { S: lambda.FilterRule.beginsWith("OUTBOX#PENDING#") },
+                            itemType: { S: lambda.FilterRule.isEqual("WS_OUTBOX") },
+                        },
+                    },
+                }),
+            ],
+        }));
+
+        new events.Rule(this, "MessagingOutboxSweepSchedule", {
+            schedule: events.Schedule.rate(Duration.minutes(1)),
+            targets: [new targets.LambdaFunction(outboxSweepFn)],
+        });
     }
 }
@@ -13,6 +13,29 @@ export class UserMessagingDynamoConstruct extends Construct {
             sortKey: { name: 'sk', type: dynamodb.AttributeType.STRING },
             billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
             removalPolicy: RemovalPolicy.DESTROY,
+            // Feeds the websocket outbox worker (WS_OUTBOX rows).
+            stream: dynamodb.StreamViewType.NEW_IMAGE,
+            // Epoch seconds on websocket connections (refreshed by heartbeat),
+            // tickets, rate-limit records and dead-lettered outbox rows.
+            timeToLiveAttribute: 'expiresAt',
+        });
+
+        // Inbox rows (USER#<id> / CONV#<conversationId>) also carry index keys
+        // so list endpoints page in lastMessageAt order without reading the
+        // rest of the USER# partition:
+        //   GSI1: gsi1pk = INBOX#<userId>,         gsi1sk = <lastMessageAt>#<conversationId>
+        //   GSI2: gsi2pk = ORDER#<userId>#<role>,  gsi2sk = <lastMessageAt>#<conversationId>
+        // CloudFormation creates one GSI per table update, so an existing stack
+        // needs GSI1 and GSI2 in separate deploys.
+        this.table.addGlobalSecondaryIndex({
+            indexName: 'GSI1',
+            partitionKey: { name: 'gsi1pk', type: dynamodb.AttributeType.STRING },
+            sortKey: { name: 'gsi1sk', type: dynamodb.AttributeType.STRING },
+        });
+        this.table.addGlobalSecondaryIndex({
+            indexName: 'GSI2',
+            partitionKey: { name: 'gsi2pk', type: dynamodb.AttributeType.STRING },
+            sortKey: { name: 'gsi2sk', type: dynamodb.AttributeType.STRING },
         });
     }
 }
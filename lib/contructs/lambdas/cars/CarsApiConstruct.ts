@@ -15,6 +15,7 @@ interface CarApiProps {
     secret: ISecret;
     vpc: IVpc;
     rds: DatabaseInstance;
+    layer: lambda.ILayerVersion;
 }
 
 export class CarApi extends Construct {
@@ -29,16 +30,11 @@ export class CarApi extends Construct {
             likeCollectionTable,
             secret,
             vpc,
-            rds
+            rds,
+            layer
         }: CarApiProps) {
         super(scope, id);
 
-        const crawlerDeps = new lambda.LayerVersion(this, 'CrawlerDepsLayer', {
-            code: lambda.Code.fromAsset(path.join(__dirname, '../../../../lambda-layer/lambda_layer.zip')),
-            compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
-            description: 'Crawler dependencies layer',
-        });
-
         this.function = new lambda.Function(this, 'CarApiHandler', {
             runtime: lambda.Runtime.PYTHON_3_12,
             handler: 'car.handler',
@@ -49,7 +45,7 @@ export class CarApi extends Construct {
                 DB_SECRET_ARN: secret.secretArn,
                 DB_NAME: 'carsdb',
             },
-            layers: [crawlerDeps],
+            layers: [layer],
             vpc,
             vpcSubnets: { subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS },
             allowPublicSubnet: false,
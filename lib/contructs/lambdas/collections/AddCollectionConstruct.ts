@@ -3,12 +3,12 @@ import * as lambda from 'aws-cdk-lib/aws-lambda';
 import { IDatabaseInstance } from 'aws-cdk-lib/aws-rds';
 import { ISecret } from 'aws-cdk-lib/aws-secretsmanager';
 import { IVpc } from 'aws-cdk-lib/aws-ec2';
-import path from 'path';
 
 export interface AddCollectionConstructProps {
     secret: ISecret;
     carRDSInstance: IDatabaseInstance;
     vpc: IVpc;
+    layer: lambda.ILayerVersion;
 }
 
 export class AddCollectionConstruct extends Construct {
@@ -17,13 +17,7 @@ export class AddCollectionConstruct extends Construct {
     constructor(scope: Construct, id: string, props: AddCollectionConstructProps) {
         super(scope, id);
 
-        const { secret, carRDSInstance, vpc } = props;
-
-        const deps = new lambda.LayerVersion(this, 'UserCollectionAddDepsLayer', {
-            code: lambda.Code.fromAsset(path.join(__dirname, '../../../../lambda-layer/lambda_layer.zip')),
-            compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
-            description: 'UserCollectionAdd dependencies layer',
-        });
+        const { secret, carRDSInstance, vpc, layer } = props;
 
         this.function = new lambda.Function(this, "UserCollectionAdd", {
             runtime: lambda.Runtime.PYTHON_3_12,
@@ -33,7 +27,7 @@ export class AddCollectionConstruct extends Construct {
                 SECRET_ARN: secret.secretArn,
                 DB_NAME: 'carsdb',
             },
-            layers: [deps],
+            layers: [layer],
             vpc
         });
 
@@ -1,6 +1,5 @@
 import { Construct } from 'constructs';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
-import path from 'path';
 import { IDatabaseInstance } from 'aws-cdk-lib/aws-rds';
 import { IVpc } from 'aws-cdk-lib/aws-ec2';
 import { ISecret } from 'aws-cdk-lib/aws-secretsmanager';
@@ -9,6 +8,7 @@ export interface DeleteCollectionConstructProps {
     secret: ISecret;
     carRDSInstance: IDatabaseInstance;
     vpc: IVpc;
+    layer: lambda.ILayerVersion;
 }
 
 export class DeleteCollectionConstruct extends Construct {
@@ -17,13 +17,7 @@ export class DeleteCollectionConstruct extends Construct {
     constructor(scope: Construct, id: string, props: DeleteCollectionConstructProps) {
         super(scope, id);
 
-        const { secret, carRDSInstance, vpc } = props;
-
-        const deps = new lambda.LayerVersion(this, 'UserCollectionDeleteDepsLayer', {
-            code: lambda.Code.fromAsset(path.join(__dirname, '../../../../lambda-layer/lambda_layer.zip')),
-            compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
-            description: 'UserCollectionDelete dependencies layer',
-        });
+        const { secret, carRDSInstance, vpc, layer } = props;
 
         this.function = new lambda.Function(this, "UserCollectionDelete", {
             runtime: lambda.Runtime.PYTHON_3_12,
@@ -33,7 +27,7 @@ export class DeleteCollectionConstruct extends Construct {
                 SECRET_ARN: secret.secretArn,
                 DB_NAME: 'carsdb',
             },
-            layers: [deps],
+            layers: [layer],
             vpc
         });
 
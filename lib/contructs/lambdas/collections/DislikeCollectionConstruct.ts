@@ -3,12 +3,12 @@ import * as lambda from 'aws-cdk-lib/aws-lambda';
 import { ISecret } from 'aws-cdk-lib/aws-secretsmanager';
 import { IDatabaseInstance } from 'aws-cdk-lib/aws-rds';
 import { IVpc } from 'aws-cdk-lib/aws-ec2';
-import path from 'path';
 
 export interface DislikeCollectionConstructProps {
     secret: ISecret;
     carRDSInstance: IDatabaseInstance;
     vpc: IVpc;
+    layer: lambda.ILayerVersion;
 }
 
 export class DislikeCollectionConstruct extends Construct {
@@ -17,13 +17,7 @@ export class DislikeCollectionConstruct extends Construct {
     constructor(scope: Construct, id: string, props: DislikeCollectionConstructProps) {
         super(scope, id);
 
-        const { secret, carRDSInstance, vpc } = props;
-
-        const deps = new lambda.LayerVersion(this, 'UserCollectionDislikeDepsLayer', {
-            code: lambda.Code.fromAsset(path.join(__dirname, '../../../../lambda-layer/lambda_layer.zip')),
-            compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
-            description: 'UserCollectionDislike dependencies layer',
-        });
+        const { secret, carRDSInstance, vpc, layer } = props;
 
         this.function = new lambda.Function(this, "UserCollectionDislike", {
             runtime: lambda.Runtime.PYTHON_3_12,
@@ -33,7 +27,7 @@ export class DislikeCollectionConstruct extends Construct {
                 SECRET_ARN: secret.secretArn,
                 DB_NAME: 'carsdb',
             },
-            layers: [deps],
+            layers: [layer],
             vpc
         });
 
@@ -1,6 +1,5 @@
 import { Construct } from 'constructs';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
-import path from 'path';
 import { ISecret } from 'aws-cdk-lib/aws-secretsmanager';
 import { IDatabaseInstance } from 'aws-cdk-lib/aws-rds';
 import { IVpc } from 'aws-cdk-lib/aws-ec2';
@@ -9,6 +8,7 @@ export interface GetCollectionConstructProps {
     secret: ISecret;
     carRDSInstance: IDatabaseInstance;
     vpc: IVpc;
+    layer: lambda.ILayerVersion;
 }
 
 export class GetCollectionConstruct extends Construct {
@@ -17,12 +17,7 @@ export class GetCollectionConstruct extends Construct {
     constructor(scope: Construct, id: string, props: GetCollectionConstructProps) {
         super(scope, id);
 
-        const { secret, carRDSInstance, vpc } = props;
-        const deps = new lambda.LayerVersion(this, 'HelperLayer', {
-            code: lambda.Code.fromAsset(path.join(__dirname, '../../../../lambda-layer')),
-            compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
-            description: 'Shared helper utilities for all Lambdas',
-        });
+        const { secret, carRDSInstance, vpc, layer } = props;
 
         this.function = new lambda.Function(this, "UserCollectionGet", {
             runtime: lambda.Runtime.PYTHON_3_12,
@@ -32,7 +27,7 @@ export class GetCollectionConstruct extends Construct {
                 SECRET_ARN: secret.secretArn,
                 DB_NAME: 'carsdb',
             },
-            layers: [deps],
+            layers: [layer],
             vpc
         });
 
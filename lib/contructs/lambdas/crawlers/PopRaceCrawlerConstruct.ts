@@ -1,7 +1,8 @@
 import { Construct } from 'constructs';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as ec2 from 'aws-cdk-lib/aws-ec2';
-import { Duration } from 'aws-cdk-lib';
+import { Duration, Stack } from 'aws-cdk-lib';
+import * as iam from 'aws-cdk-lib/aws-iam';
 import { IBucket } from 'aws-cdk-lib/aws-s3';
 import { ISecret } from 'aws-cdk-lib/aws-secretsmanager';
 import { IVpc } from 'aws-cdk-lib/aws-ec2';
@@ -52,5 +53,13 @@ export class PopRaceCrawlerConstruct extends Construct {
         bucket.grantReadWrite(this.function);
         carRDSInstance.connections.allowDefaultPortFrom(this.function);
         logsTable.grantWriteData(this.function);
+
+        // Crawl jobs hand their remaining frontier to an async re-invocation of
+        // this function; its own ARN would be a circular reference here.
+        const stack = Stack.of(this);
+        this.function.addToRolePolicy(new iam.PolicyStatement({
+            actions: ['lambda:InvokeFunction'],
+            resources: [`arn:aws:lambda:${stack.region}:${stack.account}:function:${stack.stackName}-*`],
+        }));
     }
 }
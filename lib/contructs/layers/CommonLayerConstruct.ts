@@ -17,6 +17,7 @@ export class CommonLayerConstruct extends Construct {
                         "bash", "-c",
                         [
                             "pip install -r requirements.txt -t /asset-output/python",
+                            "cp -r helper /asset-output/python/",
                             "cp -r python/* /asset-output/python/"
                         ].join(" && ")
                     ],
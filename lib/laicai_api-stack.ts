@@ -51,6 +51,7 @@ export class LaicaiApiStack extends cdk.Stack {
 		const userMessagingTable = new UserMessagingDynamoConstruct(this, 'UserMessagingTable');
 		const messagingRealtime = new UserMessagingRealtimeConstruct(this, 'UserMessagingRealtime', {
 			userMessagingTable: userMessagingTable.table,
+			layer: commonLayer,
 		});
 
 		// Crawler stack
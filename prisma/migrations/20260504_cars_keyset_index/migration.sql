@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS idx_cars_crawled_date_id
+ON cars (crawled_date DESC, id DESC);
@@ -0,0 +1,116 @@
+CREATE TABLE IF NOT EXISTS car_stats (
+    car_id uuid PRIMARY KEY REFERENCES cars(id) ON DELETE CASCADE,
+    owners_count integer NOT NULL DEFAULT 0,
+    likes_count integer NOT NULL DEFAULT 0,
+    updated_at timestamp without time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_collection_items_car_user
+    ON user_collection_items (car_id, user_id);
+
+-- owners_count is a distinct-user count, so it is recounted for the one car
+-- that changed. That is an index range over that car's rows only, and it stays
+-- correct when a single statement inserts several entries for the same user.
+--
+-- The car's stats row is locked before recounting. Under READ COMMITTED two
+-- transactions adding the same car for different users would otherwise each
+-- count without the other's row and the last write would lose an owner; with
+-- the lock the second recount runs after the first commits and sees both.
+CREATE OR REPLACE FUNCTION car_stats_refresh_owners(target_car_id uuid, allow_insert boolean)
+RETURNS void AS $$
+DECLARE
+    owners integer;
+BEGIN
+    IF allow_insert THEN
+        INSERT INTO car_stats (car_id)
+        VALUES (target_car_id)
+        ON CONFLICT (car_id) DO NOTHING;
+    END IF;
+
+    -- Deletes may be cascading from the car itself, so never re-create the
+    -- stats row on that path; without a row there is nothing to refresh.
+    PERFORM 1
+    FROM car_stats
+    WHERE car_id = target_car_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    SELECT COUNT(DISTINCT user_id) INTO owners
+    FROM user_collection_items
+    WHERE car_id = target_car_id;
+
+    UPDATE car_stats
+    SET owners_count = owners,
+        updated_at = now()
+    WHERE car_id = target_car_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION car_stats_collection_items_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM car_stats_refresh_owners(NEW.car_id, TRUE);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM car_stats_refresh_owners(OLD.car_id, FALSE);
+    ELSIF NEW.car_id IS DISTINCT FROM OLD.car_id OR NEW.user_id IS DISTINCT FROM OLD.user_id THEN
+        PERFORM car_stats_refresh_owners(OLD.car_id, FALSE);
+        PERFORM car_stats_refresh_owners(NEW.car_id, TRUE);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- user_liked_items is unique per (user, car), so likes are a plain counter.
+CREATE OR REPLACE FUNCTION car_stats_liked_items_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO car_stats (car_id, likes_count, updated_at)
+        VALUES (NEW.car_id, 1, now())
+        ON CONFLICT (car_id) DO UPDATE
+        SET likes_count = car_stats.likes_count + 1,
+            updated_at = now();
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE car_stats
+        SET likes_count = GREATEST(likes_count - 1, 0),
+            updated_at = now()
+        WHERE car_id = OLD.car_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_car_stats_collection_items ON user_collection_items;
+CREATE TRIGGER trg_car_stats_collection_items
+    AFTER INSERT OR DELETE OR UPDATE OF car_id, user_id ON user_collection_items
+    FOR EACH ROW EXECUTE FUNCTION car_stats_collection_items_trigger();
+
+DROP TRIGGER IF EXISTS trg_car_stats_liked_items ON user_liked_items;
+CREATE TRIGGER trg_car_stats_liked_items
+    AFTER INSERT OR DELETE ON user_liked_items
+    FOR EACH ROW EXECUTE FUNCTION car_stats_liked_items_trigger();
+
+INSERT INTO car_stats (car_id, owners_count, likes_count)
+SELECT
+    c.id,
+    COALESCE(o.owners_count, 0),
+    COALESCE(l.likes_count, 0)
+FROM cars c
+LEFT JOIN (
+    SELECT car_id, COUNT(DISTINCT user_id) AS owners_count
+    FROM user_collection_items
+    GROUP BY car_id
+) o ON o.car_id = c.id
+LEFT JOIN (
+    SELECT car_id, COUNT(*) AS likes_count
+    FROM user_liked_items
+    GROUP BY car_id
+) l ON l.car_id = c.id
+WHERE o.car_id IS NOT NULL OR l.car_id IS NOT NULL
+ON CONFLICT (car_id) DO UPDATE
+SET owners_count = EXCLUDED.owners_count,
+    likes_count = EXCLUDED.likes_count,
+    updated_at = now();
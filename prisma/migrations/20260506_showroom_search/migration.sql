@@ -0,0 +1,14 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE showroom_posts
+ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', COALESCE(title, '')), 'A')
+    || setweight(to_tsvector('simple', COALESCE(description, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_showroom_posts_search_vector
+    ON showroom_posts USING GIN (search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm
+    ON users USING GIN (username gin_trgm_ops);
@@ -0,0 +1,31 @@
+ALTER TABLE showroom_posts
+ADD COLUMN IF NOT EXISTS tag_count integer NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS hot_score double precision NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS popular_score double precision NOT NULL DEFAULT 0;
+
+UPDATE showroom_posts sp
+SET tag_count = tag_counts.tag_count
+FROM (
+    SELECT post_id, COUNT(*)::int AS tag_count
+    FROM showroom_post_tag_links
+    GROUP BY post_id
+) tag_counts
+WHERE tag_counts.post_id = sp.id;
+
+-- Keep in sync with SHOWROOM_HOT_SCORE_SQL / SHOWROOM_POPULAR_SCORE_SQL in
+-- backend/app/repositories/showroom_repository.py.
+UPDATE showroom_posts
+SET hot_score =
+        ln((1 + comment_count * 5 + like_count * 3 + tag_count * 4)::double precision)
+        + extract(epoch FROM COALESCE(published_at, created_at))::double precision / 45000.0,
+    popular_score =
+        ln((1 + comment_count * 5 + like_count * 3)::double precision)
+        + extract(epoch FROM COALESCE(published_at, created_at))::double precision / 604800.0;
+
+CREATE INDEX IF NOT EXISTS idx_showroom_posts_hot_score
+    ON showroom_posts (hot_score DESC, id DESC)
+    WHERE status = 'published' AND visibility = 'public';
+
+CREATE INDEX IF NOT EXISTS idx_showroom_posts_popular_score
+    ON showroom_posts (popular_score DESC, id DESC)
+    WHERE status = 'published' AND visibility = 'public';
@@ -0,0 +1,124 @@
+-- One row per (day, tag) holding how many published public posts from that
+-- day carry the tag. Trending sums a fixed window of buckets instead of
+-- grouping every tag link on each request.
+CREATE TABLE IF NOT EXISTS showroom_tag_daily_counts (
+    bucket_date date NOT NULL,
+    tag_id uuid NOT NULL REFERENCES showroom_tags(id) ON DELETE CASCADE,
+    post_count integer NOT NULL DEFAULT 0,
+    updated_at timestamp without time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (bucket_date, tag_id)
+);
+
+CREATE OR REPLACE FUNCTION showroom_tag_daily_counts_apply(target_tag_id uuid, target_date date, delta integer)
+RETURNS void AS $$
+BEGIN
+    IF delta > 0 THEN
+        INSERT INTO showroom_tag_daily_counts (bucket_date, tag_id, post_count, updated_at)
+        VALUES (target_date, target_tag_id, delta, now())
+        ON CONFLICT (bucket_date, tag_id) DO UPDATE
+        SET post_count = showroom_tag_daily_counts.post_count + delta,
+            updated_at = now();
+    ELSIF delta < 0 THEN
+        UPDATE showroom_tag_daily_counts
+        SET post_count = GREATEST(post_count + delta, 0),
+            updated_at = now()
+        WHERE bucket_date = target_date AND tag_id = target_tag_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION showroom_tag_daily_counts_links_trigger()
+RETURNS trigger AS $$
+DECLARE
+    link_post_id uuid;
+    post_date date;
+BEGIN
+    link_post_id := CASE WHEN TG_OP = 'INSERT' THEN NEW.post_id ELSE OLD.post_id END;
+
+    -- A link deleted by a cascading post delete finds no post here; the
+    -- BEFORE DELETE trigger on showroom_posts already took those counts out.
+    SELECT COALESCE(published_at, created_at)::date INTO post_date
+    FROM showroom_posts
+    WHERE id = link_post_id
+      AND status = 'published'
+      AND visibility = 'public';
+
+    IF post_date IS NOT NULL THEN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM showroom_tag_daily_counts_apply(NEW.tag_id, post_date, 1);
+        ELSE
+            PERFORM showroom_tag_daily_counts_apply(OLD.tag_id, post_date, -1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Publishing, hiding, soft-deleting or re-dating a post moves all of its tags
+-- in or out of the buckets at once.
+CREATE OR REPLACE FUNCTION showroom_tag_daily_counts_posts_trigger()
+RETURNS trigger AS $$
+DECLARE
+    old_counted boolean := FALSE;
+    new_counted boolean := FALSE;
+    old_date date;
+    new_date date;
+    link record;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_counted := OLD.status = 'published' AND OLD.visibility = 'public';
+        old_date := COALESCE(OLD.published_at, OLD.created_at)::date;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        new_counted := NEW.status = 'published' AND NEW.visibility = 'public';
+        new_date := COALESCE(NEW.published_at, NEW.created_at)::date;
+    END IF;
+
+    IF old_counted IS DISTINCT FROM new_counted OR (old_counted AND old_date IS DISTINCT FROM new_date) THEN
+        FOR link IN SELECT tag_id FROM showroom_post_tag_links WHERE post_id = OLD.id LOOP
+            IF old_counted THEN
+                PERFORM showroom_tag_daily_counts_apply(link.tag_id, old_date, -1);
+            END IF;
+            IF new_counted THEN
+                PERFORM showroom_tag_daily_counts_apply(link.tag_id, new_date, 1);
+            END IF;
+        END LOOP;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_showroom_tag_daily_counts_links ON showroom_post_tag_links;
+CREATE TRIGGER trg_showroom_tag_daily_counts_links
+    AFTER INSERT OR DELETE ON showroom_post_tag_links
+    FOR EACH ROW EXECUTE FUNCTION showroom_tag_daily_counts_links_trigger();
+
+DROP TRIGGER IF EXISTS trg_showroom_tag_daily_counts_posts ON showroom_posts;
+CREATE TRIGGER trg_showroom_tag_daily_counts_posts
+    AFTER UPDATE OF status, visibility, published_at, created_at ON showroom_posts
+    FOR EACH ROW EXECUTE FUNCTION showroom_tag_daily_counts_posts_trigger();
+
+-- Hard deletes run before the cascade removes the links, while they can
+-- still be read.
+DROP TRIGGER IF EXISTS trg_showroom_tag_daily_counts_posts_delete ON showroom_posts;
+CREATE TRIGGER trg_showroom_tag_daily_counts_posts_delete
+    BEFORE DELETE ON showroom_posts
+    FOR EACH ROW EXECUTE FUNCTION showroom_tag_daily_counts_posts_trigger();
+
+INSERT INTO showroom_tag_daily_counts (bucket_date, tag_id, post_count)
+SELECT
+    COALESCE(sp.published_at, sp.created_at)::date,
+    sptl.tag_id,
+    COUNT(*)
+FROM showroom_post_tag_links sptl
+JOIN showroom_posts sp ON sp.id = sptl.post_id
+WHERE sp.status = 'published'
+  AND sp.visibility = 'public'
+GROUP BY 1, 2
+ON CONFLICT (bucket_date, tag_id) DO UPDATE
+SET post_count = EXCLUDED.post_count,
+    updated_at = now();
@@ -0,0 +1,35 @@
+-- Persisted frontier for resumable crawler Lambda jobs. A job that runs low on
+-- time re-invokes itself and carries on from the URLs still marked pending;
+-- the lease keeps duplicate async deliveries from crawling the same job twice.
+CREATE TABLE IF NOT EXISTS crawl_jobs (
+    id text PRIMARY KEY,
+    crawler text NOT NULL,
+    status text NOT NULL DEFAULT 'running',
+    params jsonb NOT NULL DEFAULT '{}'::jsonb,
+    invocations integer NOT NULL DEFAULT 0,
+    lease_expires_at timestamp with time zone,
+    created_at timestamp without time zone NOT NULL DEFAULT now(),
+    updated_at timestamp without time zone NOT NULL DEFAULT now(),
+    finished_at timestamp without time zone,
+    CONSTRAINT crawl_jobs_status_check
+        CHECK (status IN ('running', 'completed', 'failed'))
+);
+
+CREATE TABLE IF NOT EXISTS crawl_job_urls (
+    job_id text NOT NULL REFERENCES crawl_jobs(id) ON DELETE CASCADE,
+    url text NOT NULL,
+    seq bigserial NOT NULL,
+    kind text NOT NULL DEFAULT 'page',
+    discovered_from text,
+    status text NOT NULL DEFAULT 'pending',
+    detail jsonb,
+    created_at timestamp without time zone NOT NULL DEFAULT now(),
+    updated_at timestamp without time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (job_id, url),
+    CONSTRAINT crawl_job_urls_status_check
+        CHECK (status IN ('pending', 'done', 'skipped', 'failed'))
+);
+
+CREATE INDEX IF NOT EXISTS crawl_job_urls_pending_idx
+    ON crawl_job_urls (job_id, seq)
+    WHERE status = 'pending';
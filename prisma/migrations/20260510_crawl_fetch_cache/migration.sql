@@ -0,0 +1,15 @@
+-- Validators from the last persisted crawl of each URL. Refresh crawls send
+-- them as conditional requests (or compare the MediaWiki revision id) and
+-- skip pages that have not changed. scope is the crawler plus its parser
+-- version, so a parser change re-parses every page once.
+CREATE TABLE IF NOT EXISTS crawl_fetch_cache (
+    scope text NOT NULL,
+    url text NOT NULL,
+    etag text,
+    last_modified text,
+    content_hash text,
+    revid bigint,
+    checked_at timestamp without time zone NOT NULL DEFAULT now(),
+    changed_at timestamp without time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (scope, url)
+);